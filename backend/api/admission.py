@@ -0,0 +1,162 @@
+"""
+Control de admisión de heartbeats (arranque masivo de laboratorios)
+Token bucket por origen (IP del cliente) y uno global: cuando se agotan,
+el heartbeat se rechaza antes de tocar el estado con 429/503 y Retry-After,
+y la respuesta normal sugiere el próximo intervalo según la carga.
+
+Mientras haya rechazos recientes, expiry_grace() indica cuánto extender
+el timeout: un host diferido no debe pasar a offline por haber esperado.
+
+Los límites son por proceso (con --workers N el global efectivo es N veces).
+
+El límite por origen está desactivado por defecto (UNINET_HB_SOURCE_RATE=0):
+la IP de origen no identifica a la PC cuando un laboratorio sale por NAT o
+el servidor está detrás de un proxy, y todas compartirían un mismo bucket.
+"""
+
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class TokenBucket:
+    """Bucket con `rate` tokens/segundo y capacidad `burst`"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, rate: float, burst: float, now: float) -> float:
+        """Consume `cost` si alcanza; retorna 0 o los segundos hasta que alcance"""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / rate
+
+
+class HeartbeatAdmission:
+    """
+    Admisión de heartbeats por origen y global.
+
+    - admit() es O(1): un bucket por IP (LRU acotado, solo si source_rate > 0) y el global
+    - 429: el origen excedió su ritmo; 503: el servidor está saturado.
+      En 503 el Retry-After se reparte al azar para no sincronizar reintentos
+    """
+
+    def __init__(
+        self,
+        source_rate: float = 0.0,
+        source_burst: float = 5.0,
+        global_rate: float = 200.0,
+        global_burst: float = 400.0,
+        base_interval: float = 30.0,
+        max_interval: float = 45.0,
+        timeout: float = 60.0,
+        max_sources: int = 100000,
+    ):
+        self.source_rate = source_rate
+        self.source_burst = source_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        # Intervalo sugerido al agente: base sin carga, hasta max_interval
+        # (siempre por debajo del timeout de offline)
+        self.base_interval = base_interval
+        self.max_interval = min(max_interval, timeout * 0.75)
+        self.timeout = timeout
+        self.max_sources = max_sources
+
+        now = time.monotonic()
+        self._global = TokenBucket(global_burst, now)
+        self._sources: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.accepted = 0
+        self.rejected = 0
+        # Episodio de rechazos: último rechazo, rechazos y mayor Retry-After emitido
+        self._last_reject = -math.inf
+        self._episode_rejects = 0
+        self._max_retry = 0.0
+
+    @classmethod
+    def from_env(cls, timeout: float) -> "HeartbeatAdmission":
+        """Límites configurables con UNINET_HB_* (ver SERVER-SETUP.md)"""
+        return cls(
+            source_rate=_env_float("UNINET_HB_SOURCE_RATE", 0.0),
+            source_burst=_env_float("UNINET_HB_SOURCE_BURST", 5.0),
+            global_rate=_env_float("UNINET_HB_GLOBAL_RATE", 200.0),
+            global_burst=_env_float("UNINET_HB_GLOBAL_BURST", 400.0),
+            timeout=timeout,
+        )
+
+    def admit(self, source: Optional[str], cost: int = 1) -> Optional[Tuple[int, int]]:
+        """None si se admite; (status HTTP, Retry-After en segundos) si se rechaza"""
+        now = time.monotonic()
+
+        if self.source_rate <= 0:
+            # Límite por origen desactivado
+            source = None
+        if source is not None:
+            bucket = self._sources.get(source)
+            if bucket is None:
+                bucket = self._sources[source] = TokenBucket(self.source_burst, now)
+                if len(self._sources) > self.max_sources:
+                    self._sources.popitem(last=False)
+            else:
+                self._sources.move_to_end(source)
+            # Un lote grande de un gateway cuenta como un solo envío del origen
+            wait = bucket.take(1, self.source_rate, self.source_burst, now)
+            if wait:
+                return self._reject(429, wait, now)
+
+        wait = self._global.take(cost, self.global_rate, max(self.global_burst, cost), now)
+        if wait:
+            if source is not None:
+                # Devolver el token del origen: el rechazo no es culpa suya
+                self._sources[source].tokens += 1
+            # Repartir los reintentos de la tormenta en una ventana
+            spread = min(max(wait, self._episode_rejects / self.global_rate), self.timeout / 2)
+            return self._reject(503, random.uniform(1.0, 1.0 + spread), now)
+
+        self.accepted += cost
+        return None
+
+    def _reject(self, status: int, wait: float, now: float) -> Tuple[int, int]:
+        retry_after = max(1, math.ceil(wait))
+        if now - self._last_reject > self.timeout:
+            self._episode_rejects = 0
+            self._max_retry = 0.0
+        self._last_reject = now
+        self._episode_rejects += 1
+        self._max_retry = max(self._max_retry, retry_after)
+        self.rejected += 1
+        return status, retry_after
+
+    def next_interval(self) -> int:
+        """Intervalo sugerido al agente: crece a medida que se vacía el bucket global"""
+        self._global.take(0, self.global_rate, self.global_burst, time.monotonic())
+        fill = self._global.tokens / self.global_burst
+        if fill >= 0.5:
+            return int(self.base_interval)
+        extra = (0.5 - fill) * 2 * (self.max_interval - self.base_interval)
+        return int(self.base_interval + extra)
+
+    def expiry_grace(self) -> float:
+        """
+        Segundos extra de timeout mientras haya rechazos recientes:
+        el mayor Retry-After emitido más un margen para el reintento.
+        """
+        if time.monotonic() - self._last_reject > self.timeout:
+            return 0.0
+        return self._max_retry + 5.0
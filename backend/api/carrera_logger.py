@@ -1,41 +1,26 @@
 # backend/api/carrera_logger.py
 
-import os
+import asyncio
 import time
-import json
 import subprocess
 from datetime import datetime, timezone
 from fastapi import Request
 
-def _read_kv_conf(path: str) -> dict:
-    conf = {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                k, v = line.split("=", 1)
-                conf[k.strip()] = v.strip()
-    except FileNotFoundError:
-        pass
-    return conf
+from api import config
+from api.ldap_cache import group_cache
+from api.log_writer import BufferedLogWriter
+
+# Escritura por lotes en segundo plano (se vacía en el shutdown de main.py)
+log_writer = BufferedLogWriter()
 
 def _get_log_file() -> str:
-    logs_conf = _read_kv_conf("/etc/uninet/logs.conf")
-    # Usar directorio del proyecto como fallback (más seguro)
-    project_log = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "carreras.log")
-    return (
-        os.environ.get("UNINET_LOG_FILE")
-        or logs_conf.get("LOG_FILE")
-        or project_log  # Cambiado: usar logs/ dentro del proyecto
-    )
+    # env -> logs.conf -> logs/ dentro del proyecto (ver api/config.py)
+    return config.log_file()
 
 def _write_json_line(path: str, obj: dict) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Hora del request, no de la escritura del lote
     obj["ts"] = datetime.now(timezone.utc).isoformat()
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    log_writer.write(path, obj)
 
 def _parse_cn(stdout: str) -> list[str]:
     out = []
@@ -48,8 +33,10 @@ def _parse_cn(stdout: str) -> list[str]:
 def _ldap_groups_for_user(username: str) -> list[str]:
     if not username:
         return []
+    return group_cache.get_or_load(username, _ldap_search_groups)
 
-    ldap_conf = _read_kv_conf("/etc/uninet/ldap.conf")
+def _ldap_search_groups(username: str) -> list[str]:
+    ldap_conf = config.ldap_conf()
     ldap_uri = ldap_conf.get("LDAP_URI", "ldap://localhost:389")
     ldap_base = ldap_conf.get("LDAP_BASE", "")
     groups_base = ldap_conf.get("LDAP_GROUPS_BASE") or (f"ou=groups,{ldap_base}" if ldap_base else "")
@@ -76,7 +63,10 @@ async def carrera_log_middleware(request: Request, call_next):
         response = await call_next(request)
         took = time.time() - start
 
-        carreras = _ldap_groups_for_user(username) if username else []
+        carreras = group_cache.get(username) if username else []
+        if carreras is None:
+            # Miss: ldapsearch fuera del event loop
+            carreras = await asyncio.to_thread(group_cache.load, username, _ldap_search_groups)
         carrera = carreras[0] if carreras else None
 
         _write_json_line(_get_log_file(), {
@@ -0,0 +1,147 @@
+"""
+Configuración del servidor en /etc/uninet (logs.conf, ldap.conf, ldap_admin_pass)
+Cada archivo se lee una vez y queda en memoria como un objeto inmutable;
+un hilo revisa cada `interval` segundos si cambió (mtime, tamaño o inodo)
+y, si cambió, lo vuelve a leer y reemplaza la referencia de una vez.
+Las requests solo leen la referencia actual: nunca tocan el disco.
+
+Los cambios (p. ej. tras scripts/logs/setup.sh) se aplican sin reiniciar.
+"""
+
+import os
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+LOGS_CONF = "/etc/uninet/logs.conf"
+LDAP_CONF = "/etc/uninet/ldap.conf"
+LDAP_ADMIN_PASS = "/etc/uninet/ldap_admin_pass"
+
+# Log de carreras si no hay UNINET_LOG_FILE ni LOG_FILE en logs.conf
+DEFAULT_LOG_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "carreras.log")
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+def parse_kv(text: str) -> Mapping[str, str]:
+    """Formato KEY=VALUE (líneas vacías y # ignoradas)"""
+    conf = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        k, v = line.split("=", 1)
+        conf[k.strip()] = v.strip()
+    return MappingProxyType(conf)
+
+
+def parse_secret(text: str) -> str:
+    return text.strip()
+
+
+class ConfigStore:
+    """Archivos de configuración cargados en memoria con recarga por cambios"""
+
+    def __init__(self, interval: float = 2.0):
+        self.interval = interval
+        self._parsers: Dict[str, Callable[[str], object]] = {}
+        # ruta -> (firma del archivo, valor parseado)
+        self._current: Dict[str, Tuple[Signature, object]] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, path: str, parser: Callable[[str], object] = parse_kv) -> None:
+        """Carga el archivo y lo incluye en la revisión periódica"""
+        with self._lock:
+            self._parsers[path] = parser
+        self._reload(path)
+
+    def get(self, path: str):
+        """Valor actual (sin acceso a disco salvo la primera vez de un archivo no registrado)"""
+        entry = self._current.get(path)
+        if entry is None:
+            self.watch(path)
+            entry = self._current[path]
+        return entry[1]
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def check(self) -> None:
+        """Recarga los archivos que cambiaron desde la última lectura"""
+        with self._lock:
+            paths = list(self._parsers)
+        for path in paths:
+            if _signature(path) != self._current.get(path, (None,))[0]:
+                self._reload(path)
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️  Error recargando configuración: {e}")
+
+    def _reload(self, path: str) -> None:
+        parser = self._parsers[path]
+        signature = _signature(path)
+        previous = self._current.get(path)
+        try:
+            if signature is None:
+                # Sin archivo: configuración vacía, como antes
+                value = parser("")
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = parser(f.read())
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            # Archivo ilegible o inválido: se conserva el valor anterior (vacío
+            # si es la primera carga) hasta que el archivo vuelva a cambiar
+            print(f"⚠️  Configuración inválida en {path}, se mantiene la anterior: {e}")
+            value = previous[1] if previous is not None else parser("")
+        # Reemplazo atómico: los lectores ven el objeto anterior o el nuevo completo
+        self._current[path] = (signature, value)
+        if previous is not None and previous[1] != value:
+            print(f"⚙️  Configuración recargada: {path}")
+
+
+def _signature(path: str) -> Signature:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+config = ConfigStore()
+config.watch(LOGS_CONF)
+config.watch(LDAP_CONF)
+config.watch(LDAP_ADMIN_PASS, parse_secret)
+
+
+def logs_conf() -> Mapping[str, str]:
+    return config.get(LOGS_CONF)
+
+
+def ldap_conf() -> Mapping[str, str]:
+    return config.get(LDAP_CONF)
+
+
+def ldap_admin_pass() -> str:
+    return config.get(LDAP_ADMIN_PASS)
+
+
+def log_file() -> str:
+    """Log de carreras: env -> logs.conf -> logs/ dentro del proyecto"""
+    return os.environ.get("UNINET_LOG_FILE") or logs_conf().get("LOG_FILE") or DEFAULT_LOG_FILE
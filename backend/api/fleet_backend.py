@@ -0,0 +1,799 @@
+"""
+Backends del estado de monitoreo
+Interfaz común para el estado de la flota y sus implementaciones:
+- memory: estado indexado en memoria + snapshot/log en disco (un solo worker)
+- sqlite: estado compartido en SQLite (WAL) para uvicorn con --workers N
+
+Se elige con la variable de entorno UNINET_FLEET_BACKEND (memory | sqlite).
+"""
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from api.fleet_state import (
+    EVENT_REGISTERED, EVENT_TRANSITION, EVENT_UPDATED,
+    FleetState, HostRecord, MAX_TOMBSTONES, STATUS_IN_USE, STATUS_OFFLINE, STATUS_ONLINE,
+    _id_to_seq, removed_event, stats_dict,
+)
+from api.fleet_store import FleetStore
+
+# (hostname, ip, user, carrera) de un heartbeat ya validado
+Heartbeat = Tuple[str, str, Optional[str], Optional[str]]
+
+# Recibe los hosts a dar de baja antes de sacarlos del estado (ver evict)
+Archiver = Callable[[List[HostRecord]], None]
+
+
+class FleetBackend(ABC):
+    """
+    Operaciones que el módulo de monitoreo necesita sobre el estado de la flota.
+    Los hosts se entregan como HostRecord (ver fleet_state).
+    """
+
+    # True si otros procesos también modifican el estado (eventos por polling)
+    shared = False
+
+    @property
+    @abstractmethod
+    def version(self) -> int:
+        """Versión actual del estado (ver FleetState)"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Cantidad de hosts registrados"""
+
+    @abstractmethod
+    def apply_heartbeats(self, heartbeats: Iterable[Heartbeat], now: datetime) -> List[str]:
+        """Aplica heartbeats en una sola pasada y retorna los IDs en el mismo orden"""
+
+    async def apply_heartbeats_async(self, heartbeats: List[Heartbeat], now: datetime) -> List[str]:
+        """Versión para el event loop; por defecto aplica en el mismo hilo"""
+        return self.apply_heartbeats(heartbeats, now)
+
+    @abstractmethod
+    def expire(self, now: datetime) -> List[str]:
+        """Marca offline los hosts vencidos y retorna sus hostnames"""
+
+    @abstractmethod
+    def next_expiry(self) -> Optional[float]:
+        """Epoch del próximo vencimiento de un host vivo (None si no hay)"""
+
+    @abstractmethod
+    def remove(self, hostname: str, archive: Optional[Archiver] = None) -> Optional[HostRecord]:
+        """Da de baja un host; retorna su último registro o None si no existe"""
+
+    @abstractmethod
+    def evict(self, before: datetime, archive: Optional[Archiver] = None) -> List[HostRecord]:
+        """
+        Da de baja los hosts offline sin heartbeat desde antes de `before`.
+        `archive` recibe los hosts antes de sacarlos del estado: si falla,
+        no se da de baja ninguno (la excepción se propaga).
+        """
+
+    @abstractmethod
+    def iter_hosts(self, carrera: Optional[str] = None) -> Iterator[HostRecord]:
+        """Hosts en orden de ID, opcionalmente de una carrera"""
+
+    @abstractmethod
+    def host_by_id(self, host_id: str) -> Optional[HostRecord]:
+        """Host con ese ID (pc-NN) o None, sin recorrer la flota"""
+
+    @abstractmethod
+    def changes_since(
+        self, since: int, carrera: Optional[str] = None
+    ) -> Optional[Tuple[List[HostRecord], List[str]]]:
+        """(hosts cambiados, IDs dados de baja) o None si se requiere estado completo"""
+
+    @abstractmethod
+    def stats(self, carrera: Optional[str] = None) -> Dict[str, int]:
+        """{"total", "online", "inUse", "offline"}, global o de una carrera"""
+
+    @abstractmethod
+    def carrera_stats(self) -> Dict[Optional[str], Dict[str, int]]:
+        """Mismo formato que stats() para cada carrera"""
+
+    @abstractmethod
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        """Registra un callback de eventos de cambio (mismo formato que FleetState)"""
+
+    def start(self) -> None:
+        """Inicializa el backend al arrancar la aplicación"""
+
+    def stop(self) -> None:
+        """Libera recursos al apagar la aplicación"""
+
+
+class MemoryFleetBackend(FleetBackend):
+    """
+    Estado en memoria del proceso (FleetState) persistido con FleetStore.
+    Es la opción más rápida, pero solo es correcta con un único worker.
+    """
+
+    def __init__(self, timeout_seconds: int, state_dir: str):
+        self.state = FleetState(timeout_seconds=timeout_seconds)
+        self.store = FleetStore(state_dir)
+
+    @property
+    def version(self) -> int:
+        return self.state.version
+
+    def __len__(self) -> int:
+        return len(self.state)
+
+    def apply_heartbeats(self, heartbeats: Iterable[Heartbeat], now: datetime) -> List[str]:
+        ids = []
+        for hostname, ip, user, carrera in heartbeats:
+            ids.append(self.state.apply_heartbeat(hostname, ip, user, carrera, now))
+            # Solo encola el registro; el hilo del store lo escribe en lote
+            self.store.record_host(self.state.hosts[hostname])
+        if self.store.needs_compaction():
+            # Solo copia la lista de hosts; el snapshot se arma y escribe en el hilo del store
+            self.store.compact(self.state.hosts)
+        return ids
+
+    def expire(self, now: datetime) -> List[str]:
+        return self.state.expire(now)
+
+    def next_expiry(self) -> Optional[float]:
+        return self.state.next_expiry()
+
+    def remove(self, hostname: str, archive: Optional[Archiver] = None) -> Optional[HostRecord]:
+        host = self.state.hosts.get(hostname)
+        if host is None:
+            return None
+        if archive is not None:
+            archive([host])
+        self.state.remove_host(hostname)
+        self.store.record_delete(hostname)
+        return host
+
+    def evict(self, before: datetime, archive: Optional[Archiver] = None) -> List[HostRecord]:
+        stale = self.state.stale(before)
+        if stale and archive is not None:
+            # Primero el archivo en disco: si falla, los hosts siguen en el estado
+            archive(stale)
+        evicted = [self.state.remove_host(host.hostname) for host in stale]
+        for host in evicted:
+            self.store.record_delete(host.hostname)
+        if evicted:
+            # El snapshot no debe seguir cargando los hosts dados de baja
+            self.store.compact(self.state.hosts)
+        return evicted
+
+    def iter_hosts(self, carrera: Optional[str] = None) -> Iterator[HostRecord]:
+        return self.state.iter_hosts(carrera)
+
+    def host_by_id(self, host_id: str) -> Optional[HostRecord]:
+        return self.state.host_by_id(host_id)
+
+    def changes_since(self, since: int, carrera: Optional[str] = None):
+        return self.state.changes_since(since, carrera)
+
+    def stats(self, carrera: Optional[str] = None) -> Dict[str, int]:
+        return self.state.stats(carrera)
+
+    def carrera_stats(self) -> Dict[Optional[str], Dict[str, int]]:
+        return self.state.carrera_stats()
+
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        self.state.add_listener(listener)
+
+    def start(self) -> None:
+        """Restaura el estado persistido e inicia la escritura en segundo plano"""
+        records = self.store.load()
+        for hostname, record in sorted(records.items(), key=lambda item: item[1]["last_seen"]):
+            self.state.restore_host(
+                hostname, record["seq"], record["ip"], record["user"],
+                record["carrera"], record["last_seen"], record["first_seen"],
+                record.get("status_since"),
+            )
+        self.state.expire(datetime.now())
+        self.store.start()
+        # Consolidar el log restaurado en un snapshot nuevo
+        self.store.compact(self.state.hosts)
+        if records:
+            print(f"📦 Estado de monitoreo restaurado: {len(records)} hosts")
+
+    def stop(self) -> None:
+        """Guarda un snapshot final y detiene la escritura"""
+        self.store.compact(self.state.hosts)
+        self.store.stop()
+
+
+# ============================================================
+# BACKEND SQLITE (compartido entre workers)
+# ============================================================
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    hostname TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL UNIQUE,
+    ip TEXT NOT NULL,
+    user TEXT,
+    carrera TEXT,
+    status TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    first_seen REAL NOT NULL,
+    status_since REAL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_hosts_carrera ON hosts(carrera, seq);
+CREATE INDEX IF NOT EXISTS idx_hosts_version ON hosts(version);
+CREATE INDEX IF NOT EXISTS idx_hosts_alive ON hosts(last_seen) WHERE status != 'offline';
+
+CREATE TABLE IF NOT EXISTS tombstones (
+    hostname TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    host_id TEXT NOT NULL,
+    PRIMARY KEY (hostname, scope)
+);
+CREATE INDEX IF NOT EXISTS idx_tombstones_version ON tombstones(version);
+
+-- Contadores por carrera/status mantenidos en cada escritura ('' = sin carrera)
+CREATE TABLE IF NOT EXISTS counts (
+    carrera TEXT NOT NULL,
+    status TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (carrera, status)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# scope de una baja de toda la flota; las bajas de carrera usan "c:<carrera>"
+_FLEET_SCOPE = "*"
+
+# Las filas devuelven el status como el mismo objeto constante que FleetState
+_STATUSES = {status: status for status in (STATUS_ONLINE, STATUS_IN_USE, STATUS_OFFLINE)}
+
+_HOST_COLUMNS = "hostname, seq, ip, user, carrera, status, last_seen, first_seen, status_since, version"
+
+
+def _scope(carrera: Optional[str]) -> str:
+    return f"c:{carrera or ''}"
+
+
+class SqliteFleetBackend(FleetBackend):
+    """
+    Estado compartido en una base SQLite en modo WAL.
+
+    - Cada worker abre su propia conexión; las escrituras usan
+      BEGIN IMMEDIATE, así la asignación de IDs (meta.next_seq) y la
+      versión global (meta.version) son únicas entre procesos.
+    - Las lecturas usan índices por carrera/seq y por versión, por lo que
+      /status?carrera=X y ?since=N siguen siendo O(resultado).
+    - Los eventos para el stream se obtienen consultando las filas con
+      versión mayor a la última vista, así cada worker ve también los
+      cambios hechos por los demás.
+    - Los heartbeats del event loop no escriben en el loop: los aplica un
+      hilo escritor que agrupa los pendientes en una sola transacción
+      (group commit), así la espera por el lock de escritura entre workers
+      no bloquea el loop. Un heartbeat que solo renueva last_seen dentro
+      de LAST_SEEN_TOLERANCE no escribe.
+    """
+
+    shared = True
+
+    # Segundos en que un heartbeat sin cambios no vuelve a escribir last_seen
+    # (muy por debajo del timeout: a lo sumo adelanta el offline ese tanto)
+    LAST_SEEN_TOLERANCE = 5.0
+
+    # Heartbeats pendientes que el hilo escritor aplica en una transacción
+    WRITE_BATCH = 2000
+
+    def __init__(self, timeout_seconds: int, db_path: str):
+        self.timeout = timedelta(seconds=timeout_seconds)
+        self.db_path = db_path
+        # Una conexión por hilo (loop y escritor); el lock serializa el uso
+        # de la del loop y del estado de eventos entre hilos
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._initialized = False
+        self._lock = threading.RLock()
+        self._writes: "queue.Queue[Optional[Tuple[List[Heartbeat], datetime, Future]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[dict], None]] = []
+        # Último estado conocido por este worker para derivar transiciones
+        self._event_cursor: Optional[int] = None
+        self._known: Dict[str, Tuple[str, Optional[str]]] = {}
+
+    # ------------------------------------------------------------
+    # Conexión
+    # ------------------------------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(
+            self.db_path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Con WAL, NORMAL solo hace fsync en checkpoints: commits baratos
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conns_lock:
+            if self._initialized:
+                return conn
+            self._initialized = True
+        conn.executescript(_SQLITE_SCHEMA)
+        # Bases creadas antes de registrar el momento de cada transición
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(hosts)")}
+        if "status_since" not in columns:
+            conn.execute("ALTER TABLE hosts ADD COLUMN status_since REAL")
+        # La versión parte de la hora en ms (ver FleetState) y persiste
+        start = int(time.time() * 1000)
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('version', ?), ('floor', ?), ('next_seq', 1)",
+            (start, start),
+        )
+        # Reconstruir contadores al abrir (bases creadas antes de la tabla counts)
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM counts")
+        conn.execute(
+            "INSERT INTO counts (carrera, status, n) "
+            "SELECT COALESCE(carrera, ''), status, COUNT(*) FROM hosts GROUP BY 1, 2"
+        )
+        conn.execute("COMMIT")
+        return conn
+
+    def start(self) -> None:
+        with self._lock:
+            total = self._db().execute("SELECT COUNT(*) FROM hosts").fetchone()[0]
+        self._start_writer()
+        if total:
+            print(f"📦 Estado de monitoreo compartido (SQLite): {total} hosts")
+
+    def stop(self) -> None:
+        writer = self._writer
+        if writer is not None:
+            # El escritor aplica lo pendiente antes de salir
+            self._writes.put(None)
+            writer.join()
+            self._writer = None
+        with self._lock, self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+            self._initialized = False
+        self._local = threading.local()
+
+    # ------------------------------------------------------------
+    # Hilo escritor (group commit de heartbeats)
+    # ------------------------------------------------------------
+
+    def _start_writer(self) -> None:
+        with self._conns_lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._run_writer, name="fleet-sqlite-writer", daemon=True)
+            self._writer.start()
+
+    async def apply_heartbeats_async(self, heartbeats: List[Heartbeat], now: datetime) -> List[str]:
+        """Encola los heartbeats al hilo escritor y espera sus IDs sin bloquear el loop"""
+        if self._writer is None:
+            self._start_writer()
+        future: Future = Future()
+        self._writes.put((heartbeats, now, future))
+        ids = await asyncio.wrap_future(future)
+        # Los listeners corren en el loop, no en el hilo escritor
+        with self._lock:
+            self._poll_events()
+        return ids
+
+    def _run_writer(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._writes.get()
+            if item is None:
+                break
+            batch = [item]
+            size = len(item[0])
+            # Lo que se acumuló mientras se escribía el lote anterior va junto
+            while size < self.WRITE_BATCH:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[Tuple[List[Heartbeat], datetime, Future]]) -> None:
+        heartbeats = [(hb, now) for hbs, now, _ in batch for hb in hbs]
+        try:
+            ids = self._write_heartbeats(heartbeats)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        start = 0
+        for hbs, _, future in batch:
+            future.set_result(ids[start:start + len(hbs)])
+            start += len(hbs)
+
+    def _meta(self, key: str) -> int:
+        return self._db().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._db().execute("UPDATE meta SET value = ? WHERE key = ?", (value, key))
+
+    # ------------------------------------------------------------
+    # Interfaz
+    # ------------------------------------------------------------
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._meta("version")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM hosts").fetchone()[0]
+
+    def apply_heartbeats(self, heartbeats: Iterable[Heartbeat], now: datetime) -> List[str]:
+        with self._lock:
+            ids = self._write_heartbeats([(hb, now) for hb in heartbeats])
+            self._poll_events()
+            return ids
+
+    def _write_heartbeats(self, heartbeats: List[Tuple[Heartbeat, datetime]]) -> List[str]:
+        """
+        Aplica los heartbeats con la conexión del hilo actual. Retorna sus IDs.
+        Lectura previa sin lock de escritura: los hosts conocidos sin cambios y
+        con last_seen reciente no abren transacción.
+        """
+        db = self._db()
+        ids: List[Optional[str]] = [None] * len(heartbeats)
+        pending = []
+        for i, ((hostname, ip, user, carrera), now) in enumerate(heartbeats):
+            row = db.execute(
+                "SELECT seq, ip, user, carrera, status, last_seen FROM hosts WHERE hostname = ?",
+                (hostname,),
+            ).fetchone()
+            if (
+                row is not None
+                and row["status"] == (STATUS_IN_USE if user else STATUS_ONLINE)
+                and row["user"] == user
+                and row["ip"] == ip
+                and row["carrera"] == carrera
+                and 0 <= now.timestamp() - row["last_seen"] < self.LAST_SEEN_TOLERANCE
+            ):
+                ids[i] = f"pc-{row['seq']:02d}"
+            else:
+                pending.append(i)
+        if not pending:
+            return ids
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._meta("version")
+            for i in pending:
+                (hostname, ip, user, carrera), now = heartbeats[i]
+                ts = now.timestamp()
+                status = STATUS_IN_USE if user else STATUS_ONLINE
+                row = db.execute(
+                    "SELECT seq, ip, user, carrera, status, status_since FROM hosts WHERE hostname = ?",
+                    (hostname,),
+                ).fetchone()
+
+                # Auto-registro: el ID sale de un contador compartido
+                if row is None:
+                    seq = self._meta("next_seq")
+                    self._set_meta("next_seq", seq + 1)
+                    version += 1
+                    db.execute(
+                        f"INSERT INTO hosts ({_HOST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (hostname, seq, ip, user, carrera, status, ts, ts, ts, version),
+                    )
+                    self._count(carrera, status, 1)
+                    ids[i] = f"pc-{seq:02d}"
+                    continue
+
+                seq = row["seq"]
+                changed = (
+                    row["status"] != status
+                    or row["user"] != user
+                    or row["ip"] != ip
+                    or row["carrera"] != carrera
+                )
+                if not changed:
+                    db.execute("UPDATE hosts SET last_seen = ? WHERE hostname = ?", (ts, hostname))
+                else:
+                    version += 1
+                    self._count(row["carrera"], row["status"], -1)
+                    self._count(carrera, status, 1)
+                    if row["carrera"] != carrera:
+                        # Para las vistas filtradas por la carrera anterior el host es una baja
+                        self._add_tombstone(hostname, _scope(row["carrera"]), version, f"pc-{seq:02d}")
+                    status_since = ts if row["status"] != status else row["status_since"]
+                    db.execute(
+                        "UPDATE hosts SET ip = ?, user = ?, carrera = ?, status = ?, "
+                        "last_seen = ?, status_since = ?, version = ? WHERE hostname = ?",
+                        (ip, user, carrera, status, ts, status_since, version, hostname),
+                    )
+                ids[i] = f"pc-{seq:02d}"
+
+            self._set_meta("version", version)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return ids
+
+    def expire(self, now: datetime) -> List[str]:
+        with self._lock:
+            db = self._db()
+            threshold = (now - self.timeout).timestamp()
+            query = (
+                "SELECT hostname, carrera, status FROM hosts "
+                "WHERE status != 'offline' AND last_seen <= ?"
+            )
+
+            expired: List[str] = []
+            # Lectura previa sin bloqueo: casi siempre no hay nada que expirar
+            if db.execute(query + " LIMIT 1", (threshold,)).fetchone() is not None:
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    version = self._meta("version")
+                    for row in db.execute(query, (threshold,)).fetchall():
+                        version += 1
+                        db.execute(
+                            "UPDATE hosts SET status = 'offline', status_since = last_seen + ?, "
+                            "version = ? WHERE hostname = ?",
+                            (self.timeout.total_seconds(), version, row["hostname"]),
+                        )
+                        self._count(row["carrera"], row["status"], -1)
+                        self._count(row["carrera"], STATUS_OFFLINE, 1)
+                        expired.append(row["hostname"])
+                    self._set_meta("version", version)
+                    db.execute("COMMIT")
+                except Exception:
+                    db.execute("ROLLBACK")
+                    raise
+
+            # También recoge los cambios hechos por otros workers
+            self._poll_events()
+            return expired
+
+    def next_expiry(self) -> Optional[float]:
+        with self._lock:
+            # MIN sobre el índice parcial idx_hosts_alive: O(log n)
+            oldest = self._db().execute(
+                "SELECT MIN(last_seen) FROM hosts WHERE status != 'offline'"
+            ).fetchone()[0]
+        return None if oldest is None else oldest + self.timeout.total_seconds()
+
+    def remove(self, hostname: str, archive: Optional[Archiver] = None) -> Optional[HostRecord]:
+        with self._lock:
+            removed = self._delete_hosts("hostname = ?", (hostname,), archive)
+        return removed[0] if removed else None
+
+    def evict(self, before: datetime, archive: Optional[Archiver] = None) -> List[HostRecord]:
+        with self._lock:
+            return self._delete_hosts(
+                "status = 'offline' AND last_seen < ?", (before.timestamp(),), archive
+            )
+
+    def iter_hosts(self, carrera: Optional[str] = None) -> Iterator[HostRecord]:
+        with self._lock:
+            db = self._db()
+            if carrera is None:
+                rows = db.execute(f"SELECT {_HOST_COLUMNS} FROM hosts ORDER BY seq").fetchall()
+            else:
+                rows = db.execute(
+                    f"SELECT {_HOST_COLUMNS} FROM hosts WHERE carrera = ? ORDER BY seq", (carrera,)
+                ).fetchall()
+        for row in rows:
+            yield self._row_to_host(row)
+
+    def host_by_id(self, host_id: str) -> Optional[HostRecord]:
+        seq = _id_to_seq(host_id)
+        if seq is None:
+            return None
+        with self._lock:
+            # seq es UNIQUE: búsqueda por índice
+            row = self._db().execute(
+                f"SELECT {_HOST_COLUMNS} FROM hosts WHERE seq = ?", (seq,)
+            ).fetchone()
+        return self._row_to_host(row) if row is not None else None
+
+    def changes_since(self, since: int, carrera: Optional[str] = None):
+        with self._lock:
+            db = self._db()
+            if since > self._meta("version") or since < self._meta("floor"):
+                return None
+
+            if carrera is None:
+                rows = db.execute(
+                    f"SELECT {_HOST_COLUMNS} FROM hosts WHERE version > ? ORDER BY seq", (since,)
+                ).fetchall()
+                removed = db.execute(
+                    "SELECT host_id FROM tombstones WHERE version > ? AND scope = ? ORDER BY version DESC",
+                    (since, _FLEET_SCOPE),
+                ).fetchall()
+            else:
+                rows = db.execute(
+                    f"SELECT {_HOST_COLUMNS} FROM hosts WHERE version > ? AND carrera = ? ORDER BY seq",
+                    (since, carrera),
+                ).fetchall()
+                removed = db.execute(
+                    "SELECT host_id FROM tombstones WHERE version > ? AND scope IN (?, ?) ORDER BY version DESC",
+                    (since, _FLEET_SCOPE, _scope(carrera)),
+                ).fetchall()
+
+            changed = [self._row_to_host(row) for row in rows]
+            return changed, [row["host_id"] for row in removed]
+
+    def stats(self, carrera: Optional[str] = None) -> Dict[str, int]:
+        with self._lock:
+            if carrera is None:
+                rows = self._db().execute("SELECT status, SUM(n) AS n FROM counts GROUP BY status")
+            else:
+                rows = self._db().execute("SELECT status, n FROM counts WHERE carrera = ?", (carrera,))
+            return stats_dict({row["status"]: row["n"] for row in rows})
+
+    def carrera_stats(self) -> Dict[Optional[str], Dict[str, int]]:
+        with self._lock:
+            by_carrera: Dict[Optional[str], Dict[str, int]] = {}
+            for row in self._db().execute("SELECT carrera, status, n FROM counts WHERE n > 0"):
+                by_carrera.setdefault(row["carrera"] or None, {})[row["status"]] = row["n"]
+        return {carrera: stats_dict(counts) for carrera, counts in by_carrera.items()}
+
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        self._listeners.append(listener)
+
+    # ------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _row_to_host(row: sqlite3.Row) -> HostRecord:
+        return HostRecord(
+            row["hostname"], row["seq"], row["ip"], row["user"], row["carrera"],
+            _STATUSES.get(row["status"], row["status"]), row["last_seen"], row["first_seen"],
+            row["status_since"],
+        )
+
+    def _count(self, carrera: Optional[str], status: str, delta: int) -> None:
+        """Ajusta un contador (dentro de una transacción abierta)"""
+        self._db().execute(
+            "INSERT INTO counts (carrera, status, n) VALUES (?, ?, ?) "
+            "ON CONFLICT (carrera, status) DO UPDATE SET n = n + excluded.n",
+            (carrera or "", status, delta),
+        )
+
+    def _delete_hosts(self, where: str, params: tuple, archive: Optional[Archiver] = None) -> List[HostRecord]:
+        """Baja de los hosts que cumplen `where`, con su baja para toda la flota"""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # Dentro de la transacción: con varios workers solo uno borra cada host
+            rows = db.execute(f"SELECT {_HOST_COLUMNS} FROM hosts WHERE {where}", params).fetchall()
+            if rows and archive is not None:
+                # Archivados antes del DELETE: si falla, ROLLBACK y siguen en el estado
+                archive([self._row_to_host(row) for row in rows])
+            version = self._meta("version")
+            for row in rows:
+                version += 1
+                db.execute("DELETE FROM hosts WHERE hostname = ?", (row["hostname"],))
+                self._count(row["carrera"], row["status"], -1)
+                self._add_tombstone(row["hostname"], _FLEET_SCOPE, version, f"pc-{row['seq']:02d}")
+            self._set_meta("version", version)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+        self._poll_events()
+        return [self._row_to_host(row) for row in rows]
+
+    def _add_tombstone(self, hostname: str, scope: str, version: int, host_id: str) -> None:
+        """Registra una baja (dentro de una transacción abierta) y descarta las más antiguas"""
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO tombstones (hostname, scope, version, host_id) VALUES (?, ?, ?, ?)",
+            (hostname, scope, version, host_id),
+        )
+        oldest_kept = db.execute(
+            "SELECT version FROM tombstones ORDER BY version DESC LIMIT 1 OFFSET ?",
+            (MAX_TOMBSTONES - 1,),
+        ).fetchone()
+        if oldest_kept is not None:
+            dropped = db.execute(
+                "SELECT MAX(version) FROM tombstones WHERE version < ?", (oldest_kept[0],)
+            ).fetchone()[0]
+            if dropped is not None:
+                db.execute("DELETE FROM tombstones WHERE version <= ?", (dropped,))
+                self._set_meta("floor", max(self._meta("floor"), dropped))
+
+    def _poll_events(self) -> None:
+        """
+        Emite a los listeners los cambios con versión posterior a la última vista.
+        La primera vez solo toma el estado actual como referencia.
+        """
+        if not self._listeners:
+            return
+        db = self._db()
+
+        if self._event_cursor is None:
+            self._event_cursor = self._meta("version")
+            for row in db.execute("SELECT hostname, status, carrera FROM hosts"):
+                self._known[row["hostname"]] = (row["status"], row["carrera"])
+            return
+
+        cursor = self._event_cursor
+        rows = db.execute(
+            f"SELECT {_HOST_COLUMNS} FROM hosts WHERE version > ? ORDER BY version",
+            (cursor,),
+        ).fetchall()
+        # Bajas de toda la flota (de este u otro worker)
+        for tombstone in db.execute(
+            "SELECT hostname, host_id, version FROM tombstones WHERE version > ? AND scope = ? ORDER BY version",
+            (cursor, _FLEET_SCOPE),
+        ).fetchall():
+            prev = self._known.pop(tombstone["hostname"], None)
+            if prev is None:
+                continue
+            self._event_cursor = max(self._event_cursor, tombstone["version"])
+            event = removed_event(
+                tombstone["hostname"], tombstone["host_id"], prev[0], prev[1], tombstone["version"]
+            )
+            for listener in self._listeners:
+                listener(event)
+
+        for row in rows:
+            hostname = row["hostname"]
+            host = self._row_to_host(row)
+            prev = self._known.get(hostname)
+            if prev is None:
+                event_type, prev_status, prev_carrera = EVENT_REGISTERED, None, host.carrera
+            else:
+                prev_status, prev_carrera = prev
+                event_type = EVENT_TRANSITION if prev_status != host.status else EVENT_UPDATED
+            self._known[hostname] = (host.status, host.carrera)
+            self._event_cursor = max(self._event_cursor, row["version"])
+
+            event = {
+                "type": event_type,
+                "hostname": hostname,
+                "state": host,
+                "from": prev_status,
+                "prev_carrera": prev_carrera,
+                "version": row["version"],
+            }
+            for listener in self._listeners:
+                listener(event)
+
+
+def create_fleet_backend(timeout_seconds: int, state_dir: str) -> FleetBackend:
+    """Crea el backend configurado en UNINET_FLEET_BACKEND (default: memory)"""
+    kind = os.environ.get("UNINET_FLEET_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        return SqliteFleetBackend(timeout_seconds, os.path.join(state_dir, "fleet.db"))
+    if kind != "memory":
+        raise ValueError(f"UNINET_FLEET_BACKEND desconocido: {kind}")
+    return MemoryFleetBackend(timeout_seconds, state_dir)
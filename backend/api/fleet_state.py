@@ -0,0 +1,488 @@
+"""
+Estado indexado de la flota de PCs monitoreadas
+Mantiene los hosts en orden de ID, un índice secundario por carrera y el
+estado (online/inUse/offline) actualizado a medida que llegan heartbeats,
+para que las lecturas solo recorran los hosts que devuelven.
+"""
+
+import socket
+import sys
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime
+from operator import attrgetter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+
+# Máximo de bajas (hosts eliminados o movidos de carrera) recordadas para deltas
+MAX_TOMBSTONES = 10000
+
+
+STATUS_ONLINE = "online"
+STATUS_IN_USE = "inUse"
+STATUS_OFFLINE = "offline"
+
+# Tipos de evento emitidos a los listeners
+EVENT_REGISTERED = "registered"   # host nuevo
+EVENT_TRANSITION = "transition"   # cambio de status (online/inUse/offline)
+EVENT_UPDATED = "updated"         # cambio de user, IP o carrera sin cambio de status
+EVENT_REMOVED = "removed"         # host dado de baja (eviction o purga manual)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Comparte una única copia de strings repetidos (carreras, usuarios)"""
+    return sys.intern(value) if value else value
+
+
+def _id_to_seq(host_id: str) -> Optional[int]:
+    """seq de un ID pc-NN (None si no tiene ese formato exacto)"""
+    prefix, _, number = host_id.partition("-")
+    if prefix != "pc" or not number.isdigit():
+        return None
+    seq = int(number)
+    return seq if f"pc-{seq:02d}" == host_id else None
+
+
+def _pack_ip(ip: str) -> Union[int, str]:
+    """IPv4 como entero de 32 bits; cualquier otro valor se guarda tal cual"""
+    try:
+        return int.from_bytes(socket.inet_aton(ip), "big") if ip.count(".") == 3 else ip
+    except OSError:
+        return ip
+
+
+class HostRecord:
+    """
+    Registro compacto de un host (__slots__, sin dict por instancia)
+
+    - ip: IPv4 empaquetada en un entero (se expone como string)
+    - carrera/user: strings internados, compartidos entre hosts
+    - status: una de las constantes STATUS_* (objeto compartido)
+    - last_seen/first_seen: epoch en segundos (float)
+    - status_since: epoch de la última transición de status (para offline,
+      el momento exacto en que venció el timeout)
+    """
+
+    __slots__ = (
+        "hostname", "seq", "_ip", "user", "carrera", "status", "last_seen", "first_seen", "status_since",
+    )
+
+    def __init__(
+        self,
+        hostname: str,
+        seq: int,
+        ip: str,
+        user: Optional[str],
+        carrera: Optional[str],
+        status: str,
+        last_seen: float,
+        first_seen: float,
+        status_since: Optional[float] = None,
+    ):
+        self.hostname = hostname
+        self.seq = seq
+        self._ip = _pack_ip(ip)
+        self.user = _intern(user)
+        self.carrera = _intern(carrera)
+        self.status = status
+        self.last_seen = last_seen
+        self.first_seen = first_seen
+        self.status_since = last_seen if status_since is None else status_since
+
+    @property
+    def id(self) -> str:
+        return f"pc-{self.seq:02d}"
+
+    @property
+    def ip(self) -> str:
+        if isinstance(self._ip, int):
+            return socket.inet_ntoa(self._ip.to_bytes(4, "big"))
+        return self._ip
+
+    @ip.setter
+    def ip(self, value: str) -> None:
+        self._ip = _pack_ip(value)
+
+    def same_ip(self, value: str) -> bool:
+        return self._ip == _pack_ip(value)
+
+
+_SEQ = attrgetter("seq")
+
+
+def removed_event(
+    hostname: str, host_id: str, prev_status: Optional[str], prev_carrera: Optional[str], version: int
+) -> dict:
+    """
+    Evento de baja: no hay estado nuevo ("state" es None), se identifica
+    por hostname y host_id
+    """
+    return {
+        "type": EVENT_REMOVED,
+        "hostname": hostname,
+        "host_id": host_id,
+        "state": None,
+        "from": prev_status,
+        "prev_carrera": prev_carrera,
+        "version": version,
+    }
+
+
+def stats_dict(counts: Dict[str, int]) -> Dict[str, int]:
+    """Formato de /stats a partir de {status: cantidad}"""
+    online = counts.get(STATUS_ONLINE, 0)
+    in_use = counts.get(STATUS_IN_USE, 0)
+    offline = counts.get(STATUS_OFFLINE, 0)
+    return {"total": online + in_use + offline, "online": online, "inUse": in_use, "offline": offline}
+
+
+class FleetState:
+    """
+    Estado de todos los hosts registrados
+
+    Estructuras:
+    - hosts: hostname -> HostRecord
+    - _order: registros de todos los hosts, ordenados por ID (seq); buscar
+      por ID es una bisección sobre el seq, sin un mapa de strings pc-NN
+    - _by_carrera: carrera -> registros de sus hosts, ordenados por ID
+    - _alive: hosts no-offline ordenados por last_seen (el más antiguo primero),
+      de modo que expirar hosts cuesta O(expirados) y no O(flota)
+
+    Versionado:
+    - version: contador monótono, se incrementa en cada cambio visible
+      (alta, status, user, ip o carrera); un heartbeat que solo renueva
+      last_seen no cambia la versión
+    - _changes: hostname -> versión de su último cambio, ordenado por versión
+      (dict simple: mover al final es sacar y volver a insertar)
+    - _tombstones: (seq, carrera) -> versión de hosts que salieron de esa
+      carrera (o de la flota, con carrera None); el ID sale del seq
+
+    Las claves de los índices son el hostname o el seq del propio registro
+    (objetos ya existentes): un host no agrega strings ni tuplas propias.
+
+    Contadores:
+    - _counts: carrera -> {status: cantidad}, actualizado en cada alta,
+      transición, cambio de carrera y expiración; /stats no recorre la flota
+
+    Eventos:
+    - Los listeners registrados con add_listener reciben un dict por cada
+      cambio visible: {"type", "hostname", "state", "from", "prev_carrera", "version"}
+      donde "state" es el HostRecord actualizado (None en las bajas, ver removed_event)
+    """
+
+    def __init__(self, timeout_seconds: int = 60):
+        self.timeout = timeout_seconds
+        self.hosts: Dict[str, HostRecord] = {}
+        self._order: List[HostRecord] = []
+        self._by_carrera: Dict[Optional[str], List[HostRecord]] = {}
+        self._alive: "OrderedDict[str, None]" = OrderedDict()
+        self._next_seq = 1
+        # La versión parte de la hora actual en ms: un cursor emitido por un
+        # proceso anterior siempre queda por debajo y recibe el estado completo
+        self.version = int(time.time() * 1000)
+        self._changes: Dict[str, int] = {}
+        self._tombstones: "OrderedDict[Tuple[int, Optional[str]], int]" = OrderedDict()
+        # Versión más alta de una baja ya descartada (o de inicio del proceso):
+        # deltas más antiguos no son confiables
+        self._tombstone_floor = self.version
+        self._listeners: List[Callable[[dict], None]] = []
+        self._counts: Dict[Optional[str], Dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.hosts)
+
+    def __contains__(self, hostname: str) -> bool:
+        return hostname in self.hosts
+
+    def apply_heartbeat(
+        self,
+        hostname: str,
+        ip: str,
+        user: Optional[str],
+        carrera: Optional[str],
+        now: datetime,
+    ) -> str:
+        """
+        Registra o actualiza un host a partir de un heartbeat.
+        Retorna el ID asignado (pc-NN).
+        """
+        status = STATUS_IN_USE if user else STATUS_ONLINE
+        ts = now.timestamp()
+        host = self.hosts.get(hostname)
+
+        # Auto-registro: asignar ID secuencial si es nuevo
+        if host is None:
+            seq = self._next_seq
+            self._next_seq += 1
+            host = HostRecord(hostname, seq, ip, user, carrera, status, ts, ts)
+            self.hosts[hostname] = host
+            # seq es creciente: el host nuevo siempre va al final
+            self._order.append(host)
+            insort(self._by_carrera.setdefault(host.carrera, []), host, key=_SEQ)
+            self._alive[hostname] = None
+            self._count(host.carrera, status, 1)
+            self._mark_changed(hostname)
+            self._emit(EVENT_REGISTERED, host, None, host.carrera)
+            return host.id
+
+        prev_status = host.status
+        prev_carrera = host.carrera
+        changed = (
+            host.status != status
+            or host.user != user
+            or host.carrera != carrera
+            or not host.same_ip(ip)
+        )
+        if changed:
+            self._mark_changed(hostname)
+            self._count(host.carrera, host.status, -1)
+            if host.carrera != carrera:
+                self._move_carrera(host, carrera)
+            host.ip = ip
+            host.user = _intern(user)
+            host.status = status
+            if prev_status != status:
+                host.status_since = ts
+            self._count(host.carrera, status, 1)
+        host.last_seen = ts
+
+        # Reubicar al final de la cola de vivos (last_seen más reciente)
+        self._alive[hostname] = None
+        self._alive.move_to_end(hostname)
+
+        if changed:
+            event_type = EVENT_TRANSITION if prev_status != status else EVENT_UPDATED
+            self._emit(event_type, host, prev_status, prev_carrera)
+        return host.id
+
+    def restore_host(
+        self,
+        hostname: str,
+        seq: int,
+        ip: str,
+        user: Optional[str],
+        carrera: Optional[str],
+        last_seen: float,
+        first_seen: float,
+        status_since: Optional[float] = None,
+    ) -> None:
+        """
+        Reinserta un host persistido conservando su ID (seq).
+        Debe llamarse antes de recibir heartbeats y en orden de last_seen;
+        los hosts vencidos pasan a offline en el siguiente expire().
+        """
+        status = STATUS_IN_USE if user else STATUS_ONLINE
+        host = HostRecord(hostname, seq, ip, user, carrera, status, last_seen, first_seen, status_since)
+        self.hosts[hostname] = host
+        insort(self._order, host, key=_SEQ)
+        insort(self._by_carrera.setdefault(host.carrera, []), host, key=_SEQ)
+        self._next_seq = max(self._next_seq, seq + 1)
+        self._alive[hostname] = None
+        self._count(host.carrera, status, 1)
+        self._mark_changed(hostname)
+
+    def expire(self, now: datetime) -> List[str]:
+        """
+        Marca como offline los hosts sin heartbeat dentro del timeout.
+        Solo recorre los hosts expirados. Retorna sus hostnames.
+        """
+        threshold = now.timestamp() - self.timeout
+        expired = []
+        while self._alive:
+            hostname = next(iter(self._alive))
+            host = self.hosts[hostname]
+            if host.last_seen > threshold:
+                break
+            del self._alive[hostname]
+            prev_status = host.status
+            host.status = STATUS_OFFLINE
+            host.status_since = host.last_seen + self.timeout
+            self._count(host.carrera, prev_status, -1)
+            self._count(host.carrera, STATUS_OFFLINE, 1)
+            self._mark_changed(hostname)
+            self._emit(EVENT_TRANSITION, host, prev_status, host.carrera)
+            expired.append(hostname)
+        return expired
+
+    def next_expiry(self) -> Optional[float]:
+        """
+        Epoch en que vence el próximo host vivo (None si no hay ninguno).
+        Con un timeout uniforme, el frente de _alive (menor last_seen) es
+        también el menor vencimiento: la cola cumple el rol de un min-heap
+        con consulta O(1) y sin reordenar en cada heartbeat.
+        """
+        for hostname in self._alive:
+            return self.hosts[hostname].last_seen + self.timeout
+        return None
+
+    def host_by_id(self, host_id: str) -> Optional[HostRecord]:
+        seq = _id_to_seq(host_id)
+        if seq is None:
+            return None
+        i = bisect_left(self._order, seq, key=_SEQ)
+        if i < len(self._order) and self._order[i].seq == seq:
+            return self._order[i]
+        return None
+
+    def remove_host(self, hostname: str) -> Optional[HostRecord]:
+        """
+        Da de baja un host: sale de todos los índices y queda una baja
+        para toda la flota en los deltas. Retorna el registro eliminado.
+        """
+        host = self.hosts.pop(hostname, None)
+        if host is None:
+            return None
+        for order in (self._order, self._by_carrera.get(host.carrera, [])):
+            i = bisect_left(order, host.seq, key=_SEQ)
+            if i < len(order) and order[i] is host:
+                del order[i]
+        if not self._by_carrera.get(host.carrera, True):
+            del self._by_carrera[host.carrera]
+        self._alive.pop(hostname, None)
+        self._changes.pop(hostname, None)
+        self._count(host.carrera, host.status, -1)
+        self.version += 1
+        self._add_tombstone(host.seq, None)
+        if self._listeners:
+            event = removed_event(hostname, host.id, host.status, host.carrera, self.version)
+            for listener in self._listeners:
+                listener(event)
+        return host
+
+    def evict(self, before: datetime) -> List[HostRecord]:
+        """
+        Da de baja los hosts offline sin heartbeat desde antes de `before`.
+        Recorre la flota: está pensado para correr cada varias horas.
+        """
+        return [self.remove_host(host.hostname) for host in self.stale(before)]
+
+    def stale(self, before: datetime) -> List[HostRecord]:
+        """Hosts offline sin heartbeat desde antes de `before` (sin darlos de baja)"""
+        cutoff = before.timestamp()
+        return [
+            host for host in self._order
+            if host.status == STATUS_OFFLINE and host.last_seen < cutoff
+        ]
+
+    def stats(self, carrera: Optional[str] = None) -> Dict[str, int]:
+        """Cantidad de hosts por status, global o de una carrera. O(carreras)."""
+        if carrera is not None:
+            return stats_dict(self._counts.get(carrera, {}))
+        totals: Dict[str, int] = {}
+        for counts in self._counts.values():
+            for status, n in counts.items():
+                totals[status] = totals.get(status, 0) + n
+        return stats_dict(totals)
+
+    def carrera_stats(self) -> Dict[Optional[str], Dict[str, int]]:
+        """Cantidad de hosts por status de cada carrera"""
+        return {carrera: stats_dict(counts) for carrera, counts in self._counts.items()}
+
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        """Registra un callback que recibe cada evento de cambio de estado"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def iter_hosts(self, carrera: Optional[str] = None) -> Iterator[HostRecord]:
+        """
+        Itera los registros en orden de ID.
+        Con carrera solo recorre el índice de esa carrera.
+        """
+        order = self._order if carrera is None else self._by_carrera.get(carrera, [])
+        return iter(order)
+
+    def changes_since(
+        self, since: int, carrera: Optional[str] = None
+    ) -> Optional[Tuple[List[HostRecord], List[str]]]:
+        """
+        Retorna (hosts cambiados, IDs dados de baja) desde la versión `since`.
+        Solo recorre los cambios posteriores a `since`, no la flota.
+
+        Retorna None si el delta no puede calcularse con certeza (versión
+        futura, p.ej. tras reiniciar el servidor, o bajas ya descartadas):
+        el cliente debe pedir el estado completo.
+        """
+        if since > self.version or since < self._tombstone_floor:
+            return None
+
+        changed = []
+        for hostname in reversed(self._changes):
+            if self._changes[hostname] <= since:
+                break
+            host = self.hosts[hostname]
+            if carrera is None or host.carrera == carrera:
+                changed.append(host)
+
+        removed = []
+        for (seq, old_carrera) in reversed(self._tombstones):
+            if self._tombstones[(seq, old_carrera)] <= since:
+                break
+            # Un cambio de carrera solo es baja para la vista de la carrera anterior
+            if old_carrera is None or old_carrera == carrera:
+                removed.append(f"pc-{seq:02d}")
+
+        changed.sort(key=_SEQ)
+        return changed, removed
+
+    def _emit(
+        self,
+        event_type: str,
+        host: HostRecord,
+        prev_status: Optional[str],
+        prev_carrera: Optional[str],
+    ) -> None:
+        """Notifica un cambio a los listeners (sin costo si no hay ninguno)"""
+        if not self._listeners:
+            return
+        event = {
+            "type": event_type,
+            "hostname": host.hostname,
+            "state": host,
+            "from": prev_status,
+            "prev_carrera": prev_carrera,
+            "version": self.version,
+        }
+        for listener in self._listeners:
+            listener(event)
+
+    def _count(self, carrera: Optional[str], status: str, delta: int) -> None:
+        counts = self._counts.setdefault(carrera, {})
+        n = counts.get(status, 0) + delta
+        if n:
+            counts[status] = n
+        else:
+            counts.pop(status, None)
+            if not counts:
+                del self._counts[carrera]
+
+    def _mark_changed(self, hostname: str) -> None:
+        """Asigna una nueva versión al host y lo mueve al final del registro de cambios"""
+        self.version += 1
+        self._changes.pop(hostname, None)
+        self._changes[hostname] = self.version
+
+    def _add_tombstone(self, seq: int, carrera: Optional[str]) -> None:
+        """Registra la salida de un host de una carrera (o de la flota con None)"""
+        key = (seq, carrera)
+        self._tombstones[key] = self.version
+        self._tombstones.move_to_end(key)
+        while len(self._tombstones) > MAX_TOMBSTONES:
+            _, version = self._tombstones.popitem(last=False)
+            self._tombstone_floor = max(self._tombstone_floor, version)
+
+    def _move_carrera(self, host: HostRecord, carrera: Optional[str]) -> None:
+        """Mueve un host del índice de su carrera anterior al de la nueva"""
+        old = self._by_carrera.get(host.carrera, [])
+        i = bisect_left(old, host.seq, key=_SEQ)
+        if i < len(old) and old[i] is host:
+            del old[i]
+        if not old:
+            self._by_carrera.pop(host.carrera, None)
+        # Para las vistas filtradas por la carrera anterior el host es una baja
+        self._add_tombstone(host.seq, host.carrera)
+        host.carrera = _intern(carrera)
+        insort(self._by_carrera.setdefault(host.carrera, []), host, key=_SEQ)
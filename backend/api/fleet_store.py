@@ -0,0 +1,214 @@
+"""
+Persistencia del estado de la flota (snapshot + log de cambios)
+Permite restaurar los hosts y su ID estable (hostname -> pc-NN) al reiniciar
+el servidor, sin esperar un ciclo completo de heartbeats.
+
+Formato en disco (JSON lines, un registro por host):
+- fleet.snapshot.json: {"lsn": N, "hosts": [registro, ...]} compacto
+- fleet.log: registros posteriores al snapshot, solo se agregan al final
+
+Las escrituras se agrupan (group commit): el request solo encola el registro
+y un hilo en segundo plano escribe el lote y hace un único fsync por intervalo.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from api.fleet_state import HostRecord
+
+
+class FleetStore:
+    """Snapshot + log append-only del estado de hosts, con group commit"""
+
+    SNAPSHOT_FILE = "fleet.snapshot.json"
+    LOG_FILE = "fleet.log"
+
+    def __init__(
+        self,
+        directory: str,
+        commit_interval: float = 1.0,
+        compact_every: int = 50000,
+    ):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        # Registros en el log antes de pedir un snapshot compacto
+        self.compact_every = compact_every
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, self.LOG_FILE)
+
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[int, str]] = []
+        self._pending_snapshot: Optional[Tuple[int, List[HostRecord]]] = None
+        self._lsn = 0
+        self._log_records = 0
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------
+    # Restauración
+    # ------------------------------------------------------------
+
+    def load(self) -> Dict[str, dict]:
+        """
+        Lee snapshot + log y retorna hostname -> último registro.
+        Los registros con "deleted" eliminan el host.
+        """
+        hosts: Dict[str, dict] = {}
+        snapshot_lsn = 0
+
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_lsn = snapshot.get("lsn", 0)
+            for record in snapshot.get("hosts", []):
+                hosts[record["hostname"]] = record
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            print(f"⚠️  Snapshot de flota inválido, se ignora: {e}")
+
+        last_lsn = snapshot_lsn
+        replayed = 0
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Última línea truncada por un corte: se descarta
+                        continue
+                    lsn = record.get("lsn", 0)
+                    # Registros ya incluidos en el snapshot (compactación interrumpida)
+                    if lsn <= snapshot_lsn:
+                        continue
+                    if record.get("deleted"):
+                        hosts.pop(record["hostname"], None)
+                    else:
+                        hosts[record["hostname"]] = record
+                    last_lsn = max(last_lsn, lsn)
+                    replayed += 1
+        except FileNotFoundError:
+            pass
+
+        self._lsn = last_lsn
+        self._log_records = replayed
+        return hosts
+
+    # ------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------
+
+    def start(self) -> None:
+        """Inicia el hilo de group commit"""
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="fleet-store", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Escribe lo pendiente y detiene el hilo"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+
+    def record_host(self, host: HostRecord) -> None:
+        """Encola el estado actual de un host (no bloquea ni toca disco)"""
+        self._enqueue(host_to_record(host))
+
+    def record_delete(self, hostname: str) -> None:
+        """Encola la eliminación de un host"""
+        self._enqueue({"hostname": hostname, "deleted": True})
+
+    def needs_compaction(self) -> bool:
+        return self._log_records >= self.compact_every
+
+    def compact(self, hosts: Dict[str, HostRecord]) -> None:
+        """
+        Encola un snapshot compacto del estado completo.
+        Debe llamarse desde el hilo que modifica el estado (el event loop),
+        que hace las veces de lock: la lista de hosts se toma ahí, junto con
+        el lsn actual, y no cambia después.
+
+        En el request solo se copia la lista de referencias; los registros se
+        arman y serializan en el hilo de escritura. Si un host cambia entre
+        medio, el snapshot puede llevar un valor más nuevo que su lsn, pero ese
+        cambio también está en el log con lsn mayor y se vuelve a aplicar
+        encima al restaurar, así que el resultado es el mismo.
+        """
+        snapshot = list(hosts.values())
+        with self._lock:
+            self._pending_snapshot = (self._lsn, snapshot)
+            self._log_records = 0
+        self._wakeup.set()
+
+    def _enqueue(self, record: dict) -> None:
+        with self._lock:
+            self._lsn += 1
+            record["lsn"] = self._lsn
+            self._pending.append((self._lsn, json.dumps(record, ensure_ascii=False)))
+            self._log_records += 1
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.commit_interval)
+            self._wakeup.clear()
+            # Leído antes del lote: si stop() llegó durante un lote en curso,
+            # lo encolado antes de stop() (snapshot final incluido) va en el próximo
+            stopping = self._stopping
+            try:
+                self._commit()
+            except OSError as e:
+                print(f"⚠️  Error persistiendo estado de flota: {e}")
+            if stopping:
+                break
+
+    def _commit(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            snapshot, self._pending_snapshot = self._pending_snapshot, None
+
+        if snapshot is not None:
+            snapshot_lsn, hosts = snapshot
+            records = [host_to_record(host) for host in hosts]
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"lsn": snapshot_lsn, "hosts": records}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # El log anterior ya está contenido en el snapshot
+            pending = [(lsn, line) for lsn, line in pending if lsn > snapshot_lsn]
+            with open(self.log_path, "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for _, line in pending)
+                f.flush()
+                os.fsync(f.fileno())
+            return
+
+        if not pending:
+            return
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.writelines(line + "\n" for _, line in pending)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def host_to_record(host: HostRecord) -> dict:
+    """Campos persistidos de un host (timestamps como epoch)"""
+    return {
+        "hostname": host.hostname,
+        "seq": host.seq,
+        "ip": host.ip,
+        "user": host.user,
+        "carrera": host.carrera,
+        "last_seen": host.last_seen,
+        "first_seen": host.first_seen,
+        "status_since": host.status_since,
+    }
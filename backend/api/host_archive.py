@@ -0,0 +1,167 @@
+"""
+Archivo de hosts dados de baja
+Los hosts retirados, reinstalados o renombrados dejan de enviar heartbeats
+y quedarían para siempre como offline. Tras UNINET_HOST_TTL_DAYS sin
+heartbeat salen del estado en memoria y se agregan a un archivo JSON lines
+en disco, donde se pueden consultar por hostname o por su antiguo ID.
+
+- Cada baja es una línea agregada al final (un solo write con O_APPEND,
+  seguro entre workers)
+- El índice hostname/ID -> offset vive en memoria y se actualiza leyendo
+  solo lo agregado desde la última vez
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from api.fleet_backend import FleetBackend
+from api.fleet_state import HostRecord
+
+
+class HostArchive:
+    """Archivo append-only de hosts dados de baja con índice de offsets"""
+
+    FILE = "hosts.archive.jsonl"
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, self.FILE)
+        self._by_hostname: Dict[str, int] = {}
+        self._by_id: Dict[str, int] = {}
+        # Bytes del archivo ya indexados
+        self._indexed = 0
+
+    def add(self, hosts: Iterable[HostRecord], reason: str, now: Optional[float] = None) -> int:
+        """Archiva los registros dados de baja; retorna cuántos escribió"""
+        now = time.time() if now is None else now
+        lines = [
+            json.dumps({
+                "hostname": host.hostname,
+                "id": host.id,
+                "ip": host.ip,
+                "user": host.user,
+                "carrera": host.carrera,
+                "first_seen": host.first_seen,
+                "last_seen": host.last_seen,
+                "archived_at": now,
+                "reason": reason,
+            }, ensure_ascii=False)
+            for host in hosts
+        ]
+        if not lines:
+            return 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, ("\n".join(lines) + "\n").encode("utf-8"))
+            # En disco antes de que los hosts salgan del estado (ver HostEvictor)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return len(lines)
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Última baja de un hostname o de un ID (pc-NN)"""
+        self._refresh()
+        offset = self._by_hostname.get(key)
+        if offset is None:
+            offset = self._by_id.get(key)
+        if offset is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def recent(self, limit: int) -> List[dict]:
+        """Últimas `limit` bajas, la más reciente primero"""
+        self._refresh()
+        offsets = sorted(self._by_hostname.values(), reverse=True)[:limit]
+        if not offsets:
+            # Sin bajas todavía (el archivo puede no existir)
+            return []
+        result = []
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                result.append(json.loads(f.readline()))
+        return result
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._by_hostname)
+
+    def _refresh(self) -> None:
+        """Indexa las líneas agregadas desde la última lectura (propias o de otros workers)"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size <= self._indexed:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed)
+            offset = self._indexed
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Línea a medio escribir: se indexa en la próxima lectura
+                    break
+                try:
+                    record = json.loads(line)
+                    self._by_hostname[record["hostname"]] = offset
+                    self._by_id[record["id"]] = offset
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        self._indexed = offset
+
+
+class HostEvictor:
+    """
+    Tarea de fondo que cada `interval` segundos da de baja los hosts
+    offline sin heartbeat hace más de `ttl` y los archiva.
+    """
+
+    def __init__(
+        self,
+        fleet: FleetBackend,
+        archive: HostArchive,
+        ttl: timedelta,
+        interval: float = 3600.0,
+    ):
+        self.fleet = fleet
+        self.archive = archive
+        self.ttl = ttl
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def evict(self, ttl: Optional[timedelta] = None, reason: str = "ttl") -> List[HostRecord]:
+        """Baja y archivo inmediatos (también usado por la purga manual)"""
+        # El archivo se escribe antes de sacar los hosts del estado: si falla
+        # (disco lleno, permisos) no se pierde ninguno
+        evicted = self.fleet.evict(
+            datetime.now() - (self.ttl if ttl is None else ttl),
+            archive=lambda hosts: self.archive.add(hosts, reason),
+        )
+        if evicted:
+            print(f"📦 {len(evicted)} hosts sin heartbeat archivados ({reason})")
+        return evicted
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.evict()
+            except Exception as e:
+                print(f"⚠️  Error archivando hosts inactivos: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,329 @@
+"""
+Cola de comandos de control para los agentes
+Los comandos (bloquear/desbloquear internet, bloquear sesión, recargar
+configuración) se encolan por host o por carrera y viajan en la respuesta
+del heartbeat: no hace falta una segunda conexión por PC y una acción
+sobre toda una carrera se entrega en un solo ciclo de heartbeats.
+
+Entrega al menos una vez: un comando se reenvía en cada heartbeat hasta
+que el agente lo confirma (campo `acks` del heartbeat siguiente).
+- Comandos de host: se borran al confirmarse
+- Comandos de carrera: cada host guarda un cursor (último ID confirmado)
+  por carrera; los IDs crecen siempre, así el cursor basta
+
+Backends como fleet_backend: memory (un worker) o sqlite (--workers N).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+COMMAND_BLOCK_INTERNET = "block_internet"
+COMMAND_UNBLOCK_INTERNET = "unblock_internet"
+COMMAND_LOCK_SESSION = "lock_session"
+COMMAND_REFRESH_CONFIG = "refresh_config"
+
+COMMAND_TYPES = (
+    COMMAND_BLOCK_INTERNET,
+    COMMAND_UNBLOCK_INTERNET,
+    COMMAND_LOCK_SESSION,
+    COMMAND_REFRESH_CONFIG,
+)
+
+# Vigencia por defecto de un comando no confirmado (segundos)
+DEFAULT_TTL = 3600
+
+
+def _public(command: dict) -> dict:
+    """Lo que recibe el agente: sin destino ni tiempos"""
+    return {"id": command["id"], "type": command["type"], "args": command["args"]}
+
+
+class CommandQueue(ABC):
+    """Operaciones sobre la cola de comandos (ver docstring del módulo)"""
+
+    @abstractmethod
+    def enqueue(
+        self,
+        command_type: str,
+        args: dict,
+        hostname: Optional[str] = None,
+        carrera: Optional[str] = None,
+        ttl: float = DEFAULT_TTL,
+    ) -> dict:
+        """Encola un comando para un hostname o para toda una carrera"""
+
+    @abstractmethod
+    def pending(self, hostname: str, carrera: Optional[str], acks: Iterable[int] = ()) -> List[dict]:
+        """Registra las confirmaciones del host y retorna sus comandos pendientes"""
+
+    @abstractmethod
+    def list(self) -> List[dict]:
+        """Comandos vigentes, en orden de ID"""
+
+    @abstractmethod
+    def cancel(self, command_id: int) -> bool:
+        """Retira un comando; False si no existe"""
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+# ============================================================
+# BACKEND EN MEMORIA
+# ============================================================
+
+class MemoryCommandQueue(CommandQueue):
+    """
+    Cola en memoria de un solo worker.
+
+    - pending() es O(1) mientras no haya comandos (caso normal)
+    - Los comandos no se persisten: tienen vigencia corta y el admin
+      puede reenviarlos. Los IDs parten de la hora en ms para que un
+      agente no confunda comandos nuevos con los de antes de reiniciar
+    """
+
+    def __init__(self):
+        self._next_id = int(time.time() * 1000)
+        self._by_id: Dict[int, dict] = {}
+        self._host: Dict[str, Dict[int, dict]] = {}
+        self._carrera: Dict[str, List[dict]] = {}
+        self._cursors: Dict[Tuple[str, str], int] = {}
+
+    def enqueue(self, command_type, args, hostname=None, carrera=None, ttl=DEFAULT_TTL) -> dict:
+        now = time.time()
+        self._prune(now)
+        self._next_id += 1
+        command = {
+            "id": self._next_id,
+            "type": command_type,
+            "args": args,
+            "hostname": hostname,
+            "carrera": None if hostname else (carrera or ""),
+            "created_at": now,
+            "expires_at": now + ttl,
+        }
+        self._by_id[command["id"]] = command
+        if hostname:
+            self._host.setdefault(hostname, {})[command["id"]] = command
+        else:
+            self._carrera.setdefault(carrera or "", []).append(command)
+        return command
+
+    def pending(self, hostname, carrera, acks=()) -> List[dict]:
+        if not self._by_id:
+            return []
+        carrera = carrera or ""
+        host_queue = self._host.get(hostname)
+
+        for command_id in acks:
+            command = self._by_id.get(command_id)
+            if command is None:
+                continue
+            if command["hostname"] == hostname:
+                del self._by_id[command_id]
+                host_queue.pop(command_id, None)
+            elif command["carrera"] == carrera:
+                key = (hostname, carrera)
+                self._cursors[key] = max(self._cursors.get(key, 0), command_id)
+
+        now = time.time()
+        result = []
+        if host_queue:
+            result.extend(_public(c) for c in host_queue.values() if c["expires_at"] > now)
+        shared = self._carrera.get(carrera)
+        if shared:
+            cursor = self._cursors.get((hostname, carrera), 0)
+            result.extend(_public(c) for c in shared if c["id"] > cursor and c["expires_at"] > now)
+        result.sort(key=lambda c: c["id"])
+        return result
+
+    def list(self) -> List[dict]:
+        self._prune(time.time())
+        return sorted(self._by_id.values(), key=lambda c: c["id"])
+
+    def cancel(self, command_id) -> bool:
+        if not self._remove(command_id):
+            return False
+        self._prune(time.time())
+        return True
+
+    def _remove(self, command_id: int) -> bool:
+        command = self._by_id.pop(command_id, None)
+        if command is None:
+            return False
+        if command["hostname"]:
+            self._host.get(command["hostname"], {}).pop(command_id, None)
+        else:
+            key = command["carrera"] or ""
+            self._carrera[key] = [c for c in self._carrera.get(key, []) if c["id"] != command_id]
+        return True
+
+    def _prune(self, now: float) -> None:
+        """Descarta vencidos y cursores de carreras sin comandos vigentes"""
+        for command_id in [i for i, c in self._by_id.items() if c["expires_at"] <= now]:
+            self._remove(command_id)
+        for hostname in [h for h, q in self._host.items() if not q]:
+            del self._host[hostname]
+        for carrera in [k for k, q in self._carrera.items() if not q]:
+            del self._carrera[carrera]
+            for key in [k for k in self._cursors if k[1] == carrera]:
+                del self._cursors[key]
+
+
+# ============================================================
+# BACKEND SQLITE (compartido entre workers)
+# ============================================================
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    args TEXT NOT NULL,
+    hostname TEXT,
+    carrera TEXT,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_commands_host ON commands(hostname) WHERE hostname IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_commands_carrera ON commands(carrera, id) WHERE carrera IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS cursors (
+    hostname TEXT NOT NULL,
+    carrera TEXT NOT NULL,
+    cursor INTEGER NOT NULL,
+    PRIMARY KEY (hostname, carrera)
+);
+"""
+
+_COMMAND_COLUMNS = "id, type, args, hostname, carrera, created_at, expires_at"
+
+
+def _row_to_command(row: sqlite3.Row) -> dict:
+    command = dict(row)
+    command["args"] = json.loads(command["args"])
+    return command
+
+
+class SqliteCommandQueue(CommandQueue):
+    """
+    Cola compartida en SQLite (WAL), junto a la base de la flota.
+    Cada heartbeat hace una consulta indexada; las confirmaciones,
+    solo cuando el agente envía `acks`.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(
+                self.db_path, timeout=10, isolation_level=None, check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SQLITE_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def enqueue(self, command_type, args, hostname=None, carrera=None, ttl=DEFAULT_TTL) -> dict:
+        with self._lock:
+            db = self._db()
+            now = time.time()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                self._prune(now)
+                cursor = db.execute(
+                    "INSERT INTO commands (type, args, hostname, carrera, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (command_type, json.dumps(args), hostname or None,
+                     None if hostname else (carrera or ""), now, now + ttl),
+                )
+                row = db.execute(
+                    f"SELECT {_COMMAND_COLUMNS} FROM commands WHERE id = ?", (cursor.lastrowid,)
+                ).fetchone()
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            return _row_to_command(row)
+
+    def pending(self, hostname, carrera, acks=()) -> List[dict]:
+        carrera = carrera or ""
+        with self._lock:
+            db = self._db()
+            acks = list(acks)
+            if acks:
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    marks = ",".join("?" * len(acks))
+                    db.execute(
+                        f"DELETE FROM commands WHERE hostname = ? AND id IN ({marks})", [hostname, *acks]
+                    )
+                    top = db.execute(
+                        f"SELECT MAX(id) FROM commands WHERE carrera = ? AND id IN ({marks})", [carrera, *acks]
+                    ).fetchone()[0]
+                    if top is not None:
+                        db.execute(
+                            "INSERT INTO cursors (hostname, carrera, cursor) VALUES (?, ?, ?) "
+                            "ON CONFLICT (hostname, carrera) DO UPDATE SET cursor = MAX(cursor, excluded.cursor)",
+                            (hostname, carrera, top),
+                        )
+                    db.execute("COMMIT")
+                except Exception:
+                    db.execute("ROLLBACK")
+                    raise
+
+            rows = db.execute(
+                "SELECT id, type, args FROM commands WHERE expires_at > ? AND ("
+                "hostname = ? OR (carrera = ? AND id > COALESCE("
+                "(SELECT cursor FROM cursors WHERE hostname = ? AND carrera = ?), 0))"
+                ") ORDER BY id",
+                (time.time(), hostname, carrera, hostname, carrera),
+            ).fetchall()
+        return [{"id": row["id"], "type": row["type"], "args": json.loads(row["args"])} for row in rows]
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT {_COMMAND_COLUMNS} FROM commands WHERE expires_at > ? ORDER BY id", (time.time(),)
+            ).fetchall()
+        return [_row_to_command(row) for row in rows]
+
+    def cancel(self, command_id) -> bool:
+        with self._lock:
+            cursor = self._db().execute("DELETE FROM commands WHERE id = ?", (command_id,))
+            return cursor.rowcount > 0
+
+    def _prune(self, now: float) -> None:
+        """Dentro de una transacción: vencidos y cursores de carreras sin comandos"""
+        db = self._db()
+        db.execute("DELETE FROM commands WHERE expires_at <= ?", (now,))
+        db.execute(
+            "DELETE FROM cursors WHERE carrera NOT IN "
+            "(SELECT DISTINCT carrera FROM commands WHERE carrera IS NOT NULL)"
+        )
+
+
+def create_command_queue(state_dir: str) -> CommandQueue:
+    """Misma elección de backend que la flota (UNINET_FLEET_BACKEND)"""
+    if os.environ.get("UNINET_FLEET_BACKEND", "memory").lower() == "sqlite":
+        return SqliteCommandQueue(os.path.join(state_dir, "commands.db"))
+    return MemoryCommandQueue()
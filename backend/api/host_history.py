@@ -0,0 +1,435 @@
+"""
+Historial de estado por host para reportes de uso del laboratorio
+Se alimenta de los eventos del backend de la flota (no de cada heartbeat):
+
+- muestras: anillo de tamaño fijo con las últimas transiciones
+  (timestamp, status, user) de cada host
+- buckets: segundos en cada status por intervalo fijo (BUCKET_SECONDS),
+  por host y agregados por carrera, con retención acotada
+
+Las consultas de ocupación suman buckets ya acumulados más el intervalo
+abierto actual de cada host: no se reproducen eventos.
+
+Con el backend compartido (SQLite, --workers N) cada worker recibe los mismos
+eventos y arma el mismo historial, pero history.json lo guarda uno solo: el
+que tiene el lock history.lock (ver claim()).
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from api.fleet_state import (
+    EVENT_REGISTERED, EVENT_REMOVED, EVENT_TRANSITION, STATUS_IN_USE, STATUS_OFFLINE, STATUS_ONLINE,
+    _intern,
+)
+
+
+# Granularidad de los buckets (segundos) y días que se conservan
+BUCKET_SECONDS = 900
+RETENTION_DAYS = 14
+
+# Transiciones recientes que se conservan con detalle por host
+RING_SIZE = 128
+
+_STATUS_CODES = {STATUS_ONLINE: 0, STATUS_IN_USE: 1, STATUS_OFFLINE: 2}
+_STATUSES = (STATUS_ONLINE, STATUS_IN_USE, STATUS_OFFLINE)
+
+
+def _split(start: float, end: float) -> Iterator[Tuple[int, float]]:
+    """Reparte el intervalo [start, end) en (índice de bucket, segundos)"""
+    while start < end:
+        idx = int(start // BUCKET_SECONDS)
+        stop = min(end, (idx + 1) * BUCKET_SECONDS)
+        yield idx, stop - start
+        start = stop
+
+
+class Buckets:
+    """
+    Segundos por status en buckets consecutivos a partir de `base`.
+    Un array compacto por status (sin objetos por bucket); los buckets
+    más antiguos que la retención se descartan por bloques.
+    """
+
+    __slots__ = ("base", "series")
+
+    def __init__(self, typecode: str):
+        self.base: Optional[int] = None
+        self.series = tuple(array(typecode) for _ in _STATUSES)
+
+    def add(self, start: float, end: float, status: str) -> None:
+        code = _STATUS_CODES[status]
+        limit = (1 << (8 * self.series[0].itemsize)) - 1
+        for idx, seconds in _split(start, end):
+            pos = self._slot(idx)
+            if pos is not None:
+                series = self.series[code]
+                series[pos] = min(series[pos] + int(round(seconds)), limit)
+
+    def _slot(self, idx: int) -> Optional[int]:
+        if self.base is None:
+            self.base = idx
+        if idx < self.base:
+            # Más antiguo que lo retenido
+            return None
+        pos = idx - self.base
+        length = len(self.series[0])
+        if pos >= length:
+            zeros = [0] * (pos + 1 - length)
+            for series in self.series:
+                series.extend(zeros)
+        retention = RETENTION_DAYS * 86400 // BUCKET_SECONDS
+        excess = len(self.series[0]) - retention
+        # Recortar en bloques de un día para no mover el array en cada bucket
+        if excess >= 86400 // BUCKET_SECONDS:
+            for series in self.series:
+                del series[:excess]
+            self.base += excess
+            pos -= excess
+        return pos
+
+    def window(self, first: int, last: int) -> List[List[float]]:
+        """[online, inUse, offline] de cada bucket entre los índices first..last"""
+        rows = []
+        for idx in range(first, last + 1):
+            pos = idx - self.base if self.base is not None else -1
+            if 0 <= pos < len(self.series[0]):
+                rows.append([float(series[pos]) for series in self.series])
+            else:
+                rows.append([0.0, 0.0, 0.0])
+        return rows
+
+    def to_json(self) -> dict:
+        return {"base": self.base, "series": [series.tolist() for series in self.series]}
+
+    def load_json(self, data: dict) -> None:
+        self.base = data.get("base")
+        for series, values in zip(self.series, data.get("series", [])):
+            series.extend(values)
+
+
+class HostTimeline:
+    """Intervalo abierto, anillo de muestras y buckets de un host"""
+
+    __slots__ = (
+        "hostname", "host_id", "carrera", "status", "since", "user",
+        "_ts", "_codes", "_users", "_head", "buckets",
+    )
+
+    def __init__(self, hostname: str, host_id: str):
+        self.hostname = hostname
+        self.host_id = host_id
+        self.carrera: Optional[str] = None
+        self.status: Optional[str] = None
+        self.since = 0.0
+        self.user: Optional[str] = None
+        self._ts = array("d")
+        self._codes = array("B")
+        self._users: List[Optional[str]] = []
+        self._head = 0
+        self.buckets = Buckets("H")
+
+    def add_sample(self, ts: float, status: str, user: Optional[str]) -> None:
+        if len(self._ts) < RING_SIZE:
+            self._ts.append(ts)
+            self._codes.append(_STATUS_CODES[status])
+            self._users.append(user)
+            return
+        # Anillo lleno: sobrescribir la muestra más antigua
+        self._ts[self._head] = ts
+        self._codes[self._head] = _STATUS_CODES[status]
+        self._users[self._head] = user
+        self._head = (self._head + 1) % RING_SIZE
+
+    def samples(self) -> Iterator[Tuple[float, str, Optional[str]]]:
+        """Muestras en orden cronológico"""
+        n = len(self._ts)
+        for i in range(n):
+            pos = (self._head + i) % n
+            yield self._ts[pos], _STATUSES[self._codes[pos]], self._users[pos]
+
+    def to_json(self) -> dict:
+        return {
+            "hostname": self.hostname,
+            "id": self.host_id,
+            "carrera": self.carrera,
+            "status": self.status,
+            "since": self.since,
+            "user": self.user,
+            "samples": [list(sample) for sample in self.samples()],
+            "buckets": self.buckets.to_json(),
+        }
+
+
+class HostHistory:
+    """
+    Historial de todos los hosts, alimentado por los listeners de la flota.
+
+    Cada host tiene un intervalo abierto (status y carrera desde `since`);
+    al cambiar, el intervalo se cierra y sus segundos se suman a los
+    buckets del host y a los de su carrera en ese momento.
+    """
+
+    FILE_NAME = "history.json"
+    LOCK_NAME = "history.lock"
+
+    def __init__(self):
+        self.hosts: Dict[str, HostTimeline] = {}
+        self._by_id: Dict[str, str] = {}
+        self.carreras: Dict[Optional[str], Buckets] = {}
+        # Si este proceso guarda history.json (ver claim())
+        self.owner = True
+        self._lock_file = None
+
+    # ------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------
+
+    def record_event(self, event: dict) -> None:
+        """Listener de la flota (mismo formato de evento que FleetState)"""
+        if event["type"] == EVENT_REMOVED:
+            # Host dado de baja: su historial deja de ocupar memoria; los
+            # buckets de la carrera conservan lo ya acumulado
+            timeline = self.hosts.pop(event["hostname"], None)
+            if timeline is not None and self._by_id.get(timeline.host_id) == timeline.hostname:
+                del self._by_id[timeline.host_id]
+            return
+        host = event["state"]
+        timeline = self.hosts.get(host.hostname)
+        if timeline is None:
+            timeline = HostTimeline(host.hostname, host.id)
+            self.hosts[host.hostname] = timeline
+            self._by_id[host.id] = host.hostname
+
+        if event["type"] == EVENT_REGISTERED:
+            ts = host.first_seen
+        elif event["type"] == EVENT_TRANSITION:
+            ts = host.status_since
+        else:
+            ts = host.last_seen
+
+        if timeline.status is not None:
+            self._close(timeline, ts)
+        if timeline.status != host.status or timeline.user != host.user:
+            timeline.add_sample(ts, host.status, host.user)
+        timeline.status = host.status
+        timeline.carrera = host.carrera
+        timeline.user = host.user
+        timeline.since = ts
+
+    def _close(self, timeline: HostTimeline, ts: float) -> None:
+        """Acumula el intervalo abierto hasta ts en los buckets"""
+        if ts <= timeline.since:
+            return
+        timeline.buckets.add(timeline.since, ts, timeline.status)
+        carrera_buckets = self.carreras.get(timeline.carrera)
+        if carrera_buckets is None:
+            carrera_buckets = self.carreras[timeline.carrera] = Buckets("L")
+        carrera_buckets.add(timeline.since, ts, timeline.status)
+
+    # ------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------
+
+    def hostname_for(self, host_id: str) -> Optional[str]:
+        return self._by_id.get(host_id)
+
+    @staticmethod
+    def _open_rows(
+        rows: List[List[float]], first: int, timelines: List[HostTimeline], start: float, end: float
+    ) -> None:
+        """Suma a los buckets el intervalo abierto (aún no acumulado) de cada host"""
+        # El intervalo abierto termina ahora: un rango hacia el futuro no suma segundos
+        end = min(end, time.time())
+        for timeline in timelines:
+            if timeline.status is None:
+                continue
+            code = _STATUS_CODES[timeline.status]
+            for idx, seconds in _split(max(timeline.since, start), end):
+                rows[idx - first][code] += seconds
+
+    @staticmethod
+    def _series(rows: List[List[float]], first: int, step: int) -> List[dict]:
+        """Agrupa los buckets de a `step` para la respuesta"""
+        series = []
+        for i in range(0, len(rows), step):
+            chunk = rows[i:i + step]
+            series.append({
+                "start": datetime.fromtimestamp((first + i) * BUCKET_SECONDS).isoformat(),
+                "online": round(sum(row[0] for row in chunk)),
+                "inUse": round(sum(row[1] for row in chunk)),
+                "offline": round(sum(row[2] for row in chunk)),
+            })
+        return series
+
+    @staticmethod
+    def _totals(rows: List[List[float]]) -> dict:
+        online = sum(row[0] for row in rows)
+        in_use = sum(row[1] for row in rows)
+        offline = sum(row[2] for row in rows)
+        tracked = online + in_use + offline
+        return {
+            "online": round(online),
+            "inUse": round(in_use),
+            "offline": round(offline),
+            # Fracción del tiempo observado en que el equipo estuvo en uso
+            "occupancy": round(in_use / tracked, 4) if tracked else 0.0,
+        }
+
+    def timeline(self, hostname: str, start: float, end: float, step: int = 1) -> Optional[dict]:
+        """Muestras y buckets de un host en [start, end]"""
+        timeline = self.hosts.get(hostname)
+        if timeline is None:
+            return None
+        first, last = int(start // BUCKET_SECONDS), int(end // BUCKET_SECONDS)
+        rows = timeline.buckets.window(first, last)
+        self._open_rows(rows, first, [timeline], start, end)
+        return {
+            "id": timeline.host_id,
+            "name": timeline.hostname,
+            "carrera": timeline.carrera,
+            "samples": [
+                {"ts": datetime.fromtimestamp(ts).isoformat(), "status": status, "user": user}
+                for ts, status, user in timeline.samples()
+                if start <= ts <= end
+            ],
+            "buckets": self._series(rows, first, step),
+            "totals": self._totals(rows),
+        }
+
+    def occupancy(self, carrera: Optional[str], start: float, end: float, step: int = 1) -> dict:
+        """Ocupación agregada de una carrera y de cada uno de sus hosts actuales"""
+        first, last = int(start // BUCKET_SECONDS), int(end // BUCKET_SECONDS)
+        members = [t for t in self.hosts.values() if t.carrera == carrera]
+        carrera_buckets = self.carreras.get(carrera)
+        if carrera_buckets is not None:
+            rows = carrera_buckets.window(first, last)
+        else:
+            rows = [[0.0, 0.0, 0.0] for _ in range(first, last + 1)]
+        self._open_rows(rows, first, members, start, end)
+
+        hosts = []
+        for timeline in sorted(members, key=lambda t: t.host_id):
+            host_rows = timeline.buckets.window(first, last)
+            self._open_rows(host_rows, first, [timeline], start, end)
+            hosts.append({"id": timeline.host_id, "name": timeline.hostname, **self._totals(host_rows)})
+
+        return {
+            "carrera": carrera,
+            "buckets": self._series(rows, first, step),
+            "totals": self._totals(rows),
+            "hosts": hosts,
+        }
+
+    # ------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------
+
+    def load(self, directory: str) -> None:
+        """Restaura el historial guardado al apagar (si existe)"""
+        path = os.path.join(directory, self.FILE_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            print(f"⚠️  Historial de hosts inválido, se ignora: {e}")
+            return
+
+        for item in data.get("hosts", []):
+            timeline = HostTimeline(item["hostname"], item["id"])
+            timeline.carrera = _intern(item.get("carrera"))
+            timeline.status = item.get("status")
+            timeline.since = item.get("since", 0.0)
+            timeline.user = _intern(item.get("user"))
+            for ts, status, user in item.get("samples", []):
+                timeline.add_sample(ts, status, _intern(user))
+            timeline.buckets.load_json(item.get("buckets", {}))
+            self.hosts[timeline.hostname] = timeline
+            self._by_id[timeline.host_id] = timeline.hostname
+        for item in data.get("carreras", []):
+            buckets = self.carreras[item["carrera"]] = Buckets("L")
+            buckets.load_json(item["buckets"])
+
+    def claim(self, directory: str) -> bool:
+        """
+        Con varios workers, toma el lock que da derecho a guardar history.json
+        (se mantiene hasta que el proceso termina). Sin él save() no escribe:
+        así un worker no pisa el historial guardado por otro.
+        """
+        os.makedirs(directory, exist_ok=True)
+        lock_file = open(os.path.join(directory, self.LOCK_NAME), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            self.owner = False
+            return False
+        self._lock_file = lock_file
+        self.owner = True
+        return True
+
+    def save(self, directory: str) -> None:
+        """Guarda el historial completo (tmp + rename); solo el worker dueño"""
+        if not self.owner:
+            return
+        self.write(directory, self.snapshot())
+
+    def snapshot(self) -> dict:
+        """Contenido de history.json (en el hilo que recibe los eventos)"""
+        return {
+            "hosts": [timeline.to_json() for timeline in self.hosts.values()],
+            "carreras": [
+                {"carrera": carrera, "buckets": buckets.to_json()}
+                for carrera, buckets in self.carreras.items()
+            ],
+        }
+
+    def write(self, directory: str, data: dict) -> None:
+        """Escribe un snapshot (tmp + rename); puede correr en otro hilo"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.FILE_NAME)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class HistoryFlusher:
+    """
+    Tarea de fondo que guarda history.json cada `interval` segundos, así una
+    caída del proceso pierde a lo sumo ese intervalo. El snapshot se arma en
+    el event loop (donde llegan los eventos) y se escribe en un hilo.
+    """
+
+    def __init__(self, history: HostHistory, directory: str, interval: float = 300.0):
+        self.history = history
+        self.directory = directory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.history.owner:
+                continue
+            try:
+                await asyncio.to_thread(self.history.write, self.directory, self.history.snapshot())
+            except Exception as e:
+                print(f"⚠️  Error guardando historial de hosts: {e}")
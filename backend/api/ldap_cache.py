@@ -0,0 +1,97 @@
+"""
+Caché de grupos LDAP (carreras) por usuario
+Cada consulta de grupos es un `ldapsearch` (fork/exec + ida y vuelta al
+servidor LDAP); el middleware de logs la hacía en cada request con
+X-Username. La pertenencia a grupos cambia poco, así que se guarda:
+
+- TTL para resultados con grupos y uno más corto para resultados vacíos
+  o fallidos (caché negativo: un LDAP caído no se consulta en cada request)
+- LRU acotado a `max_entries` usuarios
+- invalidate() al crear/eliminar usuarios; hits/misses para monitoreo
+
+Compartida por api/carrera_logger.py y api/users.py.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class GroupCache:
+    """Grupos por username con TTL, caché negativo y LRU (thread-safe)"""
+
+    def __init__(self, ttl: float = 300.0, negative_ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # username -> (grupos, vence)
+        self._entries: "OrderedDict[str, Tuple[Tuple[str, ...], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "GroupCache":
+        """TTLs configurables con UNINET_LDAP_CACHE_TTL / UNINET_LDAP_CACHE_NEGATIVE_TTL"""
+        return cls(
+            ttl=_env_float("UNINET_LDAP_CACHE_TTL", 300.0),
+            negative_ttl=_env_float("UNINET_LDAP_CACHE_NEGATIVE_TTL", 30.0),
+        )
+
+    def get(self, username: str) -> Optional[List[str]]:
+        """Grupos en caché, o None si no hay entrada vigente (miss)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return list(entry[0])
+
+    def put(self, username: str, groups: List[str]) -> None:
+        ttl = self.ttl if groups else self.negative_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[username] = (tuple(groups), time.monotonic() + ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def load(self, username: str, loader: Callable[[str], List[str]]) -> List[str]:
+        """Consulta con `loader` (sin caché) y guarda el resultado"""
+        groups = loader(username)
+        self.put(username, groups)
+        return groups
+
+    def get_or_load(self, username: str, loader: Callable[[str], List[str]]) -> List[str]:
+        groups = self.get(username)
+        if groups is None:
+            groups = self.load(username, loader)
+        return groups
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        """Olvida un usuario, o todo el caché si username es None"""
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+group_cache = GroupCache.from_env()
@@ -0,0 +1,64 @@
+"""
+Catálogo de carreras y uids presentes en el log de carreras
+Por cada valor: cantidad de registros y primer/último `ts` visto.
+
+No se recalcula leyendo el log: cada parte guarda su resumen y aquí solo
+se combinan (costo proporcional a la cantidad de valores distintos).
+- Segmento activo: lo mantiene el índice lateral (<LOG_FILE>.idx) a
+  medida que se agregan líneas
+- Segmentos cerrados: el resumen queda en su .meta.json al comprimirse
+"""
+
+from typing import Dict, List, Optional
+
+# Campos catalogados del registro
+CATALOG_FIELDS = ("carrera", "uid")
+
+# campo -> valor -> [cantidad, primer ts, último ts]
+Stats = Dict[str, Dict[str, list]]
+
+
+def empty_stats() -> Stats:
+    return {field: {} for field in CATALOG_FIELDS}
+
+
+def add_record(stats: Stats, record: dict) -> None:
+    ts = str(record.get("ts") or "")
+    for field in CATALOG_FIELDS:
+        value = record.get(field)
+        if not value:
+            continue
+        entry = stats[field].get(str(value))
+        if entry is None:
+            stats[field][str(value)] = [1, ts, ts]
+            continue
+        entry[0] += 1
+        if ts and (not entry[1] or ts < entry[1]):
+            entry[1] = ts
+        if ts > entry[2]:
+            entry[2] = ts
+
+
+def merge(into: Stats, other: Optional[Stats]) -> None:
+    if not other:
+        return
+    for field in CATALOG_FIELDS:
+        target = into[field]
+        for value, (count, first, last) in other.get(field, {}).items():
+            entry = target.get(value)
+            if entry is None:
+                target[value] = [count, first, last]
+                continue
+            entry[0] += count
+            if first and (not entry[1] or first < entry[1]):
+                entry[1] = first
+            if last > entry[2]:
+                entry[2] = last
+
+
+def describe(stats: Stats, field: str) -> List[dict]:
+    """Entradas de un campo ordenadas por valor, para la API"""
+    return [
+        {field: value, "count": count, "first_seen": first or None, "last_seen": last or None}
+        for value, (count, first, last) in sorted(stats[field].items())
+    ]
@@ -0,0 +1,235 @@
+"""
+Índice lateral (sidecar) del log JSON lines de carreras
+Mapea cada carrera y cada uid a los offsets (bytes) de sus líneas en el log,
+para que /api/logs?carrera=...&username=... vaya directo a los registros
+que coinciden en el segmento activo (ver log_segments.py), no solo en las
+últimas N líneas.
+
+- Incremental: solo se parsea lo agregado al log desde el último offset
+  indexado (`size`); si el log se truncó o rotó, se reconstruye
+- Persistido junto al log (<log>.idx) con reemplazo atómico, así un
+  reinicio no vuelve a leer todo el historial
+- Los offsets se guardan en arrays de enteros (8 bytes por línea y clave)
+- También lleva el catálogo del segmento activo (cantidad y primer/último
+  ts por carrera y uid, ver log_catalog.py)
+"""
+
+import base64
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from api import log_catalog
+
+# Campos indexados del registro
+INDEXED_FIELDS = ("carrera", "uid")
+
+# Líneas nuevas indexadas antes de volver a guardar el sidecar
+SAVE_EVERY = 10000
+
+_FORMAT_VERSION = 2
+
+
+def _encode(offsets: array) -> str:
+    return base64.b64encode(offsets.tobytes()).decode("ascii")
+
+
+def _decode(data: str) -> array:
+    offsets = array("q")
+    offsets.frombytes(base64.b64decode(data))
+    return offsets
+
+
+class LogRotated(Exception):
+    """El log se cerró o rotó durante la consulta: los offsets ya no son de este archivo"""
+
+
+class LogIndex:
+    """Offsets por carrera y por uid de un archivo de log"""
+
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self.index_path = log_path + ".idx"
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, array]] = {field: {} for field in INDEXED_FIELDS}
+        self._stats = log_catalog.empty_stats()
+        self._size = 0
+        self._inode: Optional[int] = None
+        self._unsaved = 0
+        self._loaded = False
+
+    # ------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------
+
+    def scan(
+        self,
+        carrera: Optional[str],
+        uid: Optional[str],
+        before: Optional[int] = None,
+        inode: Optional[int] = None,
+    ) -> Iterator[Tuple[int, dict]]:
+        """
+        (offset, registro) que coinciden, del más nuevo al más antiguo,
+        anteriores al offset `before` (None = desde el final).
+        Con `inode`, el archivo debe ser ese; si el log se cerró o rotó
+        entre medio lanza LogRotated (la consulta se puede reintentar).
+        """
+        with self._lock:
+            self._refresh()
+            offsets = self._matching(carrera, uid)
+            indexed = self._inode
+        if inode is not None and indexed != inode:
+            raise LogRotated(self.log_path)
+
+        # Los offsets están ordenados: se empieza justo antes de `before`
+        end = len(offsets) if before is None else bisect_left(offsets, before)
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            raise LogRotated(self.log_path)
+        with f:
+            if os.fstat(f.fileno()).st_ino != indexed:
+                # El log se cerró (segmentos) entre la indexación y la lectura
+                raise LogRotated(self.log_path)
+            for i in range(end - 1, -1, -1):
+                f.seek(offsets[i])
+                try:
+                    record = json.loads(f.readline())
+                except ValueError:
+                    continue
+                yield offsets[i], record
+
+    def stats(self) -> log_catalog.Stats:
+        """Copia del catálogo del segmento activo"""
+        with self._lock:
+            self._refresh()
+            result = log_catalog.empty_stats()
+            log_catalog.merge(result, self._stats)
+        return result
+
+    def _matching(self, carrera: Optional[str], uid: Optional[str]) -> Sequence[int]:
+        """Offsets ordenados que cumplen ambos filtros (intersección de listas)"""
+        lists = []
+        if carrera:
+            lists.append(self._postings["carrera"].get(carrera, array("q")))
+        if uid:
+            lists.append(self._postings["uid"].get(uid, array("q")))
+        if not lists:
+            return []
+        if len(lists) == 1:
+            return lists[0]
+        # Se recorre la lista más chica y cada offset se busca en la grande
+        # por bisección (ambas ordenadas): O(chica · log grande), sin copiarla
+        small, large = sorted(lists, key=len)
+        result = array("q")
+        lo = 0
+        for offset in small:
+            lo = bisect_left(large, offset, lo)
+            if lo == len(large):
+                break
+            if large[lo] == offset:
+                result.append(offset)
+        return result
+
+    # ------------------------------------------------------------
+    # Mantenimiento incremental
+    # ------------------------------------------------------------
+
+    def refresh(self) -> None:
+        """Indexa lo agregado al log desde la última vez"""
+        with self._lock:
+            self._refresh()
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def _index_record(self, offset: int, record: dict) -> None:
+        for field in INDEXED_FIELDS:
+            value = record.get(field)
+            if value:
+                self._postings[field].setdefault(str(value), array("q")).append(offset)
+        log_catalog.add_record(self._stats, record)
+
+    def _refresh(self) -> None:
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            self._reset(None)
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._size:
+            # Log rotado o truncado: los offsets anteriores ya no sirven
+            self._reset(stat.st_ino)
+        if stat.st_size == self._size:
+            return
+
+        with open(self.log_path, "rb") as f:
+            f.seek(self._size)
+            offset = self._size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Línea a medio escribir: queda para la próxima vez
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    self._index_record(offset, record)
+                offset += len(line)
+                self._unsaved += 1
+        self._size = offset
+        if self._unsaved >= SAVE_EVERY:
+            self._save()
+
+    def _reset(self, inode: Optional[int]) -> None:
+        self._postings = {field: {} for field in INDEXED_FIELDS}
+        self._stats = log_catalog.empty_stats()
+        self._size = 0
+        self._inode = inode
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != _FORMAT_VERSION:
+                return
+            self._postings = {
+                field: {key: _decode(value) for key, value in data["postings"].get(field, {}).items()}
+                for field in INDEXED_FIELDS
+            }
+            self._stats = {field: data["stats"].get(field, {}) for field in log_catalog.CATALOG_FIELDS}
+            self._size = data["size"]
+            self._inode = data["inode"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️  Índice de logs inválido, se reconstruye: {e}")
+            self._reset(None)
+
+    def _save(self) -> None:
+        data = {
+            "version": _FORMAT_VERSION,
+            "size": self._size,
+            "inode": self._inode,
+            "postings": {
+                field: {key: _encode(offsets) for key, offsets in postings.items()}
+                for field, postings in self._postings.items()
+            },
+            "stats": self._stats,
+        }
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+            self._unsaved = 0
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el índice de logs: {e}")
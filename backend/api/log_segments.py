@@ -0,0 +1,582 @@
+"""
+Log de carreras segmentado por tiempo
+El log ya no es un único archivo que crece sin límite:
+
+- Segmento activo: LOG_FILE (tail -f y el índice lateral siguen igual)
+- Al llegar el primer registro de un nuevo periodo (día UTC, u hora con
+  UNINET_LOG_SEGMENT=hour) el activo se cierra: se renombra a
+  <LOG_FILE>.<periodo> y un hilo lo comprime a .gz
+- Cada segmento cerrado tiene <segmento>.meta.json con min/max `ts`,
+  cantidad de registros, los conjuntos de carreras y uids presentes y su
+  resumen para el catálogo (log_catalog.py)
+
+Las consultas recorren los segmentos del más nuevo al más antiguo y saltan
+sin descomprimir los que por metadata no pueden coincidir (rango de tiempo,
+carrera o uid). La limpieza por retención (clean-logs.sh) borra segmentos
+enteros.
+
+Varios workers escriben al mismo LOG_FILE: el cierre y la compresión se
+coordinan con flock sobre <LOG_FILE>.lock.
+"""
+
+import fcntl
+import gzip
+import json
+import os
+import re
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from api import log_catalog
+from api.log_index import LogIndex, LogRotated
+
+# Largo del prefijo de `ts` (isoformat UTC) que identifica el periodo
+_PARTITION_LEN = {"day": 10, "hour": 13}
+
+# Orden del segmento activo entre los de su mismo periodo (siempre el último)
+_ACTIVE = 0
+
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+# Reintentos de una consulta cuando el activo se cierra mientras se lee
+_QUERY_RETRIES = 3
+
+_SEGMENT_RE = re.compile(r"^(?P<key>\d{4}-\d{2}-\d{2}(?:T\d{2})?)(?:\.(?P<n>\d+))?(?P<gz>\.gz)?$")
+
+
+def _record_key(record: dict, length: int) -> str:
+    return str(record.get("ts") or "")[:length]
+
+
+def _matches(
+    record: dict,
+    carrera: Optional[str],
+    uid: Optional[str],
+    since: Optional[str],
+    until: Optional[str],
+) -> bool:
+    """since inclusivo, until exclusivo (ts isoformat UTC se compara como texto)"""
+    if carrera and record.get("carrera") != carrera:
+        return False
+    if uid and record.get("uid") != uid:
+        return False
+    ts = str(record.get("ts") or "")
+    if since and ts < since:
+        return False
+    if until and ts >= until:
+        return False
+    return True
+
+
+def _reverse_lines(f, end: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, línea) del final hacia el inicio, leyendo bloques hacia atrás desde `end`"""
+    pos = end
+    partial = b""
+    while pos > 0:
+        size = min(_TAIL_BLOCK_SIZE, pos)
+        pos -= size
+        f.seek(pos)
+        parts = (f.read(size) + partial).split(b"\n")
+        partial = parts[0]
+        offset = pos + len(partial) + 1
+        starts = []
+        for part in parts[1:]:
+            starts.append(offset)
+            offset += len(part) + 1
+        for start, part in zip(reversed(starts), reversed(parts[1:])):
+            if part.strip():
+                yield start, part
+    if partial.strip():
+        yield 0, partial
+
+
+def _parse(line: bytes) -> Optional[dict]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _summarize(lines: Iterable[bytes]) -> dict:
+    """Metadata de un segmento cerrado (.meta.json) a partir de sus líneas"""
+    stats = log_catalog.empty_stats()
+    meta = {"count": 0, "min_ts": "", "max_ts": ""}
+    for line in lines:
+        record = _parse(line)
+        if record is None:
+            continue
+        meta["count"] += 1
+        ts = str(record.get("ts") or "")
+        if ts:
+            if not meta["min_ts"] or ts < meta["min_ts"]:
+                meta["min_ts"] = ts
+            if ts > meta["max_ts"]:
+                meta["max_ts"] = ts
+        log_catalog.add_record(stats, record)
+    meta["carreras"] = sorted(stats["carrera"])
+    meta["uids"] = sorted(stats["uid"])
+    meta["catalog"] = stats
+    return meta
+
+
+def _write_meta(meta_path: str, meta: dict) -> None:
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+
+class Segment:
+    """Un segmento del log: el activo o uno cerrado (plano o .gz)"""
+
+    def __init__(
+        self, key: str, n: int, path: str, meta: Optional[dict] = None, inode: Optional[int] = None
+    ):
+        self.key = key
+        # 0 = activo; los cerrados se numeran desde 1 dentro del periodo
+        self.n = n
+        self.path = path
+        self.meta = meta
+        # Inodo del activo al listarlo: si cambia, se cerró durante la consulta
+        self.inode = inode
+
+    @property
+    def order(self) -> Tuple[str, float]:
+        return (self.key, float("inf") if self.n == _ACTIVE else self.n)
+
+    def may_match(self, carrera, uid, since, until) -> bool:
+        """False solo si la metadata descarta el segmento completo"""
+        meta = self.meta
+        if meta is None:
+            return True
+        if not meta.get("count"):
+            return False
+        if since and meta["max_ts"] < since:
+            return False
+        if until and meta["min_ts"] >= until:
+            return False
+        if carrera and carrera not in meta["carreras"]:
+            return False
+        if uid and uid not in meta["uids"]:
+            return False
+        return True
+
+
+class SegmentedLog:
+    """Escritura con cierre por periodo y consultas sobre todos los segmentos"""
+
+    def __init__(self, log_path: str, partition: Optional[str] = None):
+        self.log_path = log_path
+        self.directory = os.path.dirname(log_path) or "."
+        self.base = os.path.basename(log_path)
+        partition = partition or os.environ.get("UNINET_LOG_SEGMENT", "day")
+        self.key_length = _PARTITION_LEN.get(partition, _PARTITION_LEN["day"])
+        self.index = LogIndex(log_path)
+
+        self._lock = threading.Lock()
+        # (inode, periodo) del segmento activo ya leído
+        self._active: Optional[Tuple[int, Optional[str]]] = None
+        self._meta_cache: Dict[str, dict] = {}
+        # Catálogo combinado de los cerrados (.gz) y el resumen de cada uno,
+        # para rehacer la suma solo cuando se borra alguno (ver catalog())
+        self._catalog_lock = threading.Lock()
+        self._sealed_catalog = log_catalog.empty_stats()
+        self._sealed_parts: Dict[str, log_catalog.Stats] = {}
+        self._compressor: Optional[threading.Thread] = None
+        self._backfill: Optional[threading.Thread] = None
+        self._recovered = False
+
+    # ------------------------------------------------------------
+    # Escritura (hilo de BufferedLogWriter)
+    # ------------------------------------------------------------
+
+    def append(self, records: List[dict]) -> None:
+        """Agrega registros al activo, cerrándolo al cambiar de periodo"""
+        if not self._recovered:
+            # Segmentos cerrados que quedaron sin comprimir (reinicio a mitad)
+            self._recovered = True
+            self._compress_in_background()
+
+        os.makedirs(self.directory, exist_ok=True)
+        group: List[str] = []
+        group_key = None
+        for record in records:
+            key = _record_key(record, self.key_length)
+            if group and key > group_key:
+                self._write(group, group_key)
+                group = []
+            if not group:
+                group_key = key
+            group.append(json.dumps(record, ensure_ascii=False))
+        if group:
+            self._write(group, group_key)
+        # Índice y catálogo del activo al día con lo recién escrito
+        self.index.refresh()
+
+    def _write(self, lines: List[str], key: str) -> None:
+        active_key = self._active_key()
+        if active_key is not None and key > active_key:
+            self._seal(key)
+        # Compartido: ningún worker cierra el activo a mitad de esta escritura
+        with open(self.log_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _active_key(self) -> Optional[str]:
+        """Periodo del segmento activo (el de su primer registro), None si está vacío"""
+        active = self._active_info()
+        return active[1] if active is not None else None
+
+    def _active_info(self) -> Optional[Tuple[int, str]]:
+        """(inodo, periodo) del segmento activo, None si está vacío"""
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None
+        if stat.st_size == 0:
+            return None
+        with self._lock:
+            if self._active is not None and self._active[0] == stat.st_ino:
+                return self._active
+        key = None
+        with open(self.log_path, "rb") as f:
+            record = _parse(f.readline())
+        if record is not None:
+            key = _record_key(record, self.key_length) or None
+        if key is None:
+            # Primera línea ilegible: se usa la fecha de modificación
+            key = datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat()[:self.key_length]
+        with self._lock:
+            self._active = (stat.st_ino, key)
+        return self._active
+
+    def _seal(self, new_key: str) -> None:
+        """Cierra el activo si sigue siendo de un periodo anterior a `new_key`"""
+        with open(self.log_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Otro worker pudo haberlo cerrado mientras se esperaba el lock
+                active_key = self._active_key()
+                if active_key is None or active_key >= new_key:
+                    return
+                target = os.path.join(self.directory, f"{self.base}.{active_key}")
+                n = 1
+                while os.path.exists(target) or os.path.exists(target + ".gz"):
+                    n += 1
+                    target = os.path.join(self.directory, f"{self.base}.{active_key}.{n}")
+                os.rename(self.log_path, target)
+                print(f"📦 Segmento de log cerrado: {os.path.basename(target)}")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._compress_in_background()
+
+    # ------------------------------------------------------------
+    # Compresión de segmentos cerrados
+    # ------------------------------------------------------------
+
+    def _compress_in_background(self) -> None:
+        with self._lock:
+            if self._compressor is not None and self._compressor.is_alive():
+                return
+            self._compressor = threading.Thread(
+                target=self._compress_sealed, name="log-segment-compressor", daemon=True
+            )
+            self._compressor.start()
+
+    def _compress_sealed(self) -> None:
+        for segment in self.segments():
+            if segment.n == _ACTIVE or segment.path.endswith(".gz"):
+                continue
+            try:
+                self._compress(segment.path)
+            except Exception as e:
+                print(f"⚠️  Error comprimiendo segmento de log {segment.path}: {e}")
+
+    def _compress(self, path: str) -> None:
+        try:
+            src = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with src:
+            try:
+                # El lock sobre el propio segmento evita que dos workers lo compriman
+                fcntl.flock(src, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            if not os.path.exists(path):
+                # Ya lo comprimió quien tenía el lock
+                return
+            with gzip.open(path + ".gz.tmp", "wb") as dst:
+                def copied() -> Iterator[bytes]:
+                    for line in src:
+                        dst.write(line)
+                        yield line
+                meta = _summarize(copied())
+
+            # Metadata antes que el .gz: un .gz visible siempre tiene su metadata
+            _write_meta(path + ".meta.json", meta)
+            os.replace(path + ".gz.tmp", path + ".gz")
+            os.remove(path)
+        self._meta_cache[path + ".meta.json"] = meta
+        self._add_sealed(path + ".gz", meta["catalog"])
+
+    # ------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------
+
+    def segments(self) -> List[Segment]:
+        """Segmentos del más nuevo al más antiguo (el activo primero)"""
+        found: Dict[Tuple[str, int], Segment] = {}
+        prefix = self.base + "."
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            match = _SEGMENT_RE.match(name[len(prefix):])
+            if match is None:
+                continue
+            key, n = match.group("key"), int(match.group("n") or 1)
+            path = os.path.join(self.directory, name)
+            if match.group("gz"):
+                # Comprimido y plano a la vez solo un instante: vale el .gz
+                found[(key, n)] = Segment(key, n, path, self._meta(path[:-3] + ".meta.json"))
+            elif (key, n) not in found:
+                found[(key, n)] = Segment(key, n, path)
+
+        result = sorted(found.values(), key=lambda s: s.order, reverse=True)
+        active = self._active_info()
+        if active is not None:
+            result.insert(0, Segment(active[1], _ACTIVE, self.log_path, inode=active[0]))
+        return result
+
+    def _meta(self, path: str) -> Optional[dict]:
+        meta = self._meta_cache.get(path)
+        if meta is None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            # Los segmentos cerrados no cambian
+            self._meta_cache[path] = meta
+        return meta
+
+    def catalog(self) -> log_catalog.Stats:
+        """
+        Carreras y uids de todos los segmentos con cantidad y primer/último ts.
+        Suma el combinado de los cerrados (al día con los que se agregan o
+        borran) y el índice del activo: no recorre los resúmenes de cada
+        segmento en cada llamada. Los cerrados sin catálogo en su metadata
+        (anteriores a él) se resumen en segundo plano y aparecen al terminar;
+        uno recién cerrado aparece al quedar comprimido.
+        """
+        sealed = {
+            segment.path: segment
+            for segment in self.segments()
+            if segment.n != _ACTIVE and segment.path.endswith(".gz")
+        }
+        legacy = []
+        with self._catalog_lock:
+            removed = set(self._sealed_parts) - set(sealed)
+            if removed:
+                # Segmentos borrados por la retención: se rehace la suma
+                for path in removed:
+                    del self._sealed_parts[path]
+                    self._meta_cache.pop(path[:-3] + ".meta.json", None)
+                self._sealed_catalog = log_catalog.empty_stats()
+                for stats in self._sealed_parts.values():
+                    log_catalog.merge(self._sealed_catalog, stats)
+            for path, segment in sealed.items():
+                if path in self._sealed_parts:
+                    continue
+                if segment.meta is not None and "catalog" in segment.meta:
+                    self._add_sealed_locked(path, segment.meta["catalog"])
+                else:
+                    legacy.append(path)
+            result = log_catalog.empty_stats()
+            log_catalog.merge(result, self._sealed_catalog)
+        log_catalog.merge(result, self.index.stats())
+        if legacy:
+            self._backfill_in_background(legacy)
+        return result
+
+    def _add_sealed(self, path: str, stats: log_catalog.Stats) -> None:
+        with self._catalog_lock:
+            self._add_sealed_locked(path, stats)
+
+    def _add_sealed_locked(self, path: str, stats: log_catalog.Stats) -> None:
+        if path not in self._sealed_parts:
+            self._sealed_parts[path] = stats
+            log_catalog.merge(self._sealed_catalog, stats)
+
+    def _backfill_in_background(self, paths: List[str]) -> None:
+        with self._lock:
+            if self._backfill is not None and self._backfill.is_alive():
+                return
+            self._backfill = threading.Thread(
+                target=self._backfill_catalog, args=(paths,), name="log-catalog-backfill", daemon=True
+            )
+            self._backfill.start()
+
+    def _backfill_catalog(self, paths: List[str]) -> None:
+        """Resume los cerrados sin catálogo y lo deja en su .meta.json"""
+        for path in paths:
+            meta_path = path[:-3] + ".meta.json"
+            try:
+                with gzip.open(path, "rb") as f:
+                    meta = _summarize(f)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"⚠️  Error resumiendo segmento de log {path}: {e}")
+                continue
+            try:
+                _write_meta(meta_path, meta)
+            except OSError as e:
+                # Sin permisos de escritura: el resumen vale igual en memoria
+                print(f"⚠️  No se pudo guardar la metadata de {path}: {e}")
+            self._meta_cache[meta_path] = meta
+            self._add_sealed(path, meta["catalog"])
+
+    def cursor(self, offset: int) -> str:
+        """Cursor de query() que apunta a `offset` del segmento activo"""
+        key = self._active_key() or datetime.now(timezone.utc).isoformat()[:self.key_length]
+        return f"{key}:{_ACTIVE}:{offset}"
+
+    def query(
+        self,
+        carrera: Optional[str] = None,
+        uid: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 200,
+        before: Optional[str] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Hasta `limit` registros que coinciden, del más antiguo al más nuevo,
+        anteriores al cursor `before` (None = desde el final).
+        Retorna (registros, cursor para la página anterior o None).
+
+        Si el activo se cierra mientras se lee, la consulta se repite: el
+        cursor sigue valiendo (apunta al mismo periodo, ahora cerrado). Tras
+        _QUERY_RETRIES intentos lanza LogRotated.
+        """
+        for attempt in range(_QUERY_RETRIES):
+            try:
+                return self._query(carrera, uid, since, until, limit, before)
+            except LogRotated:
+                if attempt == _QUERY_RETRIES - 1:
+                    raise
+
+    def _query(self, carrera, uid, since, until, limit, before) -> Tuple[List[dict], Optional[str]]:
+        cursor = parse_cursor(before)
+        found: List[Tuple[Segment, int, dict]] = []
+        bounded = False
+
+        for segment in self.segments():
+            if cursor is not None and not bounded:
+                if segment.order > _cursor_order(cursor):
+                    continue
+                bounded = True
+                bound = cursor[2] if segment.key == cursor[0] else None
+            else:
+                bound = None
+            if not segment.may_match(carrera, uid, since, until):
+                continue
+            need = limit - len(found)
+            for offset, record in self._scan(segment, carrera, uid, since, until, need, bound):
+                found.append((segment, offset, record))
+            if len(found) >= limit:
+                break
+
+        next_before = None
+        if len(found) >= limit:
+            segment, offset, _ = found[-1]
+            next_before = f"{segment.key}:{segment.n}:{offset}"
+        return [record for _, _, record in reversed(found)], next_before
+
+    def _scan(self, segment, carrera, uid, since, until, need, bound) -> Iterator[Tuple[int, dict]]:
+        """Hasta `need` coincidencias del segmento, de la más nueva a la más antigua"""
+        if need <= 0:
+            return
+        if segment.n == _ACTIVE:
+            if carrera or uid:
+                # Índice lateral: solo las líneas de la carrera/uid
+                source = self.index.scan(carrera, uid, bound, segment.inode)
+            else:
+                source = self._scan_active(bound, segment.inode)
+            for offset, record in source:
+                if _matches(record, carrera, uid, since, until):
+                    yield offset, record
+                    need -= 1
+                    if need == 0:
+                        return
+            return
+
+        # Cerrado: lectura secuencial (gzip no permite saltar hacia atrás)
+        matches: deque = deque(maxlen=need)
+        opener = gzip.open if segment.path.endswith(".gz") else open
+        try:
+            with opener(segment.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if bound is not None and offset >= bound:
+                        break
+                    record = _parse(line)
+                    if record is not None and _matches(record, carrera, uid, since, until):
+                        matches.append((offset, record))
+                    offset += len(line)
+        except FileNotFoundError:
+            # Comprimido o borrado entre el listado y la lectura
+            return
+        yield from reversed(matches)
+
+    def _scan_active(self, bound: Optional[int], inode: Optional[int]) -> Iterator[Tuple[int, dict]]:
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            raise LogRotated(self.log_path)
+        with f:
+            if inode is not None and os.fstat(f.fileno()).st_ino != inode:
+                # Cerrado entre el listado y la lectura: otro archivo, otros offsets
+                raise LogRotated(self.log_path)
+            end = f.seek(0, os.SEEK_END) if bound is None else bound
+            for offset, line in _reverse_lines(f, end):
+                record = _parse(line)
+                if record is not None:
+                    yield offset, record
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int, int]]:
+    """'periodo:n:offset' -> (periodo, n, offset); ValueError si es inválido"""
+    if not cursor:
+        return None
+    key, n, offset = cursor.rsplit(":", 2)
+    return key, int(n), int(offset)
+
+
+def _cursor_order(cursor: Tuple[str, int, int]) -> Tuple[str, float]:
+    return (cursor[0], float("inf") if cursor[1] == _ACTIVE else cursor[1])
+
+
+# Una instancia por archivo de log (compartida por el writer y /api/logs)
+_logs: Dict[str, SegmentedLog] = {}
+_logs_lock = threading.Lock()
+
+
+def segmented_log(path: str) -> SegmentedLog:
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None:
+            log = _logs[path] = SegmentedLog(path)
+        return log
@@ -0,0 +1,170 @@
+"""
+Seguimiento en vivo del log de carreras (tail -f por HTTP)
+Un único lector por archivo de log, compartido por todos los clientes
+conectados: cada `poll_interval` lee solo los bytes agregados desde la
+última vez, parsea cada línea una vez y reparte la línea original a los
+suscriptores cuyo filtro (carrera, uid) coincide.
+
+- Sin suscriptores no hay tarea ni archivo abierto
+- Sigue el cierre de segmentos (log_segments.py): termina de leer el
+  archivo renombrado y continúa con el nuevo LOG_FILE desde el inicio
+- Cliente lento: como en status_stream, la cola se vacía y se cierra el stream
+"""
+
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+# Filtro de un suscriptor: (carrera, uid), None = cualquiera
+FilterKey = Tuple[Optional[str], Optional[str]]
+
+
+class LogSubscriber:
+    """Cola de líneas de un cliente con su filtro"""
+
+    __slots__ = ("queue", "key")
+
+    def __init__(self, key: FilterKey, queue_size: int):
+        self.key = key
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=queue_size)
+
+
+class LogFollower:
+    """Lector compartido de lo que se agrega a un archivo de log"""
+
+    def __init__(self, path: str, poll_interval: float = 0.5, queue_size: int = 1024):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscribers: Dict[FilterKey, Set[LogSubscriber]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Serializa cada lectura+reparto con las suscripciones nuevas
+        self._reading = asyncio.Lock()
+        self._file = None
+        # Inicio de una línea aún incompleta al final de lo leído
+        self._partial = b""
+
+    def __len__(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    async def subscribe(
+        self, carrera: Optional[str] = None, uid: Optional[str] = None
+    ) -> Tuple[LogSubscriber, int]:
+        """
+        Registra un suscriptor; retorna también el offset del archivo desde
+        el que recibirá líneas (lo anterior es el backlog del cliente)
+        """
+        async with self._reading:
+            if self._task is None:
+                self._open(at_end=True)
+                self._task = asyncio.create_task(self._run())
+            sub = LogSubscriber((carrera, uid), self.queue_size)
+            self._subscribers.setdefault(sub.key, set()).add(sub)
+            position = 0 if self._file is None else self._file.tell() - len(self._partial)
+            return sub, position
+
+    def unsubscribe(self, sub: LogSubscriber) -> None:
+        subs = self._subscribers.get(sub.key)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subscribers[sub.key]
+
+    # ------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------
+
+    def _open(self, at_end: bool) -> None:
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            self._file = None
+            return
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+        self._partial = b""
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._partial = b""
+
+    def _read_new(self) -> List[bytes]:
+        """Líneas completas agregadas desde la última lectura (en un hilo)"""
+        if self._file is None:
+            self._open(at_end=False)
+            if self._file is None:
+                return []
+
+        lines = self._read_lines()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return lines
+        current = os.fstat(self._file.fileno())
+        if stat.st_ino != current.st_ino:
+            # Segmento cerrado: lo que quedaba ya se leyó, seguir con el nuevo
+            self._close()
+            self._open(at_end=False)
+            if self._file is not None:
+                lines.extend(self._read_lines())
+        elif stat.st_size < self._file.tell():
+            # Truncado
+            self._file.seek(0)
+            self._partial = b""
+            lines.extend(self._read_lines())
+        return lines
+
+    def _read_lines(self) -> List[bytes]:
+        data = self._file.read()
+        if not data:
+            return []
+        parts = (self._partial + data).split(b"\n")
+        self._partial = parts.pop()
+        return [part for part in parts if part.strip()]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            async with self._reading:
+                if not self._subscribers:
+                    # Último cliente desconectado: se deja de seguir el archivo
+                    self._close()
+                    self._task = None
+                    return
+                try:
+                    lines = await asyncio.to_thread(self._read_new)
+                except Exception as e:
+                    print(f"⚠️  Error siguiendo el log de carreras: {e}")
+                    continue
+                for line in lines:
+                    self._dispatch(line)
+
+    def _dispatch(self, line: bytes) -> None:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(record, dict):
+            return
+        carrera = record.get("carrera") or None
+        uid = record.get("uid") or None
+        frame = b"event: log\ndata: " + line + b"\n\n"
+
+        keys = {(None, None), (carrera, None), (None, uid), (carrera, uid)}
+        for key in keys:
+            for sub in self._subscribers.get(key, ()):
+                self._offer(sub, frame)
+
+    @staticmethod
+    def _offer(sub: LogSubscriber, frame: bytes) -> None:
+        try:
+            sub.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: cerrar su stream
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(None)
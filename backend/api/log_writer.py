@@ -0,0 +1,130 @@
+"""
+Escritura en segundo plano del log de requests por carrera
+El middleware solo encola el registro (microsegundos); un hilo agrupa los
+registros y los escribe en lote: una apertura de archivo por lote y no
+una por request, fuera del event loop.
+
+- Lote por tamaño (batch_size registros) o por tiempo (flush_interval)
+- Cola acotada (max_pending): si el disco no da abasto se descartan los
+  registros nuevos y se cuentan en `dropped`; el próximo lote agrega una
+  línea {"event": "log_overflow", "dropped": N} para que quede constancia.
+  Un lote que falla al escribirse se cuenta igual
+- stop() escribe todo lo pendiente y guarda el índice/catálogo (apagado del servidor)
+"""
+
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from api.log_segments import segmented_log
+
+
+class BufferedLogWriter:
+    """Cola acotada de líneas JSON con un hilo de escritura por lotes"""
+
+    def __init__(
+        self,
+        max_pending: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+    ):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, dict]] = []
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._paths = set()
+        self.written = 0
+        self.dropped = 0
+        self._dropped_unreported = 0
+
+    def write(self, path: str, obj: dict) -> bool:
+        """Encola un registro; False si la cola está llena y se descartó"""
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                self._dropped_unreported += 1
+                return False
+            self._pending.append((path, obj))
+            full = len(self._pending) >= self.batch_size
+        if self._thread is None:
+            self.start()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="carrera-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Escribe lo pendiente y detiene el hilo"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        thread.join()
+        self._thread = None
+        # Índice y catálogo del segmento activo persistidos para el próximo arranque
+        for path in self._paths:
+            segmented_log(path).index.save()
+
+    def flush(self) -> None:
+        """Escribe lo pendiente en el hilo actual"""
+        self._commit()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self._commit()
+            except Exception as e:
+                print(f"⚠️  Error escribiendo log de carreras: {e}")
+            if self._stopping:
+                # Lo encolado durante el último lote
+                self._commit()
+                break
+
+    def _commit(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            dropped, self._dropped_unreported = self._dropped_unreported, 0
+        if not pending:
+            return
+
+        by_path: Dict[str, List[dict]] = {}
+        for path, obj in pending:
+            by_path.setdefault(path, []).append(obj)
+        if dropped:
+            print(f"⚠️  Log de carreras: {dropped} registros descartados (cola llena o error de escritura)")
+            by_path[pending[-1][0]].append({
+                "event": "log_overflow",
+                "dropped": dropped,
+                "ts": datetime.now(timezone.utc).isoformat(),
+            })
+
+        for path, records in by_path.items():
+            try:
+                # Cierra el segmento activo al cambiar de periodo (ver log_segments.py)
+                segmented_log(path).append(records)
+            except Exception as e:
+                # El lote ya salió de la cola: se cuenta como descartado y el
+                # próximo lote deja la línea log_overflow
+                lost = sum(1 for r in records if r.get("event") != "log_overflow")
+                with self._lock:
+                    self.dropped += lost
+                    self._dropped_unreported += lost + (dropped if path == pending[-1][0] else 0)
+                print(f"⚠️  Error escribiendo log de carreras ({lost} registros perdidos): {e}")
+                continue
+            self._paths.add(path)
+            self.written += len(records)
@@ -9,99 +9,177 @@ Requisitos:
 - El middleware del backend debe escribir líneas JSON al LOG_FILE.
 """
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional
-import os
+from datetime import datetime, timezone
+import asyncio
 import json
 
+from api import config, log_catalog
+from api.log_index import LogRotated
+from api.log_segments import parse_cursor, segmented_log
+from api.log_stream import LogFollower
+
 router = APIRouter()
 
+# Segundos sin líneas nuevas antes de enviar un keep-alive al stream
+STREAM_KEEPALIVE = 15
+
+# Un lector compartido por archivo de log (la ruta puede cambiar en logs.conf)
+_followers: dict[str, LogFollower] = {}
 
-def _read_logs_conf(path: str = "/etc/uninet/logs.conf") -> dict:
-    conf = {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                k, v = line.split("=", 1)
-                conf[k.strip()] = v.strip()
-    except FileNotFoundError:
-        pass
-    return conf
+
+def _follower_for(path: str) -> LogFollower:
+    follower = _followers.get(path)
+    if follower is None:
+        follower = _followers[path] = LogFollower(path)
+    return follower
 
 
 def _get_log_file() -> str:
-    logs_conf = _read_logs_conf()
-    # Prioridad: env -> logs.conf -> default
-    return (
-        os.environ.get("UNINET_LOG_FILE")
-        or logs_conf.get("LOG_FILE")
-        or "/var/log/uninet/carreras.log"
-    )
+    # Prioridad: env -> logs.conf -> default (en memoria, ver api/config.py)
+    return config.log_file()
 
 
-def _safe_read_last_lines(path: str, limit: int) -> list[str]:
-    if not os.path.exists(path):
-        return []
-    # Lectura simple (laboratorio). Si el archivo crece demasiado, se optimiza.
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        lines = f.readlines()
-    return [ln.strip() for ln in lines[-limit:] if ln.strip()]
+def _parse_ts(value: Optional[str], name: str) -> Optional[str]:
+    """ISO 8601 -> isoformat UTC, comparable con el campo `ts` de los registros"""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} inválido (ISO 8601): {value}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat()
 
 
 @router.get("/logs")
 async def get_logs(
+    response: Response,
     carrera: Optional[str] = Query(default=None),
     username: Optional[str] = Query(default=None),
+    since: Optional[str] = Query(default=None),
+    until: Optional[str] = Query(default=None),
     limit: int = Query(default=200, ge=1, le=5000),
+    before: Optional[str] = Query(default=None),
 ):
     """
-    Devuelve logs (JSON lines) filtrados por carrera o username.
+    Devuelve logs (JSON lines) filtrados por carrera, username y/o rango de tiempo.
     - carrera: "sistemas" o "administracion"
     - username: "alumno01" (uid)
-    - limit: últimas N líneas a revisar (máx 5000)
+    - since / until: ISO 8601 (UTC si no trae zona); since inclusivo, until exclusivo
+    - limit: hasta N registros, los más recientes que coinciden (máx 5000)
+    - before: cursor de paginación (header X-Next-Before de la página anterior)
+
+    El log está segmentado por periodo (ver api/log_segments.py): los
+    segmentos cerrados cuya metadata no coincide con el filtro o el rango
+    se saltan sin descomprimirse. Registros del más antiguo al más nuevo.
     """
     log_file = _get_log_file()
-    raw = _safe_read_last_lines(log_file, limit=limit)
+    since = _parse_ts(since, "since")
+    until = _parse_ts(until, "until")
 
-    out = []
-    for ln in raw:
-        try:
-            obj = json.loads(ln)
-        except Exception:
-            # Ignorar líneas no-JSON
-            continue
+    try:
+        parse_cursor(before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Cursor inválido: {before}")
 
-        if carrera and obj.get("carrera") != carrera:
-            continue
-        if username and obj.get("uid") != username:
-            continue
+    try:
+        records, next_before = await asyncio.to_thread(
+            segmented_log(log_file).query, carrera, username, since, until, limit, before
+        )
+    except LogRotated:
+        # El segmento activo se cerró varias veces seguidas durante la lectura
+        raise HTTPException(
+            status_code=503, detail="El log está rotando, reintentar", headers={"Retry-After": "1"}
+        )
+    if next_before is not None:
+        response.headers["X-Next-Before"] = next_before
+    return records
+
+
+async def _log_event_stream(
+    request: Request,
+    log_file: str,
+    carrera: Optional[str],
+    username: Optional[str],
+    backlog: int,
+):
+    follower = _follower_for(log_file)
+    sub, position = await follower.subscribe(carrera, username)
 
-        out.append(obj)
+    try:
+        # Backlog: lo anterior al punto desde el que el lector compartido entrega
+        if backlog:
+            log = segmented_log(log_file)
+            try:
+                records, _ = await asyncio.to_thread(
+                    log.query, carrera, username, None, None, backlog, log.cursor(position)
+                )
+            except LogRotated:
+                # Cerrar para que el cliente se reconecte y pida el backlog de nuevo
+                return
+            for record in records:
+                yield b"event: log\ndata: " + json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+        while True:
+            try:
+                frame = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": keep-alive\n\n"
+                continue
+            if frame is None:
+                # Cola desbordada: cerrar para que el cliente se reconecte
+                break
+            yield frame
+    finally:
+        follower.unsubscribe(sub)
+
+
+@router.get("/logs/stream")
+async def stream_logs(
+    request: Request,
+    carrera: Optional[str] = Query(default=None),
+    username: Optional[str] = Query(default=None),
+    backlog: int = Query(default=100, ge=0, le=5000),
+):
+    """
+    Stream Server-Sent Events del log (equivalente a tail -f, sin acceso shell)
+    Envía primero los últimos `backlog` registros que coinciden y luego cada
+    línea nueva a medida que se escribe. Filtra en el servidor por carrera/username.
 
-    return out
+    Eventos:
+    - log: un registro JSON por evento
+    """
+    return StreamingResponse(
+        _log_event_stream(request, _get_log_file(), carrera or None, username or None, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/logs/carreras")
-async def get_log_carreras(
-    limit: int = Query(default=5000, ge=1, le=20000),
-):
+async def get_log_carreras():
     """
     Devuelve lista de carreras encontradas en el log (según el campo 'carrera').
+    Sale del catálogo mantenido junto al log: completo y sin releer líneas.
     """
-    log_file = _get_log_file()
-    raw = _safe_read_last_lines(log_file, limit=limit)
-
-    carreras = set()
-    for ln in raw:
-        try:
-            obj = json.loads(ln)
-        except Exception:
-            continue
-        c = obj.get("carrera")
-        if c:
-            carreras.add(c)
-
-    return sorted(carreras)
+    stats = await asyncio.to_thread(segmented_log(_get_log_file()).catalog)
+    return sorted(stats["carrera"])
+
+
+@router.get("/logs/catalog")
+async def get_log_catalog():
+    """
+    Carreras y usuarios (uid) presentes en el log, con cantidad de
+    registros y primer/último ts de cada uno.
+    """
+    stats = await asyncio.to_thread(segmented_log(_get_log_file()).catalog)
+    return {
+        "carreras": log_catalog.describe(stats, "carrera"),
+        "uids": log_catalog.describe(stats, "uid"),
+    }
@@ -10,9 +10,12 @@ from fastapi.responses import PlainTextResponse, FileResponse
 from pathlib import Path
 import os
 
-from api.monitoring import router as monitoring_router
+from api.monitoring import router as monitoring_router, start_monitoring, stop_monitoring
 from api.users import router as users_router
 from api.auth import router as auth_router, docentes_router
+from api.logs import router as logs_router
+from api.carrera_logger import carrera_log_middleware, log_writer
+from api.config import config
 
 app = FastAPI(
     title="UniNet Dashboard API",
@@ -30,11 +33,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Log de requests por carrera (JSON lines, escrito en lotes por log_writer)
+app.middleware("http")(carrera_log_middleware)
+
 # Routers
 app.include_router(monitoring_router, prefix="/api", tags=["Monitoring"])
 app.include_router(users_router, prefix="/api/users", tags=["Users"])
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(docentes_router, prefix="/api/docentes", tags=["Docentes"]) 
+app.include_router(logs_router, prefix="/api", tags=["Logs"])
+
+@app.on_event("startup")
+async def startup():
+    # Restaurar estado de la flota persistido e iniciar detección de offline
+    start_monitoring()
+    # Recarga de /etc/uninet/*.conf al cambiar
+    config.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    stop_monitoring()
+    # Escribir los registros de requests aún en cola
+    log_writer.stop()
+    config.stop()
+
 
 @app.get("/")
 async def root():
@@ -110,6 +133,23 @@ exit 1
         return f.read()
 
 
+@app.get("/agent-daemon", response_class=PlainTextResponse)
+async def get_agent_daemon():
+    """
+    Sirve el agente persistente uninet-agentd.py (systemd, keep-alive)
+    """
+    agent_path = SCRIPTS_DIR / "uninet-agentd.py"
+
+    if not agent_path.exists():
+        return """#!/usr/bin/env python3
+import sys
+sys.exit("Error: Agente persistente no encontrado")
+"""
+
+    with open(agent_path, 'r') as f:
+        return f.read()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=4000, log_level="info")
@@ -4,17 +4,86 @@ Sistema de heartbeat para detección de estado en tiempo real
 Sistema de auto-registro dinámico de clientes
 """
 
+import asyncio
+import json
+import os
 import subprocess
 from datetime import datetime, timedelta
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional, Dict
 
+from api.admission import HeartbeatAdmission
+from api.auth import User, get_current_user, get_user_carreras, get_user_id
+from api.fleet_backend import Heartbeat, create_fleet_backend
+from api.fleet_state import EVENT_REMOVED, HostRecord
+from api.host_archive import HostArchive, HostEvictor
+from api.host_commands import COMMAND_TYPES, DEFAULT_TTL, create_command_queue
+from api.host_history import RETENTION_DAYS, HistoryFlusher, HostHistory
+from api.offline_sweeper import OfflineSweeper
+from api.status_snapshots import SnapshotCache, snapshot_response
+from api.status_stream import StatusBroadcaster, sse_frame
+from api.udp_heartbeat import UdpHeartbeatListener
+
 router = APIRouter()
 
-# Estado de clientes en memoria (key: hostname, value: estado completo)
+# Máximo de heartbeats aceptados en un solo lote (un laboratorio grande ~600 PCs)
+MAX_BATCH_SIZE = 2000
+
+# Segundos sin heartbeat para considerar un host offline
+HEARTBEAT_TIMEOUT = 60
+
+# Directorio del estado persistido (snapshot/log o base SQLite compartida)
+STATE_DIR = os.environ.get("UNINET_STATE_DIR") or os.path.join(
+    os.path.dirname(__file__), "..", "database", "fleet"
+)
+
+# Estado de clientes, indexado por ID y por carrera
 # Auto-registro: cualquier PC que envíe heartbeat se registra automáticamente
-clients_state: Dict[str, dict] = {}
+# Backend según UNINET_FLEET_BACKEND: memory (un worker) o sqlite (--workers N)
+fleet = create_fleet_backend(HEARTBEAT_TIMEOUT, STATE_DIR)
+
+# Admisión de heartbeats: limita el ritmo por IP y global (arranque masivo)
+admission = HeartbeatAdmission.from_env(HEARTBEAT_TIMEOUT)
+
+# Marca hosts offline en segundo plano cuando vence su último heartbeat.
+# Mientras se difieren heartbeats, el timeout se extiende lo necesario
+sweeper = OfflineSweeper(fleet, grace=admission.expiry_grace)
+
+# Días sin heartbeat tras los que un host offline se archiva (0 = nunca)
+HOST_TTL_DAYS = float(os.environ.get("UNINET_HOST_TTL_DAYS") or 30)
+
+# Hosts dados de baja: fuera del estado en memoria, consultables en disco
+archive = HostArchive(STATE_DIR)
+evictor = HostEvictor(fleet, archive, timedelta(days=HOST_TTL_DAYS))
+
+# Historial por host (muestras + buckets) para reportes de ocupación
+history = HostHistory()
+fleet.add_listener(history.record_event)
+
+# Segundos entre guardados de history.json (además del guardado al apagar)
+HISTORY_FLUSH_SECONDS = float(os.environ.get("UNINET_HISTORY_FLUSH_SECONDS") or 300)
+history_flusher = HistoryFlusher(history, STATE_DIR, HISTORY_FLUSH_SECONDS)
+
+# Comandos de control pendientes por host/carrera (viajan en la respuesta del heartbeat)
+commands = create_command_queue(STATE_DIR)
+
+# Suscriptores del stream de cambios de estado (/status/stream)
+broadcaster = StatusBroadcaster()
+
+# Respuestas de /status y /hosts ya serializadas, con ETag.
+# Se reconstruyen al cambiar la versión; max_age acota cuánto puede
+# atrasarse lastSeen (un heartbeat sin cambios no sube la versión)
+snapshots = SnapshotCache(max_age=HEARTBEAT_TIMEOUT / 2)
+
+# Intervalo de comentarios keep-alive en el stream SSE (segundos)
+STREAM_KEEPALIVE = 15
+
+# Heartbeats UDP opcionales: se activan con puerto y clave compartida
+UDP_PORT = int(os.environ.get("UNINET_UDP_PORT") or 0)
+UDP_KEY = os.environ.get("UNINET_UDP_KEY", "")
 
 
 class HeartbeatData(BaseModel):
@@ -23,6 +92,16 @@ class HeartbeatData(BaseModel):
     ip: str
     user: Optional[str] = None  # Usuario LDAP activo o null
     carrera: Optional[str] = "5010"  # Código de carrera/laboratorio (default: Sistemas)
+    acks: List[int] = []  # IDs de comandos ya ejecutados por el agente
+
+
+class CommandRequest(BaseModel):
+    """Comando de control para un host (host_id) o para toda una carrera"""
+    type: str  # block_internet | unblock_internet | lock_session | refresh_config
+    host_id: Optional[str] = None
+    carrera: Optional[str] = None
+    args: dict = {}
+    ttl: int = Field(default=DEFAULT_TTL, ge=30, le=7 * 86400)  # Segundos sin confirmar
 
 
 class HostStatus(BaseModel):
@@ -33,11 +112,102 @@ class HostStatus(BaseModel):
     status: str  # 'online', 'offline', 'inUse'
     user: Optional[str] = None
     lastSeen: Optional[str] = None
+    statusSince: Optional[str] = None  # Momento de la última transición de status
     carrera: Optional[str] = None  # Código de carrera/laboratorio
 
 
-@router.post("/heartbeat")
-async def receive_heartbeat(data: HeartbeatData):
+async def _apply_heartbeats(heartbeats: List[Heartbeat], now: datetime) -> List[str]:
+    """
+    Ruta común de actualización de estado (HTTP, lote y UDP).
+    Retorna los IDs de los hosts en el mismo orden.
+    Con SQLite la escritura ocurre fuera del event loop (hilo escritor).
+    """
+    ids = await fleet.apply_heartbeats_async(heartbeats, now)
+    sweeper.notify()
+    return ids
+
+
+async def _apply_heartbeat(data: HeartbeatData, now: datetime) -> str:
+    """
+    Aplica un heartbeat al estado de la flota y retorna el ID del host.
+    """
+    return (await _apply_heartbeats([(data.hostname, data.ip, data.user, data.carrera)], now))[0]
+
+
+def _admit_udp() -> bool:
+    """Heartbeat UDP: cobra el bucket global (no hay origen confiable ni Retry-After)"""
+    return admission.admit(None) is None
+
+
+udp_listener = (
+    UdpHeartbeatListener(UDP_KEY.encode("utf-8"), _apply_heartbeats, port=UDP_PORT, admit=_admit_udp)
+    if UDP_PORT and UDP_KEY else None
+)
+
+
+def start_monitoring() -> None:
+    """
+    Inicializa el backend de estado (restaura hosts persistidos) y la
+    detección de offline en segundo plano. Se llama al iniciar la aplicación.
+    """
+    # El historial se carga antes: las expiraciones al restaurar cierran sus intervalos
+    history.load(STATE_DIR)
+    # Con varios workers todos ven los mismos eventos; history.json lo guarda uno
+    if fleet.shared and not history.claim(STATE_DIR):
+        print("📦 Historial de hosts: lo guarda otro worker")
+    fleet.start()
+    sweeper.start()
+    history_flusher.start()
+    if HOST_TTL_DAYS > 0:
+        evictor.start()
+    if udp_listener is not None:
+        udp_listener.start()
+    elif UDP_PORT:
+        print("⚠️  UNINET_UDP_PORT sin UNINET_UDP_KEY: heartbeats UDP desactivados")
+
+
+def stop_monitoring() -> None:
+    """Persiste y libera el backend de estado. Se llama al apagar."""
+    if udp_listener is not None:
+        udp_listener.stop()
+    sweeper.stop()
+    history_flusher.stop()
+    evictor.stop()
+    commands.stop()
+    fleet.stop()
+    try:
+        history.save(STATE_DIR)
+    except OSError as e:
+        print(f"⚠️  Error guardando historial de hosts: {e}")
+
+
+def _admit(request: Request, cost: int = 1, per_source: bool = True) -> None:
+    """
+    Control de admisión antes de leer el cuerpo: si se excede el ritmo
+    responde 429 (por IP) o 503 (servidor saturado) con Retry-After.
+    Con per_source=False solo se cobra el bucket global.
+    """
+    source = request.client.host if request.client and per_source else None
+    rejected = admission.admit(source, cost)
+    if rejected is not None:
+        status_code, retry_after = rejected
+        raise HTTPException(
+            status_code=status_code,
+            detail="Demasiados heartbeats" if status_code == 429 else "Servidor saturado",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+@router.post(
+    "/heartbeat",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": HeartbeatData.model_json_schema()}},
+        }
+    },
+)
+async def receive_heartbeat(request: Request):
     """
     Recibe heartbeat de VM cliente con estado actual
     Se ejecuta cada 30 segundos desde el agente del cliente
@@ -45,43 +215,157 @@ async def receive_heartbeat(data: HeartbeatData):
     Sistema de auto-registro:
     - Si el hostname es nuevo, se registra automáticamente
     - Actualiza estado, IP y usuario en cada heartbeat
+
+    Control de admisión (arranque masivo de laboratorios):
+    - 429/503 con Retry-After si se excede el ritmo, sin leer el cuerpo
+    - Un host diferido no pasa a offline mientras espera el reintento
     
-    Args:
-        data: Datos del cliente (hostname, ip, usuario activo)
+    Comandos de control:
+    - Los comandos pendientes del host o de su carrera van en "commands"
+      ({"id", "type", "args"}); se reenvían hasta que el agente los
+      confirma con sus IDs en "acks" del heartbeat siguiente
     
-    Returns:
-        Confirmación de recepción con ID asignado
-    """
-    # Auto-registro: asignar ID si es nuevo
-    if data.hostname not in clients_state:
-        # Generar ID basado en cantidad de hosts registrados
-        host_id = f"pc-{len(clients_state) + 1:02d}"
-        clients_state[data.hostname] = {
-            "id": host_id,
-            "ip": data.ip,
-            "user": data.user,
-            "carrera": data.carrera,
-            "last_seen": datetime.now(),
-            "first_seen": datetime.now()
-        }
-    else:
-        # Actualizar estado existente
-        clients_state[data.hostname].update({
-            "ip": data.ip,
-            "user": data.user,
-            "carrera": data.carrera,
-            "last_seen": datetime.now()
-        })
+    Body:
+        HeartbeatData: Datos del cliente (hostname, ip, usuario activo, acks)
     
-    return {
+    Returns:
+        Confirmación de recepción con ID asignado, el intervalo sugerido
+        para el próximo heartbeat (next_interval, segundos) y los comandos
+        pendientes si los hay
+    """
+    _admit(request)
+    try:
+        data = HeartbeatData.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+    now = datetime.now()
+    host_id = await _apply_heartbeat(data, now)
+
+    response = {
         "status": "ok", 
-        "received_at": datetime.now().isoformat(),
-        "host_id": clients_state[data.hostname]["id"]
+        "received_at": now.isoformat(),
+        "host_id": host_id,
+        "next_interval": admission.next_interval()
+    }
+    pending = commands.pending(data.hostname, data.carrera, data.acks)
+    if pending:
+        response["commands"] = pending
+    return response
+
+
+def _parse_batch_body(body: bytes, content_type: str) -> list:
+    """
+    Decodifica el cuerpo de un lote de heartbeats.
+    Acepta un array JSON o NDJSON (un objeto JSON por línea).
+    """
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [json.loads(ln) for ln in text.splitlines() if ln.strip()]
+
+    items = json.loads(text)
+    if isinstance(items, dict):
+        # Permitir {"heartbeats": [...]} además del array plano
+        items = items.get("heartbeats")
+    if not isinstance(items, list):
+        raise ValueError("Se esperaba un array de heartbeats")
+    return items
+
+
+@router.post("/heartbeat/batch")
+async def receive_heartbeat_batch(request: Request):
+    """
+    Recibe un lote de heartbeats en una sola petición
+    Pensado para gateways/relays de laboratorio que agregan toda una sala
+
+    Formatos aceptados:
+    - application/json: array de objetos HeartbeatData
+    - application/x-ndjson: un objeto HeartbeatData por línea
+
+    Cada elemento se valida por separado: un heartbeat inválido no
+    descarta el resto del lote, se reporta en "errors" con su índice.
+
+    El lote consume un token del origen y uno global por heartbeat:
+    si el servidor está saturado se rechaza completo (503 con Retry-After).
+
+    Returns:
+        IDs asignados por hostname, lista de errores por índice,
+        comandos pendientes por hostname e intervalo sugerido
+        para el próximo lote (next_interval)
+    """
+    _admit(request)
+    body = await request.body()
+    try:
+        items = _parse_batch_body(body, request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Lote inválido: {e}")
+
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote demasiado grande (máximo {MAX_BATCH_SIZE} heartbeats)"
+        )
+    if len(items) > 1:
+        # El primer heartbeat ya se cobró al admitir la petición
+        _admit(request, len(items) - 1, per_source=False)
+
+    now = datetime.now()
+    valid = []
+    acks = []
+    errors = []
+
+    for index, item in enumerate(items):
+        try:
+            data = HeartbeatData.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index": index, "detail": e.errors(include_url=False)})
+            continue
+        valid.append((data.hostname, data.ip, data.user, data.carrera))
+        acks.append(data.acks)
+
+    # Todo el lote se aplica en una sola pasada (una transacción en SQLite)
+    ids = await _apply_heartbeats(valid, now)
+    hosts: Dict[str, str] = {hb[0]: host_id for hb, host_id in zip(valid, ids)}
+
+    # Comandos pendientes por hostname, para que el gateway los reparta
+    pending: Dict[str, list] = {}
+    for hb, host_acks in zip(valid, acks):
+        host_commands = commands.pending(hb[0], hb[3], host_acks)
+        if host_commands:
+            pending[hb[0]] = host_commands
+
+    return {
+        "status": "ok" if not errors else "partial",
+        "received_at": now.isoformat(),
+        "accepted": len(hosts),
+        "rejected": len(errors),
+        "hosts": hosts,
+        "errors": errors,
+        "commands": pending,
+        "next_interval": admission.next_interval()
+    }
+
+
+def _host_status(host: HostRecord) -> dict:
+    """Representación JSON de un host para /status"""
+    return {
+        "id": host.id,
+        "name": host.hostname,
+        "ip": host.ip,
+        "status": host.status,
+        "user": host.user if host.user else None,
+        "lastSeen": datetime.fromtimestamp(host.last_seen).isoformat(),
+        "statusSince": datetime.fromtimestamp(host.status_since).isoformat(),
+        "carrera": host.carrera
     }
 
 
 @router.get("/status")
-async def get_status(carrera: Optional[str] = None):
+async def get_status(
+    request: Request,
+    carrera: Optional[str] = None,
+    since: Optional[int] = Query(default=None, ge=0),
+):
     """
     Obtiene el estado consolidado de todos los clientes registrados
     
@@ -90,97 +374,379 @@ async def get_status(carrera: Optional[str] = None):
     Args:
         carrera: Filtrar PCs por código de carrera (ej: 5002 para Contabilidad)
                  Si no se especifica, retorna todas las PCs
+        since: Versión del estado ya conocida por el cliente (modo delta)
     
     Estados:
     - offline: No ha enviado heartbeat en los últimos 60 segundos
     - online: Envía heartbeat pero no tiene usuario activo
     - inUse: Envía heartbeat y tiene sesión de usuario activa
     
+    Modo delta (?since=N):
+    - Retorna {"version", "full", "hosts", "removed"}
+    - hosts: solo los que cambiaron status, user, IP o carrera desde N
+    - removed: IDs que ya no pertenecen a la vista
+    - full=true si N no es utilizable (p.ej. 0 o servidor reiniciado):
+      hosts contiene la vista completa y el cliente debe reemplazar su lista
+    
     Returns:
         Lista de objetos con información de cada host
+        (la versión actual va en el header X-State-Version)
+        Respuesta con ETag: con If-None-Match y sin cambios retorna 304
     """
-    results = []
-    now = datetime.now()
-    timeout_threshold = timedelta(seconds=60)
-    
-    # Procesar todos los clientes registrados
-    for hostname, state in clients_state.items():
-        # Filtrar por carrera si se especificó
-        if carrera and state.get("carrera") != carrera:
-            continue
-            
-        time_since_last_seen = now - state["last_seen"]
-        is_alive = time_since_last_seen < timeout_threshold
-        
-        # Determinar estado
-        if not is_alive:
-            status = "offline"
-        elif state["user"]:
-            status = "inUse"
-        else:
-            status = "online"
-        
-        results.append({
-            "id": state["id"],
-            "name": hostname,
-            "ip": state["ip"],
-            "status": status,
-            "user": state["user"] if state["user"] else None,
-            "lastSeen": state["last_seen"].isoformat(),
-            "carrera": state.get("carrera", "5010")
-        })
-    
-    # Ordenar por ID para presentación consistente
-    results.sort(key=lambda x: x["id"])
-    
-    return results
+    # El status ya está al día: el sweeper marca offline en segundo plano
+    carrera = carrera or None
+
+    if since is None:
+        # El índice ya entrega los hosts de la carrera en orden de ID
+        snapshot = snapshots.get(
+            ("status", carrera),
+            fleet.version,
+            lambda: [_host_status(host) for host in fleet.iter_hosts(carrera)],
+        )
+        return snapshot_response(request, snapshot, {"X-State-Version": str(snapshot.version)})
+
+    delta = fleet.changes_since(since, carrera) if since > 0 else None
+    if delta is None:
+        return {
+            "version": fleet.version,
+            "full": True,
+            "hosts": [_host_status(host) for host in fleet.iter_hosts(carrera)],
+            "removed": []
+        }
+
+    changed, removed = delta
+    return {
+        "version": fleet.version,
+        "full": False,
+        "hosts": [_host_status(host) for host in changed],
+        "removed": removed
+    }
+
+
+def _publish_event(event: dict) -> None:
+    """
+    Productor único del stream: serializa cada evento una sola vez
+    y lo reparte a los suscriptores según su filtro de carrera.
+    """
+    if not len(broadcaster):
+        return
+    if event["type"] == EVENT_REMOVED:
+        # Baja de toda la flota: la reciben todas las vistas que lo incluían
+        frame = sse_frame(
+            "removed", json.dumps({"type": "removed", "id": event["host_id"]}), event["version"]
+        )
+        broadcaster.publish(frame, event["prev_carrera"])
+        return
+    host = event["state"]
+    payload = {
+        "type": event["type"],
+        "from": event["from"],
+        "to": host.status,
+        "host": _host_status(host),
+    }
+    frame = sse_frame(event["type"], json.dumps(payload), event["version"])
+
+    removed_frame = None
+    if event["prev_carrera"] != host.carrera:
+        removed_frame = sse_frame(
+            "removed", json.dumps({"type": "removed", "id": host.id}), event["version"]
+        )
+    broadcaster.publish(frame, host.carrera, event["prev_carrera"], removed_frame)
+
+
+fleet.add_listener(_publish_event)
+
+async def _status_event_stream(request: Request, carrera: Optional[str]):
+    sub = broadcaster.subscribe(carrera)
+
+    try:
+        # Snapshot inicial: el cliente parte de la vista completa y su versión
+        snapshot = {
+            "version": fleet.version,
+            "hosts": [_host_status(host) for host in fleet.iter_hosts(carrera)],
+        }
+        yield sse_frame("snapshot", json.dumps(snapshot), fleet.version)
+
+        while True:
+            try:
+                frame = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": keep-alive\n\n"
+                continue
+            if frame is None:
+                # Cola desbordada: cerrar para que el cliente se reconecte
+                break
+            yield frame
+    finally:
+        broadcaster.unsubscribe(sub)
+
+
+@router.get("/status/stream")
+async def stream_status(request: Request, carrera: Optional[str] = None):
+    """
+    Stream Server-Sent Events con los cambios de estado de los hosts
+    Reemplaza el polling de /status: un evento por cambio, sin recorrer la flota
+
+    Args:
+        carrera: Filtrar eventos por código de carrera
+
+    Eventos:
+    - snapshot: vista completa inicial {"version", "hosts"}
+    - registered: host nuevo
+    - transition: online→inUse, inUse→online, →offline
+    - updated: cambio de user, IP o carrera sin cambio de status
+    - removed: el host salió de la carrera filtrada o fue dado de baja {"id"}
+    """
+    return StreamingResponse(
+        _status_event_stream(request, carrera or None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/hosts")
-async def get_hosts():
+async def get_hosts(request: Request):
     """
     Retorna la lista de todos los hosts registrados (activos e inactivos)
     Compatible con el endpoint anterior pero ahora dinámico
     """
-    hosts = []
-    for hostname, state in clients_state.items():
-        hosts.append({
-            "id": state["id"],
-            "name": hostname,
-            "ip": state["ip"]
-        })
-    
-    hosts.sort(key=lambda x: x["id"])
-    return hosts
+    snapshot = snapshots.get(
+        ("hosts", None),
+        fleet.version,
+        lambda: [
+            {
+                "id": host.id,
+                "name": host.hostname,
+                "ip": host.ip
+            }
+            for host in fleet.iter_hosts()
+        ],
+    )
+    return snapshot_response(request, snapshot)
+
+
+@router.get("/hosts/archive")
+async def list_archived_hosts(limit: int = Query(default=50, ge=1, le=1000)):
+    """
+    Hosts dados de baja (sin heartbeat por más de UNINET_HOST_TTL_DAYS
+    o purgados a mano), el más reciente primero
+    """
+    return {"total": len(archive), "hosts": archive.recent(limit)}
+
+
+@router.get("/hosts/archive/{key}")
+async def get_archived_host(key: str):
+    """
+    Busca un host archivado por hostname o por su antiguo ID (pc-NN)
+
+    Returns:
+        Último registro del host al darse de baja (ip, user, carrera,
+        first_seen/last_seen, archived_at y motivo)
+    """
+    record = archive.lookup(key)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"{key} no está en el archivo")
+    return record
+
+
+def _require_admin(user: User) -> None:
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo el administrador puede dar de baja hosts")
+
+
+@router.delete("/hosts/{host_id}")
+async def purge_host(host_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Da de baja un host a mano (solo admin) y lo archiva
+    Si el equipo sigue enviando heartbeats se registra de nuevo con otro ID.
+    """
+    _require_admin(current_user)
+    host = fleet.host_by_id(host_id)
+    reason = f"manual:{current_user.username}"
+    try:
+        removed = (
+            fleet.remove(host.hostname, archive=lambda hosts: archive.add(hosts, reason))
+            if host is not None else None
+        )
+    except OSError as e:
+        # El host sigue en el estado: la baja solo se aplica si quedó archivada
+        raise HTTPException(status_code=500, detail=f"No se pudo archivar el host: {e}")
+    if removed is None:
+        raise HTTPException(status_code=404, detail=f"Host {host_id} no encontrado")
+    return {"status": "ok", "id": removed.id, "hostname": removed.hostname}
+
+
+@router.post("/hosts/purge")
+async def purge_stale_hosts(
+    older_than_days: float = Query(ge=0),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Da de baja y archiva ahora todos los hosts offline sin heartbeat
+    hace más de `older_than_days` días (solo admin)
+    """
+    _require_admin(current_user)
+    try:
+        evicted = evictor.evict(timedelta(days=older_than_days), f"manual:{current_user.username}")
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"No se pudo archivar los hosts: {e}")
+    return {"status": "ok", "purged": len(evicted), "ids": [host.id for host in evicted]}
+
+
+def _history_range(start: Optional[datetime], end: Optional[datetime]) -> tuple:
+    """Rango [start, end] en epoch; por defecto las últimas 24 horas"""
+    now = datetime.now().timestamp()
+    end_ts = end.timestamp() if end else now
+    start_ts = start.timestamp() if start else end_ts - 86400
+    if start_ts >= end_ts:
+        raise HTTPException(status_code=400, detail="start debe ser anterior a end")
+    # Después de ahora no hay nada observado: no se cuentan segundos futuros
+    end_ts = min(end_ts, now)
+    start_ts = min(start_ts, end_ts)
+    # Más atrás de la retención no hay buckets
+    oldest = (datetime.now() - timedelta(days=RETENTION_DAYS)).timestamp()
+    return max(start_ts, oldest), end_ts
+
+
+@router.get("/hosts/{host_id}/history")
+async def get_host_history(
+    host_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    step: int = Query(default=4, ge=1, le=96),
+):
+    """
+    Línea de tiempo de un host: últimas transiciones y tiempo en cada estado
+
+    Args:
+        host_id: ID del host (pc-NN)
+        start/end: Rango (ISO 8601), por defecto las últimas 24 horas
+        step: Buckets de 15 minutos agrupados por punto (4 = 1 hora)
+
+    Returns:
+        {"id", "name", "carrera", "samples", "buckets", "totals"}
+        con segundos online/inUse/offline por bucket y en total
+    """
+    start_ts, end_ts = _history_range(start, end)
+    hostname = history.hostname_for(host_id)
+    timeline = history.timeline(hostname, start_ts, end_ts, step) if hostname else None
+    if timeline is None:
+        raise HTTPException(status_code=404, detail=f"Host {host_id} sin historial")
+    return timeline
+
+
+@router.get("/occupancy")
+async def get_occupancy(
+    carrera: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    step: int = Query(default=4, ge=1, le=96),
+):
+    """
+    Ocupación de los equipos de una carrera en un rango de tiempo
+    Se calcula con los buckets acumulados de 15 minutos, sin recorrer eventos.
+
+    Returns:
+        {"carrera", "buckets", "totals", "hosts"} donde occupancy es la
+        fracción del tiempo observado en estado inUse
+    """
+    start_ts, end_ts = _history_range(start, end)
+    return history.occupancy(carrera, start_ts, end_ts, step)
 
 
 @router.get("/stats")
-async def get_stats():
+async def get_stats(carrera: Optional[str] = None):
     """
     Estadísticas generales del sistema de monitoreo
+    Los contadores se mantienen en cada cambio de estado: no se recorre la flota.
+    """
+    return fleet.stats(carrera or None)
+
+
+@router.get("/stats/carreras")
+async def get_carrera_stats():
+    """
+    Estadísticas por carrera (hosts sin carrera bajo "sin-carrera")
     """
-    now = datetime.now()
-    timeout_threshold = timedelta(seconds=60)
-    
-    total = len(clients_state)
-    online_count = 0
-    in_use_count = 0
-    offline_count = 0
-    
-    for state in clients_state.values():
-        time_since_last_seen = now - state["last_seen"]
-        is_alive = time_since_last_seen < timeout_threshold
-        
-        if not is_alive:
-            offline_count += 1
-        elif state["user"]:
-            in_use_count += 1
-        else:
-            online_count += 1
-    
     return {
-        "total": total,
-        "online": online_count,
-        "inUse": in_use_count,
-        "offline": offline_count
+        carrera or "sin-carrera": counts
+        for carrera, counts in sorted(fleet.carrera_stats().items(), key=lambda item: item[0] or "")
     }
+
+
+def _allowed_carreras(user: User) -> Optional[set]:
+    """None si puede operar sobre cualquier carrera (admin); si no, sus carreras"""
+    if user.role == "admin":
+        return None
+    user_id = get_user_id(user.username)
+    return {c.id for c in get_user_carreras(user_id)} if user_id is not None else set()
+
+
+@router.post("/commands")
+async def create_command(data: CommandRequest, current_user: User = Depends(get_current_user)):
+    """
+    Encola un comando de control para un host o para toda una carrera
+    Se entrega en la respuesta del próximo heartbeat de cada PC destino.
+
+    Body:
+        type: block_internet | unblock_internet | lock_session | refresh_config
+        host_id o carrera: destino (exactamente uno)
+        args: parámetros del comando (ej: {"allow": ["10.0.0.5"]})
+        ttl: segundos que el comando espera confirmación antes de descartarse
+
+    Los docentes solo pueden enviar comandos a sus carreras.
+    """
+    if data.type not in COMMAND_TYPES:
+        raise HTTPException(status_code=400, detail=f"Comando desconocido: {data.type}")
+    if bool(data.host_id) == bool(data.carrera):
+        raise HTTPException(status_code=400, detail="Indicar host_id o carrera (solo uno)")
+
+    hostname = None
+    carrera = data.carrera
+    if data.host_id:
+        host = fleet.host_by_id(data.host_id)
+        if host is None:
+            raise HTTPException(status_code=404, detail=f"Host {data.host_id} no encontrado")
+        hostname, carrera = host.hostname, host.carrera
+
+    allowed = _allowed_carreras(current_user)
+    if allowed is not None and carrera not in allowed:
+        raise HTTPException(status_code=403, detail="Sin permisos sobre esta carrera")
+
+    command = commands.enqueue(data.type, data.args, hostname=hostname, carrera=data.carrera, ttl=data.ttl)
+    print(f"📡 Comando {data.type} encolado para {hostname or 'carrera ' + carrera} (id {command['id']})")
+    return command
+
+
+@router.get("/commands")
+async def list_commands(carrera: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """
+    Comandos vigentes: los de host hasta que el agente los confirma,
+    los de carrera hasta su ttl (también llegan a PCs que se conecten después)
+
+    Args:
+        carrera: Solo los comandos de la carrera y de sus hosts
+    """
+    allowed = _allowed_carreras(current_user)
+    hosts = {host.hostname: host.carrera for host in fleet.iter_hosts()}
+    result = []
+    for command in commands.list():
+        target = hosts.get(command["hostname"]) if command["hostname"] else command["carrera"]
+        if carrera is not None and target != carrera:
+            continue
+        if allowed is not None and target not in allowed:
+            continue
+        result.append(command)
+    return result
+
+
+@router.delete("/commands/{command_id}")
+async def cancel_command(command_id: int, current_user: User = Depends(get_current_user)):
+    """Retira un comando pendiente (solo admin)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo el administrador puede cancelar comandos")
+    if not commands.cancel(command_id):
+        raise HTTPException(status_code=404, detail=f"Comando {command_id} no encontrado")
+    return {"status": "ok", "id": command_id}
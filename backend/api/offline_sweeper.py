@@ -0,0 +1,83 @@
+"""
+Detección de hosts offline en segundo plano
+Una tarea asyncio duerme hasta el próximo vencimiento (last_seen + timeout)
+y marca offline a los hosts justo cuando vencen. Las transiciones llegan a
+los listeners del backend (stream SSE), por lo que /status y /stats solo
+leen el estado: nunca recalculan si un host sigue vivo.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from api.fleet_backend import FleetBackend
+
+
+class OfflineSweeper:
+    """
+    Tarea de fondo que expira hosts en el momento en que vencen.
+
+    - El backend entrega el próximo vencimiento (next_expiry) en O(1)/O(log n),
+      así la tarea no despierta mientras ningún host esté por vencer.
+    - Sin hosts vivos no hay vencimiento: la tarea espera a notify(),
+      que se llama cuando llega un heartbeat.
+    - Con estado compartido (sqlite) otros workers cambian los vencimientos
+      y generan eventos: la espera se limita a `shared_interval`.
+    - `grace` retorna segundos extra de timeout (heartbeats diferidos por
+      el control de admisión): esos hosts no vencen mientras esperan.
+    """
+
+    def __init__(
+        self,
+        fleet: FleetBackend,
+        shared_interval: float = 1.0,
+        grace: Optional[Callable[[], float]] = None,
+    ):
+        self.fleet = fleet
+        self.shared_interval = shared_interval
+        self.grace = grace
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._idle = False
+
+    def start(self) -> None:
+        """Inicia la tarea en el event loop actual (startup de la app)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def notify(self) -> None:
+        """Avisa que hay un host vivo nuevo si la tarea no tenía vencimientos"""
+        if self._idle and self._wakeup is not None:
+            self._idle = False
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                grace = self.grace() if self.grace is not None else 0.0
+                self.fleet.expire(datetime.now() - timedelta(seconds=grace))
+                deadline = self.fleet.next_expiry()
+                if deadline is not None:
+                    deadline += grace
+            except Exception as e:
+                print(f"⚠️  Error detectando hosts offline: {e}")
+                deadline = time.time() + self.shared_interval
+
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            if self.fleet.shared:
+                timeout = self.shared_interval if timeout is None else min(timeout, self.shared_interval)
+
+            self._wakeup.clear()
+            self._idle = deadline is None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
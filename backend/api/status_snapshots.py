@@ -0,0 +1,72 @@
+"""
+Respuestas JSON pre-serializadas para los endpoints de polling
+Cada (endpoint, carrera) guarda los bytes ya codificados y su ETag; solo se
+reconstruyen cuando cambia la versión del estado de la flota (o vence
+`max_age`, para refrescar lastSeen). Un poll sin cambios con If-None-Match
+responde 304 sin recorrer hosts ni serializar.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from fastapi import Request, Response
+
+
+class Snapshot:
+    """Cuerpo codificado, ETag fuerte y versión de la que se construyó"""
+
+    __slots__ = ("version", "body", "etag", "built_at")
+
+    def __init__(self, version: int, body: bytes, built_at: float):
+        self.version = version
+        self.body = body
+        # Hash del contenido: mismo ETag <=> mismos bytes
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.built_at = built_at
+
+
+class SnapshotCache:
+    """Snapshots por clave con reconstrucción perezosa y cantidad acotada"""
+
+    def __init__(self, max_age: float, max_entries: int = 256):
+        self.max_age = max_age
+        # La carrera viene del query string: limitar claves distintas
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Snapshot]" = OrderedDict()
+
+    def get(self, key: Hashable, version: int, build: Callable[[], object]) -> Snapshot:
+        """Snapshot vigente de `key`; llama a build() solo si hay que reconstruirlo"""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version or now - entry.built_at > self.max_age:
+            body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            entry = Snapshot(version, body, now)
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+        return entry
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    tags = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def snapshot_response(request: Request, snapshot: Snapshot, headers: Optional[dict] = None) -> Response:
+    """200 con el cuerpo pre-codificado, o 304 si el cliente ya tiene ese ETag"""
+    headers = dict(headers or {})
+    headers["ETag"] = snapshot.etag
+    # El navegador guarda la respuesta pero revalida en cada poll
+    headers["Cache-Control"] = "no-cache"
+    if _etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
@@ -0,0 +1,84 @@
+"""
+Difusión de cambios de estado de hosts a dashboards suscritos (SSE)
+Un único productor (el estado de la flota) genera cada evento una sola vez;
+aquí solo se reparte el frame ya serializado a las colas de los suscriptores.
+"""
+
+import asyncio
+from typing import Dict, Optional, Set
+
+
+class Subscriber:
+    """Suscriptor de eventos con filtro opcional de carrera"""
+
+    __slots__ = ("queue", "carrera")
+
+    def __init__(self, carrera: Optional[str], queue_size: int):
+        self.carrera = carrera
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=queue_size)
+
+
+class StatusBroadcaster:
+    """
+    Reparte frames SSE a los suscriptores, indexados por carrera
+    (None = todas las carreras), para no recorrer suscriptores que no aplican.
+
+    Si la cola de un suscriptor se llena (cliente lento), se vacía y se le
+    envía None: el stream se cierra y el cliente se reconecta con un snapshot.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._by_carrera: Dict[Optional[str], Set[Subscriber]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(subs) for subs in self._by_carrera.values())
+
+    def subscribe(self, carrera: Optional[str] = None) -> Subscriber:
+        sub = Subscriber(carrera, self.queue_size)
+        self._by_carrera.setdefault(carrera, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        subs = self._by_carrera.get(sub.carrera)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._by_carrera[sub.carrera]
+
+    def publish(
+        self,
+        frame: bytes,
+        carrera: Optional[str],
+        prev_carrera: Optional[str] = None,
+        removed_frame: Optional[bytes] = None,
+    ) -> None:
+        """
+        Envía `frame` a los suscriptores globales y a los de `carrera`.
+        Si el host salió de `prev_carrera`, sus suscriptores reciben `removed_frame`.
+        """
+        for sub in self._by_carrera.get(None, ()):
+            self._offer(sub, frame)
+        if carrera is not None:
+            for sub in self._by_carrera.get(carrera, ()):
+                self._offer(sub, frame)
+        if removed_frame is not None and prev_carrera not in (None, carrera):
+            for sub in self._by_carrera.get(prev_carrera, ()):
+                self._offer(sub, removed_frame)
+
+    @staticmethod
+    def _offer(sub: Subscriber, frame: bytes) -> None:
+        try:
+            sub.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: forzar reconexión con snapshot nuevo
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(None)
+
+
+def sse_frame(event: str, data: str, event_id: Optional[int] = None) -> bytes:
+    """Codifica un evento Server-Sent Events"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n".encode("utf-8")
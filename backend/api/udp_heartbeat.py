@@ -0,0 +1,172 @@
+"""
+Heartbeats por UDP (opcional)
+El agente envía un datagrama compacto y autenticado en lugar de un POST HTTP:
+sin conexión TCP ni parsing HTTP/JSON en la ruta más frecuente.
+
+Formato (texto, un datagrama por heartbeat):
+    UN1|<epoch>|<hostname>|<ip>|<user>|<carrera>|<hmac>
+
+- user vacío = sin sesión activa
+- hmac: HMAC-SHA256 en hex de todo lo anterior al último "|"
+  con la clave compartida (UNINET_UDP_KEY)
+- epoch: segundos del agente; se rechazan datagramas fuera de la ventana
+  permitida o con epoch igual o anterior al último aceptado de ese host
+  (replay). El agente envía a lo sumo uno por segundo (cron, `date +%s`)
+
+El último epoch aceptado por host se guarda en memoria de cada worker: con
+--workers N y SO_REUSEPORT un datagrama capturado puede reenviarse a otro
+worker y aceptarse una vez más dentro de la ventana (MAX_CLOCK_SKEW). Solo
+repite un estado que el host ya reportó (la firma cubre todos los campos),
+a lo sumo una vez por worker.
+
+Se eligió texto en lugar de un layout binario para que el agente en bash
+pueda armarlo con printf/openssl y enviarlo con /dev/udp.
+
+Los datagramas válidos pasan por el mismo bucket global que los heartbeats
+HTTP (`admit`); si no se admiten se descartan: UDP no tiene por dónde
+devolver un Retry-After y el agente vuelve a enviar en el próximo ciclo.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import socket
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from api.fleet_backend import Heartbeat
+
+MAGIC = "UN1"
+
+# Tolerancia de reloj entre agente y servidor (segundos)
+MAX_CLOCK_SKEW = 120
+
+# Tamaño máximo aceptado de un datagrama
+MAX_DATAGRAM = 512
+
+
+def sign(key: bytes, payload: str) -> str:
+    """Agrega la firma HMAC a un datagrama (formato del agente)"""
+    digest = hmac.new(key, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{payload}|{digest}"
+
+
+class UdpHeartbeatListener(asyncio.DatagramProtocol):
+    """
+    Recibe heartbeats UDP y los entrega en lote a `apply`.
+    Los datagramas que llegan en la misma vuelta del event loop se aplican
+    juntos (una sola transacción con el backend SQLite).
+    `admit` (opcional) decide por datagrama válido si se acepta según la carga.
+    """
+
+    def __init__(
+        self,
+        key: bytes,
+        apply: Callable[[List[Heartbeat], datetime], Awaitable[List[str]]],
+        host: str = "0.0.0.0",
+        port: int = 4001,
+        admit: Optional[Callable[[], bool]] = None,
+    ):
+        self.key = key
+        self.apply = apply
+        self.admit = admit
+        self.host = host
+        self.port = port
+        self.accepted = 0
+        self.rejected = 0
+        # Válidos pero descartados por el control de admisión
+        self.throttled = 0
+        self._pending: List[Heartbeat] = []
+        # Lotes en curso (referencia para que el loop no los descarte)
+        self._applying: Set[asyncio.Task] = set()
+        self._last_ts: Dict[str, int] = {}
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------
+
+    def start(self) -> None:
+        """Abre el socket en el event loop actual (startup de la app)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._open())
+
+    async def _open(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            # Con varios workers cada uno abre el mismo puerto (SO_REUSEPORT)
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: self,
+                local_addr=(self.host, self.port),
+                reuse_port=hasattr(socket, "SO_REUSEPORT"),
+            )
+            print(f"📡 Heartbeats UDP escuchando en {self.host}:{self.port}")
+        except OSError as e:
+            print(f"⚠️  No se pudo abrir el puerto UDP {self.port}: {e}")
+
+    def stop(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        self._task = None
+
+    # ------------------------------------------------------------
+    # Recepción
+    # ------------------------------------------------------------
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        heartbeat = self.parse(data)
+        if heartbeat is None:
+            self.rejected += 1
+            return
+        if self.admit is not None and not self.admit():
+            self.throttled += 1
+            return
+        self.accepted += 1
+        if not self._pending:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self._pending.append(heartbeat)
+
+    def parse(self, data: bytes) -> Optional[Heartbeat]:
+        """Valida firma, ventana de tiempo y campos; None si se rechaza"""
+        if len(data) > MAX_DATAGRAM:
+            return None
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+        payload, _, digest = text.rpartition("|")
+        expected = hmac.new(self.key, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(digest.strip().encode("utf-8"), expected.encode("ascii")):
+            return None
+
+        fields = payload.split("|")
+        if len(fields) != 6 or fields[0] != MAGIC:
+            return None
+        _, ts_text, hostname, ip, user, carrera = fields
+        try:
+            ts = int(ts_text)
+        except ValueError:
+            return None
+        if not hostname or not ip or abs(time.time() - ts) > MAX_CLOCK_SKEW:
+            return None
+        # Un datagrama repetido o atrasado no puede reescribir el estado
+        if ts <= self._last_ts.get(hostname, 0):
+            return None
+        self._last_ts[hostname] = ts
+        return hostname, ip, user or None, carrera or None
+
+    def _flush(self) -> None:
+        pending, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._apply(pending, datetime.now()))
+        self._applying.add(task)
+        task.add_done_callback(self._applying.discard)
+
+    async def _apply(self, pending: List[Heartbeat], now: datetime) -> None:
+        try:
+            await self.apply(pending, now)
+        except Exception as e:
+            print(f"⚠️  Error aplicando heartbeats UDP: {e}")
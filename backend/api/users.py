@@ -10,6 +10,9 @@ from typing import List, Optional
 import subprocess
 import os
 
+from api import config
+from api.ldap_cache import group_cache
+
 router = APIRouter()
 
 # Rutas a los scripts LDAP
@@ -58,46 +61,23 @@ class UserDelete(BaseModel):
 # NUEVO: Helpers LDAP
 # ==========================
 
-def _read_ldap_conf(path: str = "/etc/uninet/ldap.conf") -> dict:
+def _ldap_groups_for_user(username: str) -> list[str]:
     """
-    Lee ldap.conf (KEY=VALUE) y retorna dict.
+    NUEVO: Retorna grupos (cn) donde memberUid=username.
+    Usa el caché compartido (api/ldap_cache.py) antes de consultar LDAP.
     """
-    conf: dict[str, str] = {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                k, v = line.split("=", 1)
-                conf[k.strip()] = v.strip()
-    except FileNotFoundError:
-        pass
-    return conf
+    if not username:
+        return []
+    return group_cache.get_or_load(username, _ldap_search_groups)
 
 
-def _try_read_admin_pass(path: str = "/etc/uninet/ldap_admin_pass") -> str:
-    """
-    Lee la contraseña admin guardada (opcional).
-    No revienta si no existe o no hay permisos: retorna "".
+def _ldap_search_groups(username: str) -> list[str]:
     """
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read().strip()
-    except Exception:
-        return ""
-
-
-def _ldap_groups_for_user(username: str) -> list[str]:
-    """
-    NUEVO: Retorna grupos (cn) donde memberUid=username.
+    Consulta LDAP sin caché.
     1) Intenta bind anónimo (suele funcionar si LDAP permite lectura).
     2) Si falla, intenta con LDAP_ADMIN + pass si existe.
     """
-    if not username:
-        return []
-
-    conf = _read_ldap_conf()
+    conf = config.ldap_conf()
 
     ldap_uri = conf.get("LDAP_URI", "ldap://localhost:389")
     ldap_base = conf.get("LDAP_BASE", "")
@@ -122,7 +102,7 @@ def _ldap_groups_for_user(username: str) -> list[str]:
 
     # 2) intento autenticado si hay credenciales disponibles
     admin_dn = conf.get("LDAP_ADMIN", "")
-    admin_pass = conf.get("LDAP_ADMIN_PASSWORD", "") or _try_read_admin_pass()
+    admin_pass = conf.get("LDAP_ADMIN_PASSWORD", "") or config.ldap_admin_pass()
 
     if not admin_dn or not admin_pass:
         return []
@@ -198,6 +178,7 @@ async def create_user(user_data: UserCreate):
         )
 
         if result.returncode == 0:
+            group_cache.invalidate(user_data.username)
             return {"success": True, "message": f"Usuario {user_data.username} creado exitosamente", "username": user_data.username}
 
         raise HTTPException(status_code=400, detail=f"Error al crear usuario: {result.stderr}")
@@ -322,6 +303,7 @@ async def delete_user(user_data: UserDelete):
         result = subprocess.run(["bash", script_path, user_data.username], capture_output=True, text=True, timeout=10)
 
         if result.returncode == 0:
+            group_cache.invalidate(user_data.username)
             return {"success": True, "message": f"Usuario {user_data.username} eliminado exitosamente", "username": user_data.username}
 
         raise HTTPException(status_code=400, detail=f"Error al eliminar usuario: {result.stderr}")
@@ -330,3 +312,21 @@ async def delete_user(user_data: UserDelete):
         raise HTTPException(status_code=504, detail="Timeout al eliminar usuario")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+
+@router.get("/groups-cache", response_model=dict)
+async def get_groups_cache_stats():
+    """
+    Estado del caché de grupos LDAP (entradas, hits, misses)
+    """
+    return group_cache.stats()
+
+
+@router.delete("/groups-cache", response_model=dict)
+async def clear_groups_cache(username: Optional[str] = None):
+    """
+    Invalida el caché de grupos LDAP (un usuario o todo)
+    Útil tras cambiar grupos directamente en LDAP
+    """
+    group_cache.invalidate(username)
+    return {"success": True, "username": username}
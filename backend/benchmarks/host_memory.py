@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria por host del estado de monitoreo
+
+Compara la representación original (un dict por host con datetime y
+strings sin compartir) con HostRecord/FleetState (__slots__, IPv4
+empaquetada, carrera/usuario internados y epoch en segundos).
+
+Uso (desde backend/):
+    python -m benchmarks.host_memory --hosts 20000
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from datetime import datetime
+
+from api.fleet_state import FleetState, HostRecord, STATUS_IN_USE, STATUS_ONLINE
+
+CARRERAS = [f"50{n:02d}" for n in range(1, 13)]
+
+
+def _heartbeats(n: int) -> list:
+    """Heartbeats como llegan por HTTP: strings nuevos por cada request"""
+    payloads = []
+    for i in range(n):
+        payloads.append(json.dumps({
+            "hostname": f"lab-{i // 40:03d}-pc{i % 40:02d}",
+            "ip": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            "user": f"alumno{i % 900:04d}" if i % 3 else None,
+            "carrera": CARRERAS[i % len(CARRERAS)],
+        }))
+    return [json.loads(p) for p in payloads]
+
+
+def _build_dicts(heartbeats: list) -> dict:
+    """Representación original de clients_state"""
+    clients_state = {}
+    for hb in heartbeats:
+        clients_state[hb["hostname"]] = {
+            "id": f"pc-{len(clients_state) + 1:02d}",
+            "ip": hb["ip"],
+            "user": hb["user"],
+            "carrera": hb["carrera"],
+            "last_seen": datetime.now(),
+            "first_seen": datetime.now(),
+        }
+    return clients_state
+
+
+def _build_records(heartbeats: list) -> dict:
+    """Solo los registros compactos (mismo contenido que los dicts originales)"""
+    hosts = {}
+    for hb in heartbeats:
+        ts = datetime.now().timestamp()
+        status = STATUS_IN_USE if hb["user"] else STATUS_ONLINE
+        hosts[hb["hostname"]] = HostRecord(
+            hb["hostname"], len(hosts) + 1, hb["ip"], hb["user"], hb["carrera"], status, ts, ts
+        )
+    return hosts
+
+
+def _build_fleet(heartbeats: list) -> FleetState:
+    fleet = FleetState()
+    for hb in heartbeats:
+        fleet.apply_heartbeat(hb["hostname"], hb["ip"], hb["user"], hb["carrera"], datetime.now())
+    return fleet
+
+
+def _measure(build, n: int) -> int:
+    """
+    Bytes retenidos por la estructura tras procesar n heartbeats.
+    Los strings del heartbeat que la estructura conserva cuentan;
+    los que descarta (p.ej. al internar) se liberan antes de medir.
+    """
+    gc.collect()
+    tracemalloc.start()
+    heartbeats = _heartbeats(n)
+    result = build(heartbeats)
+    del heartbeats
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memoria por host del estado de monitoreo")
+    parser.add_argument("--hosts", type=int, default=20000)
+    args = parser.parse_args()
+
+    dict_bytes = _measure(_build_dicts, args.hosts)
+    record_bytes = _measure(_build_records, args.hosts)
+    fleet_bytes = _measure(_build_fleet, args.hosts)
+
+    print(json.dumps({
+        "hosts": args.hosts,
+        # Antes: dict por host en clients_state
+        "dict_bytes_per_host": round(dict_bytes / args.hosts, 1),
+        # Después: HostRecord por host (mismo contenido)
+        "record_bytes_per_host": round(record_bytes / args.hosts, 1),
+        "record_reduction": round(1 - record_bytes / dict_bytes, 3),
+        # Después, con índices por ID (seq) y carrera, cola de expiración y versiones
+        "fleet_bytes_per_host": round(fleet_bytes / args.hosts, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
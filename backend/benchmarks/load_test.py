@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga del servidor de monitoreo
+
+Levanta api.main:app con uvicorn en un puerto local (o usa --server-url),
+simula N agentes enviando heartbeats con jitter y M dashboards consultando
+/api/status, /api/stats y /api/hosts, y reporta por endpoint:
+throughput, latencias p50/p95/p99 y la memoria (RSS) del servidor.
+
+El resultado se guarda en JSON (--output) para comparar entre versiones;
+con --compare se contrasta con una corrida anterior y el proceso termina
+con código 1 si alguna latencia p95 o el throughput empeoran más que --tolerance.
+
+Uso (desde backend/):
+    python -m benchmarks.load_test --agents 5000 --dashboards 20 --duration 60
+    python -m benchmarks.load_test --agents 5000 --output bench/2.0.json
+    python -m benchmarks.load_test --agents 5000 --compare bench/2.0.json
+    python -m benchmarks.load_test --agents 20000 --transport udp
+
+El cliente es asyncio + HTTP/1.1 mínimo (sin dependencias extra). Los
+agentes abren una conexión por heartbeat, como curl en uninet-agent.sh;
+los dashboards reutilizan su conexión, como un navegador.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from api.udp_heartbeat import sign
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CARRERAS = [f"50{n:02d}" for n in range(1, 13)]
+
+DASHBOARD_ENDPOINTS = ["/api/status", "/api/stats", "/api/hosts"]
+
+UDP_KEY = "benchmark"
+
+
+# ============================================================
+# CLIENTE HTTP MÍNIMO
+# ============================================================
+
+async def _read_response(reader: asyncio.StreamReader, headers: Optional[dict] = None) -> int:
+    """Lee una respuesta HTTP/1.1 completa y retorna el status (headers opcionales en `headers`)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Conexión cerrada por el servidor")
+    status = int(status_line.split()[1])
+
+    length = 0
+    chunked = False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if headers is not None:
+            headers[name] = value.strip()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status
+
+
+def _request_bytes(
+    method: str, path: str, body: bytes = b"", keep_alive: bool = True, etag: Optional[str] = None
+) -> bytes:
+    head = (
+        f"{method} {path} HTTP/1.1\r\n"
+        f"Host: uninet-bench\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+    )
+    if etag:
+        head += f"If-None-Match: {etag}\r\n"
+    if body:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    return head.encode("latin-1") + b"\r\n" + body
+
+
+# ============================================================
+# MÉTRICAS
+# ============================================================
+
+class Recorder:
+    """Latencias (segundos) y errores por endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        # Respuestas 304 por path (polls sin cambios)
+        self.not_modified: Dict[str, int] = {}
+        # Heartbeats diferidos por el control de admisión (429/503)
+        self.throttled: Dict[str, int] = {}
+
+    def add(self, name: str, seconds: float, ok: bool) -> None:
+        if ok:
+            self.latencies.setdefault(name, []).append(seconds)
+        else:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies.get(name, []))
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "throughput_rps": round(len(values) / elapsed, 1),
+                "p50_ms": _percentile(values, 50),
+                "p95_ms": _percentile(values, 95),
+                "p99_ms": _percentile(values, 99),
+                "max_ms": round(values[-1] * 1000, 2) if values else None,
+            }
+            path = name.partition(" ")[2]
+            if path in self.not_modified:
+                endpoints[name]["not_modified"] = self.not_modified[path]
+            if name in self.throttled:
+                endpoints[name]["throttled"] = self.throttled[name]
+        return endpoints
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano, en milisegundos"""
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return round(values[rank] * 1000, 2)
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """RSS del proceso y sus hijos (workers de uvicorn), vía /proc"""
+    def rss_of(p: int) -> int:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    if not os.path.isdir("/proc"):
+        return None
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss_of(current)
+        stack.extend(children.get(current, []))
+    return total
+
+
+# ============================================================
+# CARGA
+# ============================================================
+
+def _agent_payload(i: int) -> dict:
+    return {
+        "hostname": f"lab-{i // 40:03d}-pc{i % 40:02d}",
+        "ip": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+        "user": None,
+        "carrera": CARRERAS[i % len(CARRERAS)],
+    }
+
+
+async def _agent(i: int, args, recorder: Recorder, limit: asyncio.Semaphore, deadline: float) -> None:
+    """Un agente: heartbeat cada `interval` ± jitter, arranque escalonado"""
+    rng = random.Random(i)
+    payload = _agent_payload(i)
+    await asyncio.sleep(rng.uniform(0, args.interval))
+
+    udp = None
+    if args.transport == "udp":
+        loop = asyncio.get_running_loop()
+        udp, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(args.host, args.udp_port)
+        )
+
+    try:
+        while time.monotonic() < deadline:
+            # Sesión de usuario que cambia de vez en cuando (transiciones reales)
+            if rng.random() < args.user_change:
+                payload["user"] = None if payload["user"] else f"alumno{rng.randrange(900):04d}"
+
+            if udp is not None:
+                message = sign(UDP_KEY.encode("utf-8"), "|".join([
+                    "UN1", str(int(time.time())), payload["hostname"], payload["ip"],
+                    payload["user"] or "", payload["carrera"],
+                ]))
+                # Sin respuesta: solo se mide el costo de envío del lado del agente
+                start = time.perf_counter()
+                udp.sendto(message.encode("utf-8"))
+                recorder.add("UDP heartbeat (envío)", time.perf_counter() - start, True)
+            else:
+                body = json.dumps(payload).encode("utf-8")
+                name = "POST /api/heartbeat"
+                async with limit:
+                    start = time.perf_counter()
+                    status = None
+                    headers: Dict[str, str] = {}
+                    try:
+                        reader, writer = await asyncio.open_connection(args.host, args.port)
+                        writer.write(_request_bytes("POST", "/api/heartbeat", body, keep_alive=False))
+                        status = await _read_response(reader, headers)
+                        writer.close()
+                    except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+                        pass
+                    elapsed = time.perf_counter() - start
+                if status in (429, 503):
+                    # Diferido: reintentar cuando indica el servidor, como uninet-agentd
+                    recorder.throttled[name] = recorder.throttled.get(name, 0) + 1
+                    await asyncio.sleep(float(headers.get("retry-after") or 1))
+                    continue
+                recorder.add(name, elapsed, status == 200)
+
+            jitter = args.interval * args.jitter
+            await asyncio.sleep(args.interval + rng.uniform(-jitter, jitter))
+    finally:
+        if udp is not None:
+            udp.close()
+
+
+async def _dashboard(i: int, args, recorder: Recorder, deadline: float) -> None:
+    """
+    Un dashboard: consulta los endpoints de lectura con una conexión persistente
+    y revalida con If-None-Match, como el caché de un navegador
+    """
+    rng = random.Random(-i - 1)
+    await asyncio.sleep(rng.uniform(0, args.poll_interval))
+    reader = writer = None
+    etags: Dict[str, str] = {}
+
+    while time.monotonic() < deadline:
+        for path in DASHBOARD_ENDPOINTS:
+            start = time.perf_counter()
+            ok = False
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(args.host, args.port)
+                writer.write(_request_bytes("GET", path, etag=etags.get(path)))
+                headers: dict = {}
+                status = await _read_response(reader, headers)
+                ok = status in (200, 304)
+                if status == 200 and "etag" in headers:
+                    etags[path] = headers["etag"]
+                if status == 304:
+                    recorder.not_modified[path] = recorder.not_modified.get(path, 0) + 1
+            except (OSError, ConnectionError, ValueError, asyncio.IncompleteReadError):
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+            recorder.add(f"GET {path}", time.perf_counter() - start, ok)
+        await asyncio.sleep(args.poll_interval)
+
+    if writer is not None:
+        writer.close()
+
+
+async def _run_load(args, server_pid: Optional[int]) -> dict:
+    recorder = Recorder()
+    limit = asyncio.Semaphore(args.max_connections)
+    rss_samples: List[int] = []
+
+    async def sample_rss() -> None:
+        while True:
+            rss = _rss_bytes(server_pid)
+            if rss:
+                rss_samples.append(rss)
+            await asyncio.sleep(1)
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    sampler = asyncio.create_task(sample_rss()) if server_pid else None
+    tasks = [asyncio.create_task(_agent(i, args, recorder, limit, deadline)) for i in range(args.agents)]
+    tasks += [asyncio.create_task(_dashboard(i, args, recorder, deadline)) for i in range(args.dashboards)]
+
+    # Al llegar al deadline los agentes que esperan su próximo envío se cancelan
+    await asyncio.sleep(args.duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.monotonic() - started
+    if sampler is not None:
+        sampler.cancel()
+
+    # Estado final visto por el servidor (verifica que los heartbeats llegaron)
+    fleet = None
+    try:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        writer.write(_request_bytes("GET", "/api/stats", keep_alive=False))
+        fleet = json.loads((await reader.read()).split(b"\r\n\r\n", 1)[1])
+        writer.close()
+    except (OSError, ValueError, IndexError):
+        pass
+
+    endpoints = recorder.summary(elapsed)
+    requests = sum(item["requests"] for item in endpoints.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": endpoints,
+        "totals": {
+            "requests": requests,
+            "errors": sum(item["errors"] for item in endpoints.values()),
+            "throughput_rps": round(requests / elapsed, 1),
+        },
+        "fleet": fleet,
+        "server": {
+            "rss_max_mb": round(max(rss_samples) / 2**20, 1) if rss_samples else None,
+            "rss_end_mb": round(rss_samples[-1] / 2**20, 1) if rss_samples else None,
+        },
+    }
+
+
+# ============================================================
+# SERVIDOR
+# ============================================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(args, state_dir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["UNINET_STATE_DIR"] = state_dir
+    env["UNINET_FLEET_BACKEND"] = args.backend
+    if args.transport == "udp":
+        env["UNINET_UDP_PORT"] = str(args.udp_port)
+        env["UNINET_UDP_KEY"] = UDP_KEY
+
+    command = [
+        sys.executable, "-m", "uvicorn", "api.main:app",
+        "--host", args.host, "--port", str(args.port), "--log-level", "warning",
+    ]
+    if args.workers > 1:
+        command += ["--workers", str(args.workers)]
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+    # Esperar /health
+    limit = time.monotonic() + 30
+    while time.monotonic() < limit:
+        if server.poll() is not None:
+            raise RuntimeError("El servidor terminó al iniciar")
+        try:
+            with socket.create_connection((args.host, args.port), timeout=1) as conn:
+                conn.sendall(_request_bytes("GET", "/health", keep_alive=False))
+                if b" 200 " in conn.recv(64):
+                    return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("El servidor no respondió /health en 30 s")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ============================================================
+# COMPARACIÓN
+# ============================================================
+
+def _compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regresiones de p95 (más lento) y throughput (menor) respecto a baseline"""
+    regressions = []
+    for name, now in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        if before.get("p95_ms") and now.get("p95_ms") and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {now['p95_ms']} ms")
+        if before.get("throughput_rps") and now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']} -> {now['throughput_rps']} req/s"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de carga de heartbeats y dashboards")
+    parser.add_argument("--agents", type=int, default=2000, help="Agentes simulados")
+    parser.add_argument("--dashboards", type=int, default=10, help="Dashboards consultando")
+    parser.add_argument("--duration", type=float, default=60, help="Duración en segundos")
+    parser.add_argument("--interval", type=float, default=30, help="Intervalo de heartbeat (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Jitter del intervalo (fracción)")
+    parser.add_argument("--user-change", type=float, default=0.05,
+                        help="Probabilidad de cambio de sesión por heartbeat")
+    parser.add_argument("--poll-interval", type=float, default=2, help="Intervalo de polling (s)")
+    parser.add_argument("--max-connections", type=int, default=500,
+                        help="Conexiones simultáneas máximas de los agentes")
+    parser.add_argument("--transport", choices=["http", "udp"], default="http")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--server-url", help="Usar un servidor ya iniciado (host:puerto)")
+    parser.add_argument("--udp-port", type=int, default=0)
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto stdout)")
+    parser.add_argument("--compare", help="Resultado JSON anterior a comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Empeoramiento permitido al comparar (fracción)")
+    args = parser.parse_args()
+
+    if args.server_url:
+        args.host, _, port = args.server_url.replace("http://", "").partition(":")
+        args.port = int(port or 4000)
+    else:
+        args.host, args.port = "127.0.0.1", _free_port()
+    if args.transport == "udp" and not args.udp_port:
+        args.udp_port = _free_port()
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix="uninet-bench-") as state_dir:
+        if not args.server_url:
+            server = _start_server(args, state_dir)
+        try:
+            results = asyncio.run(_run_load(args, server.pid if server else None))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    report = {
+        "benchmark": "load_test",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "params": {
+            key: getattr(args, key)
+            for key in (
+                "agents", "dashboards", "duration", "interval", "jitter", "user_change",
+                "poll_interval", "transport", "backend", "workers",
+            )
+        },
+        **results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = _compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"⚠️  Regresión: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -144,6 +144,16 @@ SERVER_PORT="$SERVER_PORT"
 CARRERA="$CARRERA_CODE"
 EOF
 
+# Heartbeats UDP (opcional): UDP_PORT=4001 UDP_KEY=<clave> ... | sudo -E bash
+if [ -n "$UDP_PORT" ] && [ -n "$UDP_KEY" ]; then
+    cat >> "$CONFIG_DIR/config" << EOF
+UDP_PORT="$UDP_PORT"
+UDP_KEY="$UDP_KEY"
+EOF
+    chmod 600 "$CONFIG_DIR/config"
+    echo -e "${GREEN}✅ Heartbeats UDP activados (puerto $UDP_PORT)${NC}"
+fi
+
 echo -e "${GREEN}✅ Configuración guardada en: $CONFIG_DIR/config${NC}"
 
 # Descargar el agente desde el servidor
@@ -152,7 +162,7 @@ AGENT_FILE="$INSTALL_DIR/uninet-agent"
 
 echo -e "${BLUE}📥 Descargando agente de monitoreo desde el servidor...${NC}"
 
-if curl -s --max-time 10 "http://${SERVER_IP}:${SERVER_PORT}/agent" -o "$AGENT_FILE"; then
+if curl -fsS --max-time 10 "http://${SERVER_IP}:${SERVER_PORT}/agent" -o "$AGENT_FILE"; then
     chmod +x "$AGENT_FILE"
     echo -e "${GREEN}✅ Agente instalado en: $AGENT_FILE${NC}"
 else
@@ -160,12 +170,72 @@ else
     exit 1
 fi
 
-# Configurar cron para ejecutar cada 30 segundos
+# Configurar ejecución automática del agente
 echo -e "${BLUE}⏱️  Configurando monitoreo automático...${NC}"
 
-# Crear script wrapper para ejecutar dos veces por minuto
-CRON_WRAPPER="/usr/local/bin/uninet-agent-runner"
-cat > "$CRON_WRAPPER" << 'EOF'
+# Agente persistente (systemd + python3): una conexión keep-alive, envía al
+# cambiar usuario/IP y un heartbeat de mantenimiento con jitter. Sin systemd
+# o python3 se usa cron con uninet-agent.sh cada 30 segundos.
+# El agente persistente solo envía por HTTP: con UDP_PORT/UDP_KEY se mantiene
+# uninet-agent.sh por cron, que es el que envía los datagramas UDP.
+DAEMON_FILE="$INSTALL_DIR/uninet-agentd"
+SERVICE_FILE="/etc/systemd/system/uninet-agent.service"
+
+if [ -n "$UDP_PORT" ] && [ -n "$UDP_KEY" ]; then
+    AGENT_MODE="cron"
+    echo -e "${BLUE}ℹ️  Modo del agente: cron + UDP (uninet-agent.sh cada 30 segundos)${NC}"
+elif command -v python3 &> /dev/null && command -v systemctl &> /dev/null; then
+    AGENT_MODE="daemon"
+    echo -e "${BLUE}ℹ️  Modo del agente: persistente HTTP (servicio uninet-agent)${NC}"
+else
+    AGENT_MODE="cron"
+    echo -e "${BLUE}ℹ️  Modo del agente: cron HTTP (sin python3 o systemd)${NC}"
+fi
+
+if [ "$AGENT_MODE" = "daemon" ]; then
+    # -f: un error HTTP del servidor no se instala como servicio
+    if ! curl -fsS --max-time 10 "http://${SERVER_IP}:${SERVER_PORT}/agent-daemon" -o "$DAEMON_FILE"; then
+        rm -f "$DAEMON_FILE"
+        echo -e "${RED}❌ Error: No se pudo descargar el agente persistente desde el servidor${NC}"
+        exit 1
+    fi
+    chmod +x "$DAEMON_FILE"
+
+    cat > "$SERVICE_FILE" << EOF
+[Unit]
+Description=UniNet Agent - monitoreo de estado del equipo
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+ExecStart=$(command -v python3) $DAEMON_FILE
+Restart=always
+RestartSec=5
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+    # Quitar la tarea cron de instalaciones anteriores
+    if crontab -l 2>/dev/null | grep -q "uninet-agent-runner"; then
+        crontab -l 2>/dev/null | grep -v "uninet-agent-runner" | crontab -
+    fi
+
+    systemctl daemon-reload
+    systemctl enable --now uninet-agent.service
+    systemctl restart uninet-agent.service
+    echo -e "${GREEN}✅ Agente persistente activo (servicio uninet-agent)${NC}"
+else
+    # Quitar el agente persistente de instalaciones anteriores (no envía por UDP)
+    if [ -f "$SERVICE_FILE" ]; then
+        systemctl disable --now uninet-agent.service 2>/dev/null || true
+        rm -f "$SERVICE_FILE" "$DAEMON_FILE"
+        systemctl daemon-reload 2>/dev/null || true
+    fi
+
+    # Crear script wrapper para ejecutar dos veces por minuto
+    CRON_WRAPPER="/usr/local/bin/uninet-agent-runner"
+    cat > "$CRON_WRAPPER" << 'EOF'
 #!/bin/bash
 # Ejecutar el agente dos veces por minuto (cada 30 segundos)
 /usr/local/bin/uninet-agent
@@ -173,26 +243,27 @@ sleep 30
 /usr/local/bin/uninet-agent
 EOF
 
-chmod +x "$CRON_WRAPPER"
+    chmod +x "$CRON_WRAPPER"
 
-# Agregar tarea a cron (se ejecuta cada minuto, pero el wrapper lo hace cada 30s)
-CRON_JOB="* * * * * $CRON_WRAPPER >/dev/null 2>&1"
+    # Agregar tarea a cron (se ejecuta cada minuto, pero el wrapper lo hace cada 30s)
+    CRON_JOB="* * * * * $CRON_WRAPPER >/dev/null 2>&1"
 
-# Verificar si ya existe la entrada
-if ! crontab -l 2>/dev/null | grep -q "uninet-agent-runner"; then
-    (crontab -l 2>/dev/null; echo "$CRON_JOB") | crontab -
-    echo -e "${GREEN}✅ Monitoreo automático configurado (heartbeat cada 30 segundos)${NC}"
-else
-    echo -e "${YELLOW}⚠️  Monitoreo automático ya estaba configurado${NC}"
-fi
+    # Verificar si ya existe la entrada
+    if ! crontab -l 2>/dev/null | grep -q "uninet-agent-runner"; then
+        (crontab -l 2>/dev/null; echo "$CRON_JOB") | crontab -
+        echo -e "${GREEN}✅ Monitoreo automático configurado (heartbeat cada 30 segundos)${NC}"
+    else
+        echo -e "${YELLOW}⚠️  Monitoreo automático ya estaba configurado${NC}"
+    fi
 
-# Verificar que el servicio cron esté activo
-if systemctl is-active --quiet cron 2>/dev/null || systemctl is-active --quiet crond 2>/dev/null; then
-    echo -e "${GREEN}✅ Servicio cron activo${NC}"
-else
-    echo -e "${BLUE}🔄 Iniciando servicio cron...${NC}"
-    systemctl start cron 2>/dev/null || systemctl start crond 2>/dev/null || true
-    systemctl enable cron 2>/dev/null || systemctl enable crond 2>/dev/null || true
+    # Verificar que el servicio cron esté activo
+    if systemctl is-active --quiet cron 2>/dev/null || systemctl is-active --quiet crond 2>/dev/null; then
+        echo -e "${GREEN}✅ Servicio cron activo${NC}"
+    else
+        echo -e "${BLUE}🔄 Iniciando servicio cron...${NC}"
+        systemctl start cron 2>/dev/null || systemctl start crond 2>/dev/null || true
+        systemctl enable cron 2>/dev/null || systemctl enable crond 2>/dev/null || true
+    fi
 fi
 
 # ==========================================
@@ -386,6 +457,7 @@ echo "   • Los directorios home se crean automáticamente"
 echo ""
 echo "📝 Comandos útiles:"
 echo "   • Verificar agente: sudo /usr/local/bin/uninet-agent"
+echo "   • Estado del agente persistente: systemctl status uninet-agent"
 echo "   • Ver logs: grep uninet /var/log/syslog"
 echo "   • Listar usuarios LDAP: getent passwd | grep '/home'"
 echo "   • Probar usuario LDAP: id <nombre_usuario>"
@@ -40,6 +40,17 @@ fi
 # Obtener carrera del config (laboratorio al que pertenece esta PC)
 CARRERA=${CARRERA:-"5010"}  # Default: Sistemas si no está configurado
 
+# Modo UDP (opcional): datagrama firmado con HMAC, sin conexión HTTP
+# Requiere UDP_PORT y UDP_KEY en la configuración (ver SERVER-SETUP.md)
+if [ -n "$UDP_PORT" ] && [ -n "$UDP_KEY" ] && command -v openssl &> /dev/null; then
+    PAYLOAD="UN1|$(date +%s)|$HOSTNAME|$IP|$ACTIVE_USER|$CARRERA"
+    SIGNATURE=$(printf '%s' "$PAYLOAD" | openssl dgst -sha256 -hmac "$UDP_KEY" | awk '{print $NF}')
+    if printf '%s' "$PAYLOAD|$SIGNATURE" > "/dev/udp/${SERVER_IP}/${UDP_PORT}" 2>/dev/null; then
+        exit 0
+    fi
+    # Si el envío UDP falla se usa HTTP
+fi
+
 # Construir JSON
 JSON_DATA="{\"hostname\":\"$HOSTNAME\",\"ip\":\"$IP\",\"user\":$USER_FIELD,\"carrera\":\"$CARRERA\"}"
 
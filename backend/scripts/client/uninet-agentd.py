@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+UniNet Agent Daemon - Agente de monitoreo persistente
+
+Reemplaza la ejecución por cron de uninet-agent.sh:
+- Un solo proceso (systemd), sin forks de hostname/ip/who/curl
+- Conexión HTTP keep-alive reutilizada entre heartbeats
+- Envía de inmediato cuando cambia el usuario o la IP; si no, un
+  heartbeat de mantenimiento cada KEEPALIVE_INTERVAL con jitter
+- Respeta las indicaciones del servidor: Retry-After (429/503) y
+  next_interval en la respuesta del heartbeat
+- Ejecuta los comandos que llegan en la respuesta (bloquear/desbloquear
+  internet, bloquear sesión, recargar configuración) y los confirma en
+  el heartbeat siguiente
+
+Configuración: /etc/uninet/config (SERVER_URL, SERVER_IP, CARRERA)
+Solo envía por HTTP: con UDP_PORT/UDP_KEY el instalador deja uninet-agent.sh
+por cron, que es el que envía los datagramas UDP.
+Solo usa la biblioteca estándar de Python 3.
+"""
+
+import http.client
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+CONFIG_FILE = "/etc/uninet/config"
+UTMP_FILE = "/var/run/utmp"
+
+# Cada cuánto se revisa la sesión y la IP locales (lectura de archivos, sin forks)
+CHECK_INTERVAL = 2
+
+# Heartbeat de mantenimiento sin cambios: debe quedar bajo el timeout del servidor (60 s)
+KEEPALIVE_INTERVAL = 30
+KEEPALIVE_JITTER = 0.2
+
+# Reintentos ante errores de red: backoff exponencial con tope
+RETRY_MIN = 2
+RETRY_MAX = 60
+
+# struct utmp de Linux (glibc, 384 bytes)
+UTMP_FORMAT = "hi32s4s32s256shhiii4i20s"
+UTMP_SIZE = struct.calcsize(UTMP_FORMAT)
+USER_PROCESS = 7
+
+# Cadena de iptables propia para el bloqueo de internet (no toca otras reglas)
+BLOCK_CHAIN = "UNINET-BLOCK"
+
+# IDs de comandos ya ejecutados que se recuerdan (el servidor reenvía hasta el ack)
+DONE_COMMANDS = 256
+
+
+def read_config(path):
+    """Lee el archivo KEY="valor" generado por install-client.sh"""
+    config = {}
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            config[key.strip()] = value.strip().strip('"').strip("'")
+    return config
+
+
+def active_user(utmp_path=UTMP_FILE):
+    """Primer usuario con sesión activa (excluye root), como `who | grep -v root`"""
+    try:
+        with open(utmp_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    for offset in range(0, len(data) - UTMP_SIZE + 1, UTMP_SIZE):
+        record = struct.unpack_from(UTMP_FORMAT, data, offset)
+        if record[0] != USER_PROCESS:
+            continue
+        user = record[4].split(b"\0", 1)[0].decode("utf-8", "replace")
+        if user and user != "root":
+            return user
+    return None
+
+
+def local_ip(server_host, server_port):
+    """IP local de la interfaz que llega al servidor (connect UDP no envía paquetes)"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect((server_host, server_port))
+            return s.getsockname()[0]
+    except OSError:
+        return None
+
+
+def _iptables(*args):
+    return subprocess.run(["iptables", *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+
+
+def block_internet(server_host, allow=()):
+    """Corta HTTP/HTTPS a usuarios no root, salvo al servidor y a `allow`"""
+    if _iptables("-N", BLOCK_CHAIN) != 0:
+        _iptables("-F", BLOCK_CHAIN)
+    for address in (server_host, *allow):
+        _iptables("-A", BLOCK_CHAIN, "-d", address, "-j", "RETURN")
+    for port in ("80", "443"):
+        _iptables("-A", BLOCK_CHAIN, "-p", "tcp", "--dport", port,
+                  "-m", "owner", "!", "--uid-owner", "0", "-j", "REJECT")
+    if _iptables("-C", "OUTPUT", "-j", BLOCK_CHAIN) != 0:
+        _iptables("-I", "OUTPUT", "-j", BLOCK_CHAIN)
+
+
+def unblock_internet():
+    _iptables("-F", BLOCK_CHAIN)
+
+
+def lock_session():
+    subprocess.run(["loginctl", "lock-sessions"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class Agent:
+    """Estado del agente: conexión persistente y último estado enviado"""
+
+    def __init__(self, config, config_path=CONFIG_FILE):
+        self.config_path = config_path
+        self.conn = None
+        self.configure(config)
+        self.hostname = socket.gethostname()
+        # Comandos ejecutados: por confirmar y recientes (para no repetirlos)
+        self.acks = []
+        self.done = deque(maxlen=DONE_COMMANDS)
+        self.sent_state = None
+        self.next_send = 0.0
+        # Pausa por error o por indicación del servidor (aplica también a cambios)
+        self.hold_until = 0.0
+        self.retry_delay = RETRY_MIN
+
+    def configure(self, config):
+        url = urlsplit(config["SERVER_URL"])
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.path = url.path or "/api/heartbeat"
+        self.carrera = config.get("CARRERA") or "5010"
+        # refresh_config: cerrar la conexión al servidor anterior antes de reemplazarla
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+
+    def keepalive_delay(self, interval=KEEPALIVE_INTERVAL):
+        return interval * random.uniform(1 - KEEPALIVE_JITTER, 1 + KEEPALIVE_JITTER)
+
+    def post(self, payload):
+        """POST en la conexión keep-alive; reconecta una vez si el servidor la cerró"""
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=5)
+            try:
+                self.conn.request("POST", self.path, body, headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, response.getheader("Retry-After"), data
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+    def step(self, now):
+        """Revisa el estado local y envía si cambió o vence el keepalive"""
+        if now < self.hold_until:
+            return
+        ip = local_ip(self.host, self.port)
+        if ip is None:
+            return
+        state = (active_user(), ip)
+        if state == self.sent_state and now < self.next_send:
+            return
+
+        payload = {"hostname": self.hostname, "ip": ip, "user": state[0], "carrera": self.carrera}
+        acks = list(self.acks)
+        if acks:
+            payload["acks"] = acks
+        try:
+            status, retry_after, data = self.post(payload)
+        except (OSError, http.client.HTTPException) as e:
+            print("uninet-agentd: error enviando heartbeat: {}".format(e), file=sys.stderr)
+            self.hold_until = now + self.retry_delay * random.uniform(0.5, 1.0)
+            self.retry_delay = min(self.retry_delay * 2, RETRY_MAX)
+            # Forzar reenvío cuando vuelva la conexión
+            self.sent_state = None
+            return
+
+        self.retry_delay = RETRY_MIN
+        if status in (429, 503):
+            # Servidor saturado: esperar lo indicado antes de reintentar
+            self.sent_state = None
+            self.hold_until = now + self.hint(retry_after, RETRY_MIN) * random.uniform(1.0, 1.2)
+            return
+        if status != 200:
+            print("uninet-agentd: heartbeat rechazado ({})".format(status), file=sys.stderr)
+            self.sent_state = None
+            self.hold_until = now + self.keepalive_delay()
+            return
+
+        # Confirmaciones entregadas: no volver a enviarlas
+        self.acks = self.acks[len(acks):]
+        interval = KEEPALIVE_INTERVAL
+        commands = []
+        try:
+            response = json.loads(data.decode("utf-8"))
+            interval = self.hint(response.get("next_interval"), interval)
+            commands = response.get("commands") or []
+        except (ValueError, AttributeError):
+            pass
+        self.sent_state = state
+        self.next_send = now + self.keepalive_delay(interval)
+        if commands:
+            self.run_commands(commands)
+            # Confirmar pronto en lugar de esperar el keepalive
+            self.next_send = min(self.next_send, now + CHECK_INTERVAL)
+
+    def run_commands(self, commands):
+        """Ejecuta cada comando una sola vez y lo deja para confirmar"""
+        for command in commands:
+            command_id = command.get("id")
+            if command_id in self.done:
+                continue
+            kind = command.get("type")
+            args = command.get("args") or {}
+            print("uninet-agentd: comando {} ({})".format(kind, command_id), file=sys.stderr)
+            try:
+                if kind == "block_internet":
+                    block_internet(self.host, args.get("allow") or ())
+                elif kind == "unblock_internet":
+                    unblock_internet()
+                elif kind == "lock_session":
+                    lock_session()
+                elif kind == "refresh_config":
+                    self.configure(read_config(self.config_path))
+                else:
+                    print("uninet-agentd: comando desconocido {}".format(kind), file=sys.stderr)
+            except (OSError, KeyError) as e:
+                print("uninet-agentd: error ejecutando {}: {}".format(kind, e), file=sys.stderr)
+            # Se confirma igual: reintentar un comando que falla localmente no ayuda
+            self.done.append(command_id)
+            self.acks.append(command_id)
+
+    @staticmethod
+    def hint(value, default):
+        """Segundos sugeridos por el servidor (acotados), o default"""
+        try:
+            return min(max(float(value), 1.0), 300.0)
+        except (TypeError, ValueError):
+            return default
+
+    def run(self):
+        # Evitar que todas las PCs encendidas a la vez envíen en el mismo segundo
+        time.sleep(random.uniform(0, 5))
+        while True:
+            self.step(time.monotonic())
+            time.sleep(CHECK_INTERVAL)
+
+
+def main():
+    config_path = os.environ.get("UNINET_CONFIG", CONFIG_FILE)
+    try:
+        config = read_config(config_path)
+    except OSError:
+        print("Error: Archivo de configuración no encontrado en {}".format(config_path), file=sys.stderr)
+        sys.exit(1)
+    if not config.get("SERVER_URL"):
+        print("Error: SERVER_URL no está configurado", file=sys.stderr)
+        sys.exit(1)
+
+    Agent(config, config_path).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 #!/bin/bash
 #
 # UniNet - Script para limpiar logs antiguos
-# Elimina logs rotados o antiguos para liberar espacio
+# Elimina los segmentos cerrados del log que superan la retención
+# El backend cierra el log de carreras por periodo (LOG_FILE.AAAA-MM-DD[.n].gz
+# o LOG_FILE.AAAA-MM-DDTHH[.n].gz, cada uno con su .meta.json): se borra el
+# segmento junto a su metadata. El activo (LOG_FILE), su índice (.idx), el
+# lock (.lock) y los segmentos aún sin comprimir no se tocan.
 #
 
 GREEN='\033[0;32m'
@@ -18,11 +22,33 @@ source /etc/uninet/logs.conf
 echo "🧹 Iniciando limpieza de logs en $LOG_DIR..."
 echo "   Retención configurada: $RETENTION_DAYS días"
 
-COUNT=$(find "$LOG_DIR" -name "*.log*" -type f -mtime +$RETENTION_DAYS | wc -l)
+# Periodos anteriores a este día (UTC, igual que el nombre del segmento) se borran
+CUTOFF=$(date -u -d "$RETENTION_DAYS days ago" +%Y-%m-%d)
+
+# Mismo lock que usa el backend al cerrar y comprimir segmentos
+exec 9>>"$LOG_FILE.lock"
+flock 9
+
+COUNT=0
+for SEGMENT in "$LOG_FILE".*.gz; do
+    [ -f "$SEGMENT" ] || continue
+    NAME=${SEGMENT#"$LOG_FILE".}
+    NAME=${NAME%.gz}
+    # AAAA-MM-DD, AAAA-MM-DDTHH, con sufijo .n opcional
+    if [[ ! "$NAME" =~ ^([0-9]{4}-[0-9]{2}-[0-9]{2})(T[0-9]{2})?(\.[0-9]+)?$ ]]; then
+        continue
+    fi
+    if [[ "${BASH_REMATCH[1]}" < "$CUTOFF" ]]; then
+        # Primero el segmento: sin .gz la metadata huérfana ya no se lista
+        rm -f "$SEGMENT" "${SEGMENT%.gz}.meta.json"
+        COUNT=$((COUNT + 1))
+    fi
+done
+
+flock -u 9
 
 if [ "$COUNT" -gt 0 ]; then
-    find "$LOG_DIR" -name "*.log*" -type f -mtime +$RETENTION_DAYS -delete
-    echo -e "${GREEN}✅ Se eliminaron $COUNT archivos antiguos${NC}"
+    echo -e "${GREEN}✅ Se eliminaron $COUNT segmentos antiguos${NC}"
 else
     echo -e "${YELLOW}ℹ️  No hay logs antiguos para eliminar${NC}"
 fi
@@ -31,4 +31,11 @@ if [ -d "venv" ]; then
 fi
 
 # Iniciar servidor
-python3 -m uvicorn api.main:app --host 0.0.0.0 --port 4000 --reload
+# UNINET_WORKERS=N (N>1) usa varios procesos con estado compartido en SQLite
+if [ -n "$UNINET_WORKERS" ] && [ "$UNINET_WORKERS" -gt 1 ]; then
+    echo "⚙️  Workers: $UNINET_WORKERS (estado compartido en SQLite)"
+    export UNINET_FLEET_BACKEND=sqlite
+    python3 -m uvicorn api.main:app --host 0.0.0.0 --port 4000 --workers "$UNINET_WORKERS"
+else
+    python3 -m uvicorn api.main:app --host 0.0.0.0 --port 4000 --reload
+fi
@@ -1,4 +1,5 @@
-import type { PC, PCStatus } from '@/types';
+import { useEffect, useState } from 'react';
+import type { HostHistory, PC, PCStatus } from '@/types';
 import { cn } from '@/lib/utils';
 import {
   X,
@@ -9,7 +10,8 @@ import {
   LogOut,
   AlertTriangle,
   User,
-  Globe
+  Globe,
+  Activity
 } from 'lucide-react';
 
 // ==========================================
@@ -56,6 +58,28 @@ const statusConfig: Record<PCStatus, {
 };
 
 export function PCDetailPanel({ pc, isOpen, onClose }: PCDetailPanelProps) {
+  const [history, setHistory] = useState<HostHistory | null>(null);
+
+  // Historial de las últimas 24 horas (buckets de 1 hora) al abrir el panel
+  useEffect(() => {
+    const apiUrl = import.meta.env.VITE_API_URL;
+    if (!pc || !isOpen || !apiUrl) return;
+
+    let cancelled = false;
+    setHistory(null);
+    fetch(`${apiUrl}/api/monitoring/hosts/${pc.id}/history?step=4`)
+      .then(res => (res.ok ? res.json() : null))
+      .then((data: HostHistory | null) => {
+        if (!cancelled) setHistory(data);
+      })
+      .catch(() => {
+        if (!cancelled) setHistory(null);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [pc?.id, isOpen]);
+
   if (!pc) return null;
 
   const status = statusConfig[pc.status];
@@ -188,6 +212,40 @@ export function PCDetailPanel({ pc, isOpen, onClose }: PCDetailPanelProps) {
             </div>
           </div>
 
+          {/* Uso en las últimas 24 horas */}
+          {history && (
+            <div className="space-y-3">
+              <div className="flex items-center justify-between">
+                <h3 className="text-xs text-white/50 uppercase tracking-wider font-semibold">
+                  Últimas 24 horas
+                </h3>
+                <div className="flex items-center gap-2 text-sm">
+                  <Activity className="w-4 h-4 text-amber-400" />
+                  <span className="text-white/70">
+                    En uso {Math.round(history.totals.occupancy * 100)}%
+                  </span>
+                </div>
+              </div>
+              <div className="flex items-end gap-px h-16">
+                {history.buckets.map(bucket => {
+                  const total = bucket.online + bucket.inUse + bucket.offline;
+                  const pct = (value: number) => (total ? (value / total) * 100 : 0);
+                  return (
+                    <div
+                      key={bucket.start}
+                      className="flex-1 h-full flex flex-col-reverse rounded-sm overflow-hidden bg-white/5"
+                      title={new Date(bucket.start).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
+                    >
+                      <div className="bg-amber-500" style={{ height: `${pct(bucket.inUse)}%` }} />
+                      <div className="bg-emerald-500/70" style={{ height: `${pct(bucket.online)}%` }} />
+                      <div className="bg-red-500/40" style={{ height: `${pct(bucket.offline)}%` }} />
+                    </div>
+                  );
+                })}
+              </div>
+            </div>
+          )}
+
           {/* Mensaje de PC offline - Glassmorphism */}
           {isOffline && (
             <div className="flex items-start gap-3 p-4 rounded-xl bg-red-500/10 backdrop-blur-sm border border-red-500/20 shadow-lg shadow-red-500/5">
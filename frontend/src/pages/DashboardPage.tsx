@@ -42,7 +42,7 @@ export function DashboardPage() {
     }
   }, [pcs])
 
-  // Fetch dinámico de PCs desde el backend
+  // Estado dinámico de PCs vía stream de eventos (SSE) del backend
   useEffect(() => {
     const apiUrl = import.meta.env.VITE_API_URL;
     if (!apiUrl) {
@@ -51,59 +51,67 @@ export function DashboardPage() {
       return;
     }
 
-    const fetchStatus = async () => {
-      try {
-        // Construir URL con filtro de carrera si está seleccionada
-        let url = `${apiUrl}/api/monitoring/status`;
-        if (selectedCarrera) {
-          url += `?carrera=${selectedCarrera.id}`;
-        }
-        
-        const res = await fetch(url);
-        if (!res.ok) {
-          console.warn('Backend no responde:', res.status);
-          setIsLoading(false);
-          return;
-        }
-        
-        const data: Array<{
-          id: string;
-          name: string;
-          ip: string;
-          status: 'online' | 'offline' | 'inUse';
-          user: string | null;
-          lastSeen: string;
-          carrera?: string;
-        }> = await res.json();
-
-        // Transformar datos del backend al formato del frontend
-        const transformedPCs: PC[] = data.map(pc => ({
-          id: pc.id,
-          name: pc.name,
-          ip: pc.ip,
-          status: pc.status,
-          user: pc.user,
-          lastSeen: new Date(pc.lastSeen),
-          laboratoryId: `lab-${pc.carrera || '5010'}`,
-          carrera: pc.carrera,
-        }));
-
-        setPcs(transformedPCs);
-        setIsLoading(false);
-      } catch (err) {
-        console.error('Error conectando con backend:', err);
-        setIsLoading(false);
-      }
+    type BackendPC = {
+      id: string;
+      name: string;
+      ip: string;
+      status: 'online' | 'offline' | 'inUse';
+      user: string | null;
+      lastSeen: string;
+      carrera?: string;
     };
 
-    // Fetch inicial
-    fetchStatus();
+    // Transformar datos del backend al formato del frontend
+    const toPC = (pc: BackendPC): PC => ({
+      id: pc.id,
+      name: pc.name,
+      ip: pc.ip,
+      status: pc.status,
+      user: pc.user,
+      lastSeen: new Date(pc.lastSeen),
+      laboratoryId: `lab-${pc.carrera || '5010'}`,
+      carrera: pc.carrera,
+    });
+
+    const byNumericId = (a: PC, b: PC) =>
+      a.id.localeCompare(b.id, undefined, { numeric: true });
+
+    // Construir URL con filtro de carrera si está seleccionada
+    let url = `${apiUrl}/api/monitoring/status/stream`;
+    if (selectedCarrera) {
+      url += `?carrera=${selectedCarrera.id}`;
+    }
+
+    // EventSource se reconecta solo; cada conexión empieza con un snapshot
+    const source = new EventSource(url);
 
-    // Polling cada 10 segundos para actualizar el estado
-    const interval = setInterval(fetchStatus, 10000);
+    source.addEventListener('snapshot', (e) => {
+      const data: { version: number; hosts: BackendPC[] } = JSON.parse((e as MessageEvent).data);
+      setPcs(data.hosts.map(toPC));
+      setIsLoading(false);
+    });
+
+    const upsert = (e: Event) => {
+      const data: { host: BackendPC } = JSON.parse((e as MessageEvent).data);
+      const pc = toPC(data.host);
+      setPcs(prev => [...prev.filter(p => p.id !== pc.id), pc].sort(byNumericId));
+    };
+    source.addEventListener('registered', upsert);
+    source.addEventListener('transition', upsert);
+    source.addEventListener('updated', upsert);
+
+    source.addEventListener('removed', (e) => {
+      const data: { id: string } = JSON.parse((e as MessageEvent).data);
+      setPcs(prev => prev.filter(p => p.id !== data.id));
+    });
+
+    source.onerror = () => {
+      console.warn('Stream de estado desconectado, reintentando...');
+      setIsLoading(false);
+    };
 
-    return () => clearInterval(interval);
-  }, [selectedCarrera]); // Re-fetch cuando cambie la carrera seleccionada
+    return () => source.close();
+  }, [selectedCarrera]); // Reconectar cuando cambie la carrera seleccionada
 
   return (
     <>
@@ -24,6 +24,28 @@ export interface PC {
   carrera?: string;     // Código de carrera/laboratorio (5001-5012)
 }
 
+/**
+ * Segundos en cada estado dentro de un intervalo del historial
+ */
+export interface HostHistoryBucket {
+  start: string;        // Inicio del intervalo (ISO)
+  online: number;
+  inUse: number;
+  offline: number;
+}
+
+/**
+ * Historial de una PC (GET /hosts/{id}/history)
+ */
+export interface HostHistory {
+  id: string;
+  name: string;
+  carrera: string | null;
+  samples: { ts: string; status: PCStatus; user: string | null }[];  // Últimas transiciones
+  buckets: HostHistoryBucket[];
+  totals: { online: number; inUse: number; offline: number; occupancy: number };
+}
+
 /**
  * Niveles de log
  */